@@ -0,0 +1,94 @@
+"""
+/search?fuzzy=true: typo lookup latency against vocabulary size (services/fuzzy.py)
+
+WHY: Fuzzy matching must not cost a pass over the vocabulary, which grows
+     with every new party name, place and case number
+HOW: Vocabularies of `--sizes` terms (the words of benchmarks/search_index.py,
+     random pronounceable names, numbers) get a TrigramIndex; `--queries`
+     vocabulary terms with one random typo (deletion, insertion,
+     substitution or transposition) are looked up. Reported: build time,
+     lookup p50 / p99, how often the original term is among the closest
+     and the same lookups as a scan of every term of a close length
+     (same vectorized edit distance, first 5 queries). No database involved
+WHEN: python -m benchmarks.fuzzy_search [--sizes 10000 100000 1000000 --queries 500]
+"""
+import argparse
+import statistics
+import time
+
+import numpy as np
+
+from benchmarks.search_index import WORDS
+from services.fuzzy import TrigramIndex, edit_distances, max_edits
+
+LETTERS = "abcdefghijklmnopqrstuvwxyz"
+CONSONANTS, VOWELS = "bcdfghjklmnprstvwy", "aeiou"
+
+
+def vocabulary(size: int, rng: np.random.Generator) -> list[str]:
+    syllables = [c + v for c in CONSONANTS for v in VOWELS]
+    terms = set(WORDS)
+    while len(terms) < size:
+        picks = rng.integers(len(syllables), size=(size, 4))
+        lengths = rng.integers(2, 5, size)
+        terms.update("".join(syllables[s] for s in row[:length]) for row, length in zip(picks, lengths))
+        terms.update(str(number) for number in rng.integers(1, 10 * size, size // 4))
+    return sorted(terms)[:size]
+
+
+def typo(term: str, rng: np.random.Generator) -> str:
+    i = int(rng.integers(len(term)))
+    kind = rng.integers(4)
+    if kind == 0 and len(term) > 4:
+        return term[:i] + term[i + 1:]
+    if kind == 1:
+        return term[:i] + rng.choice(list(LETTERS)) + term[i:]
+    if kind == 2 or i == len(term) - 1:
+        return term[:i] + rng.choice(list(LETTERS.replace(term[i], ""))) + term[i + 1:]
+    return term[:i] + term[i + 1] + term[i] + term[i + 2:]
+
+
+def scan(terms: list[str], lengths: np.ndarray, word: str) -> list[str]:
+    limit = max_edits(word)
+    close = [terms[i] for i in np.flatnonzero(np.abs(lengths - len(word)) <= limit)]
+    edits = edit_distances(word, close, limit)
+    return [close[i] for i in np.flatnonzero(edits <= limit)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--queries", type=int, default=500)
+    args = parser.parse_args()
+
+    print(f"{'terms':>9} {'build s':>8} {'p50 ms':>8} {'p99 ms':>8} {'found':>6} {'scan p50 ms':>12}")
+    for size in args.sizes:
+        rng = np.random.default_rng(size)
+        terms = vocabulary(size, rng)
+        start = time.perf_counter()
+        index = TrigramIndex(terms)
+        build = time.perf_counter() - start
+
+        originals = [terms[i] for i in rng.integers(len(terms), size=args.queries)]
+        originals = [term for term in originals if len(term) >= 4]
+        queries = [typo(term, rng) for term in originals]
+        latencies, found = [], 0
+        for original, query in zip(originals, queries):
+            start = time.perf_counter()
+            closest, _ = index.closest(query)
+            latencies.append(time.perf_counter() - start)
+            found += original in closest
+        latencies.sort()
+
+        scans, lengths = [], np.fromiter(map(len, terms), np.int64, len(terms))
+        for query in queries[:5]:
+            start = time.perf_counter()
+            scan(terms, lengths, query)
+            scans.append(time.perf_counter() - start)
+        print(f"{size:9d} {build:8.2f} {statistics.median(latencies) * 1000:8.2f} "
+              f"{latencies[int(len(latencies) * 0.99) - 1] * 1000:8.2f} {found / len(queries):6.1%} "
+              f"{statistics.median(scans) * 1000:12.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+/search with search_backend = "database" vs a LIKE scan
+
+WHY: Deployments that cannot hold the in-memory index (services/search_index.py)
+     in every worker search in the database; the naive alternative is
+     case_text LIKE '%word%'
+HOW: `--docs` synthetic case texts (benchmarks/search_index.py) are saved
+     as predictions through the normal bulk insert, then the full-text
+     index is set up (ensure_full_text_search: FTS5 on SQLite, tsvector +
+     GIN on PostgreSQL). The same random 1, 2 and 3 word queries then run
+     both ways, first page of 20 + total count, like /search:
+     - fts:  services/full_text.search_database (ranked)
+     - like: any word LIKE '%word%', newest first (a LIKE scan cannot rank)
+WHEN: python -m benchmarks.search_database [--docs 200000 --queries 30]
+      [--url postgresql://...]   (default: a fresh SQLite file; the
+      predictions / case_texts tables of --url are written to!)
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+
+
+async def _time_queries(queries: list[str], run) -> tuple[float, float, float]:
+    latencies, totals = [], []
+    for query in queries:
+        start = time.perf_counter()
+        totals.append(await run(query))
+        latencies.append(time.perf_counter() - start)
+    latencies.sort()
+    return (statistics.median(latencies) * 1000, latencies[-1] * 1000, statistics.median(totals))
+
+
+async def _compare(args):
+    import numpy as np
+    from sqlalchemy import func, or_, select
+
+    from benchmarks.search_index import WORDS
+    from core.database import async_sessionlocal
+    from models.predictions import Prediction
+    from services.case_texts import case_text_column, with_case_texts
+    from services.full_text import search_database
+
+    async def fts(query: str) -> int:
+        async with async_sessionlocal() as db:
+            total, _ = await search_database(db, query, 0, 20)
+        return total
+
+    async def like(query: str) -> int:
+        text = case_text_column()
+        matching = with_case_texts(select(Prediction.id)).where(
+            or_(*(text.like(f"%{word}%") for word in query.split()))
+        )
+        async with async_sessionlocal() as db:
+            total = await db.scalar(select(func.count()).select_from(matching.subquery()))
+            (await db.execute(matching.order_by(Prediction.id.desc()).limit(20))).all()
+        return total
+
+    rng = np.random.default_rng(1)
+    print(f"{'words':>5} {'mode':>5} {'p50 ms':>9} {'max ms':>9} {'hits (median)':>14}")
+    for words in (1, 2, 3):
+        queries = [" ".join(rng.choice(WORDS[:60], words, replace=False)) for _ in range(args.queries)]
+        for mode, run in (("fts", fts), ("like", like)):
+            p50, worst, hits = await _time_queries(queries, run)
+            print(f"{words:5d} {mode:>5} {p50:9.1f} {worst:9.1f} {hits:14.0f}")
+    # a rare word: where an index wins by the most
+    for mode, run in (("fts", fts), ("like", like)):
+        p50, worst, hits = await _time_queries([str(args.docs // 2)], run)
+        print(f"{'rare':>5} {mode:>5} {p50:9.1f} {worst:9.1f} {hits:14.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--docs", type=int, default=200_000)
+    parser.add_argument("--queries", type=int, default=30, help="queries per word count")
+    parser.add_argument("--url", default=None, help="database to fill (default: new SQLite file)")
+    args = parser.parse_args()
+
+    # settings and engines are read at import time: configure the environment first
+    url = args.url or f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='baro-fts-bench-'), 'bench.db')}"
+    os.environ["DATABASE_URL"] = url
+    from benchmarks.search_index import synthetic_texts
+    from core.database import engine, sqlite_writer
+    from core.schema import ensure_full_text_search, sync_schema
+    from models import case_texts, predictions, rollups  # noqa: F401  (tables to create)
+    from services.persistence import save_predictions
+
+    sync_schema(engine)
+    start = time.perf_counter()
+    chunk = []
+    for _, text in synthetic_texts(args.docs):
+        chunk.append({"case_text": text, "category": "Property Law", "confidence": 0.85})
+        if len(chunk) == 10_000:
+            save_predictions(chunk, "bench", 10_000, return_ids=False)
+            chunk = []
+    if chunk:
+        save_predictions(chunk, "bench", 10_000, return_ids=False)
+    print(f"saved {args.docs} predictions in {time.perf_counter() - start:.1f}s")
+
+    start = time.perf_counter()
+    ensure_full_text_search(engine)
+    print(f"full-text index built in {time.perf_counter() - start:.1f}s ({engine.dialect.name})")
+
+    asyncio.run(_compare(args))
+    if sqlite_writer is not None:
+        sqlite_writer.close()
+
+
+if __name__ == "__main__":
+    main()
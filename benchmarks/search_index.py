@@ -0,0 +1,109 @@
+"""
+/search: query latency of the in-process BM25 index (services/search_index.py)
+
+WHY: The index must answer in single-digit milliseconds with millions of
+     case texts, the old /search could not search at all
+HOW: `--docs` synthetic case texts (Zipf-distributed legal-ish vocabulary,
+     20-120 words) are indexed in memory, merged, snapshotted and loaded
+     again. Then `--queries` random 1, 2 and 3 word queries are timed
+     twice (first page of 20, like /search) with a few deleted documents
+     and an unmerged delta, as in a running server. The vocabulary is
+     tiny on purpose: every query word is in a large share of the
+     documents, the worst case for an inverted index. No database involved
+WHEN: python -m benchmarks.search_index [--docs 1000000 --queries 300]
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+import numpy as np
+
+from dependencies.config import get_settings
+from services.search_index import SearchIndex
+
+WORDS = (
+    "accused complainant petitioner respondent appellant court judge bail custody theft robbery "
+    "murder assault fraud cheating forgery property land boundary tenant landlord lease rent "
+    "eviction contract breach damages compensation injunction divorce custody maintenance dowry "
+    "cruelty marriage will inheritance succession partition deed sale mortgage loan bank cheque "
+    "dishonour section ipc crpc evidence witness statement fir police station investigation "
+    "charge sheet trial appeal revision writ petition constitution article fundamental rights "
+    "employment salary termination gratuity pension tax notice penalty consumer defect refund "
+    "insurance claim accident vehicle negligence medical hospital cyber harassment defamation"
+).split()
+
+
+def synthetic_texts(count: int, seed: int = 7, first_id: int = 1):
+    rng = np.random.default_rng(seed)
+    # Zipf-like word frequencies, plus numbers (section / case numbers)
+    weights = 1 / np.arange(1, len(WORDS) + 1)
+    weights /= weights.sum()
+    lengths = rng.integers(20, 120, count)
+    for i, length in enumerate(lengths):
+        words = rng.choice(len(WORDS), length, p=weights)
+        yield first_id + i, " ".join(WORDS[w] for w in words) + f" section {rng.integers(1, 600)} case {i}"
+
+
+def timed(fn, *args) -> float:
+    start = time.perf_counter()
+    fn(*args)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--docs", type=int, default=1_000_000)
+    parser.add_argument("--queries", type=int, default=300)
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix="baro-search-bench-")
+    settings = get_settings().model_copy(update={
+        "search_snapshot_path": os.path.join(directory, "predictions"),
+    })
+    index = SearchIndex(settings)
+
+    start = time.perf_counter()
+    batch = []
+    for row in synthetic_texts(args.docs):
+        batch.append(row)
+        if len(batch) == 10_000:
+            index.add(batch, local=False)
+            batch = []
+            if index._delta.docs >= settings.search_merge_docs:
+                index.merge()
+    index.add(batch, local=False)
+    index.merge()
+    print(f"indexed {args.docs} docs in {time.perf_counter() - start:.1f}s "
+          f"({len(index._segment.docs)} postings, {len(index._segment.terms)} terms)")
+
+    print(f"snapshot: save {timed(index.save):.2f}s, "
+          f"{os.path.getsize(settings.search_snapshot_path + '.npz') / 2**20:.0f} MB, ", end="")
+    index = SearchIndex(settings)
+    print(f"load {timed(index.load):.2f}s")
+
+    # a running server: some deletes, recent rows not merged yet
+    rng = np.random.default_rng(1)
+    index.remove(rng.integers(1, args.docs, 1000).tolist())
+    index.add(synthetic_texts(2000, seed=99, first_id=args.docs + 1), local=True)
+
+    # first run of a query builds the champion lists / bitsets of its terms
+    # (cached until the next merge), the second run is the steady state
+    print(f"{'words':>5} {'cold p50':>9} {'cold p99':>9} {'warm p50':>9} {'warm p99':>9} {'hits (median)':>14}")
+    for words in (1, 2, 3):
+        queries = [" ".join(rng.choice(WORDS[:60], words, replace=False)) for _ in range(args.queries)]
+        runs, hits = [], []
+        for _ in range(2):
+            latencies = []
+            for query in queries:
+                start = time.perf_counter()
+                total, _ = index.search(query, 0, 20)
+                latencies.append(time.perf_counter() - start)
+                hits.append(total)
+            latencies.sort()
+            runs += [statistics.median(latencies) * 1000, latencies[int(len(latencies) * 0.99) - 1] * 1000]
+        print(f"{words:5d} " + " ".join(f"{ms:9.2f}" for ms in runs) + f" {statistics.median(hits):14.0f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+/legal/similar: exact scan vs IVF lists of the similar-case index (services/similarity.py)
+
+WHY: An exact scan reads every vector per query; IVF lists read a few
+     percent of them, at the price of missing some true neighbours
+HOW: `--docs` synthetic case texts drawn from `--topics` topics (each
+     topic favours a dozen words of the vocabulary of
+     benchmarks/search_index.py) are indexed in a temporary directory,
+     snapshotted and loaded again (vector segments memory-mapped). `--queries`
+     fresh texts of the same topics are answered exactly, then the IVF
+     lists are trained and the same queries run with several nprobe:
+     latency (top 10) and recall@10 against the exact answer. No database
+     involved
+WHEN: python -m benchmarks.similarity [--docs 500000 --queries 200]
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+import numpy as np
+
+from benchmarks.search_index import WORDS
+from dependencies.config import get_settings
+from services.similarity import SimilarityIndex
+
+
+def topic_texts(count: int, topics: int, seed: int, first_id: int = 1):
+    rng = np.random.default_rng(seed)
+    topic_words = np.random.default_rng(0).integers(0, len(WORDS), (topics, 12))
+    background = 1 / np.arange(1, len(WORDS) + 1)
+    background /= background.sum()
+    for i in range(count):
+        length = rng.integers(20, 80)
+        on_topic = rng.random(length) < 0.6
+        words = np.where(on_topic, rng.choice(topic_words[rng.integers(topics)], length),
+                         rng.choice(len(WORDS), length, p=background))
+        yield first_id + i, " ".join(WORDS[w] for w in words)
+
+
+def run(index: SimilarityIndex, queries: list[str]) -> tuple[float, float, list[set]]:
+    latencies, answers = [], []
+    for query in queries:
+        start = time.perf_counter()
+        _, hits = index.search(query, 10)
+        latencies.append(time.perf_counter() - start)
+        answers.append({prediction_id for prediction_id, _ in hits})
+    latencies.sort()
+    return statistics.median(latencies) * 1000, latencies[int(len(latencies) * 0.99) - 1] * 1000, answers
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--docs", type=int, default=500_000)
+    parser.add_argument("--topics", type=int, default=200)
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix="baro-similar-bench-")
+    settings = get_settings().model_copy(update={
+        "similar_path": os.path.join(directory, "predictions"),
+        "similar_ivf_min_rows": args.docs + 1,  # exact first, IVF trained below
+    })
+    index = SimilarityIndex(settings)
+
+    start = time.perf_counter()
+    batch = []
+    for row in topic_texts(args.docs, args.topics, seed=7):
+        batch.append(row)
+        if len(batch) == 10_000:
+            index.add(batch, local=False)
+            batch = []
+    index.add(batch, local=False)
+    print(f"indexed {args.docs} docs in {time.perf_counter() - start:.1f}s "
+          f"({args.docs * index.dims * 4 / 2**20:.0f} MB of vectors)")
+
+    start = time.perf_counter()
+    index.save()
+    saved = time.perf_counter() - start
+    index = SimilarityIndex(settings)
+    start = time.perf_counter()
+    index.load()
+    print(f"snapshot: save {saved:.2f}s, load {time.perf_counter() - start:.2f}s (segments memory-mapped)")
+
+    queries = [text for _, text in topic_texts(args.queries, args.topics, seed=99)]
+    run(index, queries[:5])  # page the vectors in
+    p50, p99, exact = run(index, queries)
+    print(f"{'mode':>10} {'p50 ms':>8} {'p99 ms':>8} {'recall@10':>10}")
+    print(f"{'exact':>10} {p50:8.2f} {p99:8.2f} {1:10.3f}")
+
+    start = time.perf_counter()
+    index._train()
+    print(f"IVF: {len(index._centroids)} lists trained in {time.perf_counter() - start:.1f}s")
+    for nprobe in (1, 4, 8, 16, 32):
+        index.settings = settings.model_copy(update={"similar_nprobe": nprobe})
+        p50, p99, answers = run(index, queries)
+        recall = statistics.mean(len(a & e) / max(len(e), 1) for a, e in zip(answers, exact))
+        print(f"{'ivf/' + str(nprobe):>10} {p50:8.2f} {p99:8.2f} {recall:10.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""
+SQLite: driver defaults vs the tuned profile (core/database.py)
+
+WHY: Several gunicorn workers writing predictions to one SQLite file hit
+     "database is locked" and throughput collapsed
+HOW: For each mode a fresh database file is written and read at the same
+     time by `--processes` processes (like gunicorn workers), each with
+     `--writers` threads saving predictions (save_prediction: case text,
+     row and rollups, the predict_case path) as fast as they can and
+     `--readers` threads reading one history page every `--read-interval`
+     seconds, for `--seconds` seconds. Reported per mode:
+     committed writes/s, reads/s, failed writes ("database is locked")
+     and write latency percentiles
+WHEN: python -m benchmarks.sqlite_profile [--processes 4 --writers 4 --readers 2 --seconds 10]
+      (CPU bound on small machines: compare modes on the same host only)
+"""
+import argparse
+import multiprocessing
+import os
+import statistics
+import tempfile
+import threading
+import time
+
+
+def _worker(url: str, tuned: bool, writers: int, readers: int, read_interval: float,
+            seconds: float, results):
+    # settings and engines are read at import time: configure the environment first
+    os.environ["DATABASE_URL"] = url
+    os.environ["SQLITE_TUNED"] = "true" if tuned else "false"
+    from core.database import run_write, sessionlocal, sqlite_writer
+    from services.history import history_page_query
+    from services.persistence import save_prediction
+
+    deadline = time.monotonic() + seconds
+    latencies, errors, reads = [], [], [0]
+
+    def write(thread: int):
+        n = 0
+        while time.monotonic() < deadline:
+            n += 1
+            start = time.perf_counter()
+            try:
+                run_write(save_prediction, f"case {os.getpid()}-{thread}-{n} about a land dispute",
+                          "Property Law", 0.85, "bench")
+            except Exception as e:
+                errors.append(type(e).__name__ + ": " + str(e).splitlines()[0][:80])
+                continue
+            latencies.append(time.perf_counter() - start)
+
+    def read():
+        while time.monotonic() < deadline:
+            try:
+                with sessionlocal() as db:
+                    db.execute(history_page_query(50)).all()
+                reads[0] += 1
+            except Exception as e:
+                errors.append(type(e).__name__ + ": " + str(e).splitlines()[0][:80])
+            time.sleep(read_interval)
+
+    threads = [threading.Thread(target=write, args=(i,)) for i in range(writers)]
+    threads += [threading.Thread(target=read) for _ in range(readers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    if sqlite_writer is not None:
+        sqlite_writer.close()
+    results.put({"latencies": latencies, "errors": errors, "reads": reads[0]})
+
+
+def _setup(url: str, tuned: bool):
+    os.environ["DATABASE_URL"] = url
+    os.environ["SQLITE_TUNED"] = "true" if tuned else "false"
+    from core.database import engine
+    from core.schema import sync_schema
+    from models import case_texts, predictions, rollups  # noqa: F401  (tables to create)
+    sync_schema(engine)
+
+
+def run(tuned: bool, args) -> dict:
+    context = multiprocessing.get_context("spawn")  # fresh imports per process
+    directory = tempfile.mkdtemp(prefix="baro-sqlite-bench-")
+    url = f"sqlite:///{os.path.join(directory, 'bench.db')}"
+
+    setup = context.Process(target=_setup, args=(url, tuned))
+    setup.start()
+    setup.join()
+
+    results = context.Queue()
+    processes = [
+        context.Process(target=_worker, args=(url, tuned, args.writers, args.readers,
+                                                args.read_interval, args.seconds, results))
+        for _ in range(args.processes)
+    ]
+    for process in processes:
+        process.start()
+    collected = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+
+    latencies = sorted(l for result in collected for l in result["latencies"])
+    errors = [e for result in collected for e in result["errors"]]
+    return {
+        "mode": "tuned" if tuned else "default",
+        "writes_per_s": len(latencies) / args.seconds,
+        "reads_per_s": sum(result["reads"] for result in collected) / args.seconds,
+        "failed": len(errors),
+        "p50_ms": statistics.median(latencies) * 1000 if latencies else None,
+        "p99_ms": latencies[int(len(latencies) * 0.99) - 1] * 1000 if latencies else None,
+        "first_error": errors[0] if errors else "",
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--processes", type=int, default=4)
+    parser.add_argument("--writers", type=int, default=4, help="writer threads per process")
+    parser.add_argument("--readers", type=int, default=2, help="reader threads per process")
+    parser.add_argument("--read-interval", type=float, default=0.01, help="pause between two reads")
+    parser.add_argument("--seconds", type=float, default=10.0)
+    args = parser.parse_args()
+
+    print(f"{args.processes} processes x ({args.writers} writers + {args.readers} readers), "
+          f"{args.seconds:.0f}s per mode")
+    print(f"{'mode':8} {'writes/s':>9} {'reads/s':>9} {'failed':>7} {'p50 ms':>8} {'p99 ms':>8}")
+    for tuned in (False, True):
+        r = run(tuned, args)
+        p50 = f"{r['p50_ms']:.1f}" if r["p50_ms"] is not None else "-"
+        p99 = f"{r['p99_ms']:.1f}" if r["p99_ms"] is not None else "-"
+        print(f"{r['mode']:8} {r['writes_per_s']:9.1f} {r['reads_per_s']:9.1f} {r['failed']:7d} {p50:>8} {p99:>8}"
+              + (f"   e.g. {r['first_error']}" if r["first_error"] else ""))
+
+
+if __name__ == "__main__":
+    main()
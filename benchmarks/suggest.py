@@ -0,0 +1,65 @@
+"""
+/search/suggest: prefix completion latency of the suggest index (services/suggest.py)
+
+WHY: Suggestions are requested on every keystroke, so they have to answer
+     well under a millisecond whatever the vocabulary size
+HOW: `--docs` synthetic texts of 30 words, drawn Zipf-like from a
+     vocabulary of `--terms` words (benchmarks/fuzzy_search.py), go through
+     the same add path as the prediction stream; the sorted array is built
+     once. Then `--queries` prefixes of 1 to 5 characters of random
+     vocabulary words are completed (top 10). Reported: build time, size,
+     p50 / p99 per prefix length. No database involved
+WHEN: python -m benchmarks.suggest [--terms 200000 --docs 200000 --queries 2000]
+"""
+import argparse
+import statistics
+import time
+
+import numpy as np
+
+from benchmarks.fuzzy_search import vocabulary
+from dependencies.config import get_settings
+from services.suggest import SuggestIndex
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--terms", type=int, default=200_000)
+    parser.add_argument("--docs", type=int, default=200_000)
+    parser.add_argument("--queries", type=int, default=2000)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(3)
+    terms = vocabulary(args.terms, rng)
+    rng.shuffle(terms)
+    weights = 1 / np.arange(1, len(terms) + 1) ** 0.8
+    weights /= weights.sum()
+
+    settings = get_settings().model_copy(update={"suggest_max_terms": args.terms})
+    index = SuggestIndex(settings)
+    start = time.perf_counter()
+    for first in range(0, args.docs, 10_000):
+        picks = rng.choice(len(terms), (min(10_000, args.docs - first), 30), p=weights)
+        index.add([(first + i + 1, " ".join(terms[w] for w in row)) for i, row in enumerate(picks)], local=False)
+    added = time.perf_counter() - start
+    start = time.perf_counter()
+    index._build()
+    print(f"counted {args.docs} docs in {added:.1f}s, built {len(index._completions.keys)} completions "
+          f"({len(index._terms)} words) in {time.perf_counter() - start:.2f}s")
+
+    print(f"{'prefix':>7} {'p50 ms':>8} {'p99 ms':>8} {'avg hits':>9}")
+    for length in range(1, 6):
+        words = [terms[i] for i in rng.integers(len(terms), size=args.queries)]
+        prefixes = [word[:length] for word in words if len(word) >= length]
+        latencies, hits = [], 0
+        for prefix in prefixes:
+            start = time.perf_counter()
+            hits += len(index.suggest(prefix, 10))
+            latencies.append(time.perf_counter() - start)
+        latencies.sort()
+        print(f"{length:7d} {statistics.median(latencies) * 1000:8.3f} "
+              f"{latencies[int(len(latencies) * 0.99) - 1] * 1000:8.3f} {hits / len(prefixes):9.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,238 @@
-from sqlalchemy import create_engine
+import asyncio
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 import os
 from dotenv import load_dotenv
 
-load_dotenv() 
+from dependencies.config import Settings, get_settings
+
+load_dotenv()
 
 DATABSE_URL = os.getenv("DATABASE_URL")
 
+# Sync engine: scripts (core/test_db.py), create_all, threadpool code (jobs, bulk inserts)
 engine = create_engine(DATABSE_URL)
 sessionlocal = sessionmaker(autoflush=False,autocommit=False,bind=engine)
+SessionLocal = sessionlocal
 Base = declarative_base() #parent class that all your ORM models inherit from.
+
+
+def to_async_url(url: str) -> str:
+    """
+    Same database, async driver
+
+    postgresql:// -> postgresql+asyncpg://   (sslmode=... becomes ssl=...)
+    sqlite://     -> sqlite+aiosqlite://
+    """
+    parsed = make_url(url)
+    backend = parsed.get_backend_name()
+    if backend == "postgresql":
+        query = dict(parsed.query)
+        if "sslmode" in query:  # asyncpg does not know libpq's name for it
+            query["ssl"] = query.pop("sslmode")
+        parsed = parsed.set(drivername="postgresql+asyncpg", query=query)
+    elif backend == "sqlite":
+        parsed = parsed.set(drivername="sqlite+aiosqlite")
+    return parsed.render_as_string(hide_password=False)
+
+
+# Async engine: used by `async def` endpoints so commits never block the event loop
+async_engine = create_async_engine(to_async_url(DATABSE_URL))
+# expire_on_commit=False -> no extra SELECT (refresh) to read a row after commit
+async_sessionlocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+
+# ===== SQLite profile =====
+def is_sqlite_file(url: str) -> bool:
+    """A SQLite database on disk (in-memory databases cannot use WAL or a second connection)"""
+    parsed = make_url(url)
+    return parsed.get_backend_name() == "sqlite" and parsed.database not in (None, "", ":memory:")
+
+
+def apply_sqlite_pragmas(target: Engine, settings: Settings):
+    """
+    Tune every new connection of a SQLite engine
+
+    WAL: readers never wait for the writer (and the writer not for them)
+    synchronous: NORMAL = no fsync per commit, only at WAL checkpoints
+    cache_size / mmap_size: hot pages stay in memory, reads skip read() calls
+    busy_timeout: wait for a write lock held by another process instead of
+                  failing at once with "database is locked"
+    """
+    @event.listens_for(target, "connect")
+    def _pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute(f"PRAGMA synchronous={settings.sqlite_synchronous}")
+        cursor.execute(f"PRAGMA cache_size=-{settings.sqlite_cache_mb * 1024}")
+        cursor.execute(f"PRAGMA mmap_size={settings.sqlite_mmap_mb * 1024 * 1024}")
+        cursor.execute(f"PRAGMA busy_timeout={settings.sqlite_busy_timeout_ms}")
+        cursor.execute("PRAGMA temp_store=MEMORY")
+        cursor.close()
+
+
+class SQLiteWriter:
+    """
+    One serialized writer for a SQLite file
+
+    WHY: SQLite takes one write lock per database. Several sessions writing
+         at once (threadpool, async endpoints, job workers, other gunicorn
+         workers) kept retrying that lock until "database is locked"
+    HOW: Write functions are queued and run one after another by a single
+         thread on its own connection. Whatever is queued (up to
+         `sqlite_group_commit` writes) shares one BEGIN IMMEDIATE transaction,
+         each write in its own SAVEPOINT: a failing write only rolls back
+         itself, and the write lock is taken (and the commit paid) once per
+         group. IMMEDIATE takes the lock up front, so a transaction never
+         fails half-way when upgrading from read to write. Reads keep using
+         the normal pools and run concurrently thanks to WAL. Across
+         processes busy_timeout makes the writers wait for each other
+    WHEN: sqlite_tuned and DATABASE_URL is a SQLite file; see run_write()
+    """
+
+    def __init__(self, url: str, settings: Settings):
+        self.engine = create_engine(url, pool_size=1, max_overflow=0,
+                                    connect_args={"check_same_thread": False})
+        apply_sqlite_pragmas(self.engine, settings)
+
+        @event.listens_for(self.engine, "connect")
+        def _manual_transactions(dbapi_connection, connection_record):
+            dbapi_connection.isolation_level = None  # the driver stops sending its own BEGIN
+
+        @event.listens_for(self.engine, "begin")
+        def _begin_immediate(connection):
+            connection.exec_driver_sql("BEGIN IMMEDIATE")
+
+        self.sessionlocal = sessionmaker(bind=self.engine, autoflush=False, expire_on_commit=False)
+        self.group_size = max(1, settings.sqlite_group_commit)
+        self.queue: queue.Queue = queue.Queue()
+        self.writes = 0
+        self.failed = 0
+        self.commits = 0
+        self.busy_seconds = 0.0
+        self._thread: threading.Thread | None = None
+        self._lock = threading.Lock()
+
+    def submit(self, fn: Callable, *args) -> Future:
+        """Queue fn(session, *args); the future holds its result once committed"""
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._work, name="sqlite-writer", daemon=True)
+                self._thread.start()
+        future = Future()
+        self.queue.put((fn, args, future))
+        return future
+
+    def _work(self):
+        stopping = False
+        while not stopping:
+            group = [self.queue.get()]
+            while len(group) < self.group_size and not self.queue.empty():
+                group.append(self.queue.get_nowait())
+            if None in group:  # close(): finish what was queued before it
+                stopping = True
+                group = group[:group.index(None)]
+            if group:
+                start = time.monotonic()
+                self._write_group(group)
+                self.busy_seconds += time.monotonic() - start
+
+    def _write_group(self, group: list):
+        done = []  # (future, result, error)
+        with self.sessionlocal() as db:
+            for fn, args, future in group:
+                if not future.set_running_or_notify_cancel():
+                    continue
+                savepoint = db.begin_nested()
+                try:
+                    result = fn(db, *args)
+                except BaseException as e:
+                    # fn may have committed itself (chunked writes): then only
+                    # its own work is left in the transaction
+                    if savepoint.is_active:
+                        savepoint.rollback()
+                    else:
+                        db.rollback()
+                    done.append((future, None, e))
+                    continue
+                if savepoint.is_active:
+                    savepoint.commit()
+                done.append((future, result, None))
+            try:
+                db.commit()
+                self.commits += 1
+            except BaseException as e:
+                db.rollback()
+                done = [(future, None, error or e) for future, _, error in done]
+
+        # results only once committed
+        for future, result, error in done:
+            if error is not None:
+                self.failed += 1
+                future.set_exception(error)
+            else:
+                self.writes += 1
+                future.set_result(result)
+
+    def stats(self) -> dict:
+        return {
+            "queue_depth": self.queue.qsize(),
+            "writes": self.writes,
+            "commits": self.commits,
+            "failed": self.failed,
+            "busy_seconds": round(self.busy_seconds, 3),
+        }
+
+    def close(self):
+        """Finish queued writes, stop the thread, close the connection"""
+        if self._thread is not None and self._thread.is_alive():
+            self.queue.put(None)
+            self._thread.join()
+        self.engine.dispose()
+
+
+settings = get_settings()
+sqlite_writer: SQLiteWriter | None = None
+if settings.sqlite_tuned and is_sqlite_file(DATABSE_URL):
+    apply_sqlite_pragmas(engine, settings)
+    apply_sqlite_pragmas(async_engine.sync_engine, settings)
+    sqlite_writer = SQLiteWriter(DATABSE_URL, settings)
+
+
+def run_write(fn: Callable, *args):
+    """
+    Run fn(session, *args) in a write transaction and commit it (blocking)
+
+    SQLite profile: through the serialized writer; otherwise a plain
+    session (PostgreSQL handles concurrent writers itself). fn may
+    commit on its own too (chunked writes)
+    """
+    if sqlite_writer is not None:
+        return sqlite_writer.submit(fn, *args).result()
+    with sessionlocal(expire_on_commit=False) as db:
+        try:
+            result = fn(db, *args)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        return result
+
+
+async def run_write_async(fn: Callable, *args):
+    """run_write for `async def` code: waits without blocking the event loop"""
+    if sqlite_writer is not None:
+        return await asyncio.wrap_future(sqlite_writer.submit(fn, *args))
+    async with async_sessionlocal() as db:
+        result = await db.run_sync(fn, *args)
+        await db.commit()
+        return result
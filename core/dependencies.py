@@ -1,10 +1,61 @@
-from core.database import sessionlocal
-from fastapi import Depends
+from core.database import sessionlocal, async_sessionlocal, async_engine
+from fastapi import Depends, Request
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
 def get_db():
     db = sessionlocal()
     try:
         yield db 
     finally:
-        db.close() 
\ No newline at end of file
+        db.close() 
+
+async def get_async_db():
+    """
+    AsyncSession for `async def` endpoints
+    
+    WHY: A sync Session inside `async def` runs commit/refresh ON the event
+         loop and stalls every other request of the worker
+    HOW: Same database through the async driver (aiosqlite / asyncpg)
+    """
+    async with async_sessionlocal() as db:
+        yield db
+
+async def get_read_db(request: Request):
+    """
+    AsyncSession for read-only endpoints (history, stats)
+    
+    WHY: Heavy reads competed with prediction writes on the primary
+    HOW: Bound to the read replica while it is usable (services/replica.py),
+         the primary otherwise or when no replica is configured.
+         Never write through this session
+    """
+    replica = getattr(request.app.state, "replica", None)
+    if replica is None:
+        async with async_sessionlocal() as db:
+            yield db
+        return
+    async with replica.connect() as connection:
+        async with AsyncSession(bind=connection, autoflush=False, expire_on_commit=False) as db:
+            yield db
+
+def get_read_connect(request: Request):
+    """Connection factory for reads that outlive the request's dependencies (streamed exports)"""
+    replica = getattr(request.app.state, "replica", None)
+    return replica.connect if replica is not None else async_engine.connect
+
+def get_prediction_writer(request: Request):
+    """Write-behind PredictionWriter, None when prediction_write_behind is off"""
+    return getattr(request.app.state, "prediction_writer", None)
+
+def get_search_index(request: Request):
+    """In-process SearchIndex (search_backend = "memory"), else None"""
+    return getattr(request.app.state, "search_index", None)
+
+def get_similarity_index(request: Request):
+    """In-process SimilarityIndex (similar_enabled), else None"""
+    return getattr(request.app.state, "similarity_index", None)
+
+def get_suggest_index(request: Request):
+    """In-process SuggestIndex (suggest_enabled), else None"""
+    return getattr(request.app.state, "suggest_index", None)
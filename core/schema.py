@@ -0,0 +1,314 @@
+# core/schema.py
+import re
+from datetime import date, datetime, timezone
+
+from sqlalchemy import func, inspect, text, update
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.schema import CreateTable
+
+from core.database import Base, SessionLocal
+from dependencies.config import Settings
+from models.case_texts import CaseText
+from models.jobs import BatchJob  # noqa: F401  (every table in Base.metadata)
+from models.predictions import Prediction
+from models.rollups import PredictionRollup
+from services.rollups import rebuild_rollups
+from utils.file_lock import file_lock
+from utils.logger import logger
+
+PARTITION_NAME = re.compile(rf"^{Prediction.__tablename__}_p(\d{{4}})(\d{{2}})$")
+# SQLite: one-off data migrations done, kept in PRAGMA user_version
+SQLITE_TIMESTAMPS_NORMALIZED = 1
+SCHEMA_LOCK_PATH = "data/.schema.lock"
+
+
+def prepare_database(engine: Engine, settings: Settings):
+    """
+    Bring the database schema up to date (tables, columns, indexes, one-off fixes)
+
+    WHY: Done at import time it ran on every `import main` (tests, tools,
+         the gunicorn master) and before logging / settings were ready;
+         the standalone job worker only ran create_all
+    HOW: sync_schema, then a one-off rollup backfill when the rollups table
+         is new. Gunicorn workers start together: a host-wide file lock
+         runs them one at a time, the later ones find nothing to do
+    WHEN: First thing in startup_event (main.py) and in the job worker
+          (python -m services.jobs)
+    """
+    with file_lock(SCHEMA_LOCK_PATH):
+        new_tables = sync_schema(engine,
+                                 partition_predictions=settings.partition_predictions,
+                                 months_ahead=settings.partition_months_ahead,
+                                 full_text_search=settings.search_backend == "database")
+        if PredictionRollup.__tablename__ in new_tables and Prediction.__tablename__ not in new_tables:
+            # rollups added to an existing database: backfill them once
+            with SessionLocal() as db:
+                rebuild_rollups(db)
+
+
+def sync_schema(engine: Engine, partition_predictions: bool = False,
+                months_ahead: int = 2, full_text_search: bool = False) -> set[str]:
+    """
+    Create missing tables AND missing indexes, return the new table names
+
+    WHY: Base.metadata.create_all() skips tables that already exist, so
+         columns and indexes added to a model later never reached
+         existing databases
+    HOW: create_all for new tables; on existing ones ADD COLUMN for new
+         nullable columns and drop NOT NULL where the model relaxed it;
+         then CREATE INDEX for every index declared on a model but not
+         found in the database
+    WHEN: startup (main.py), before the first request
+
+    partition_predictions: on PostgreSQL, a NEW predictions table is
+    created partitioned by month (an existing one is left as it is).
+    full_text_search: set up the database full-text index (search_backend
+    = "database", see ensure_full_text_search).
+    """
+    existing_tables = set(inspect(engine).get_table_names())
+    if engine.dialect.name == "postgresql":
+        if partition_predictions and Prediction.__tablename__ not in existing_tables:
+            _create_partitioned_predictions(engine)
+        if is_partitioned(engine):
+            ensure_month_partitions(engine, months_ahead)
+        elif partition_predictions and Prediction.__tablename__ in existing_tables:
+            logger.warning("!! predictions table is not partitioned (created before partitioning "
+                           "was enabled); retention falls back to chunked deletes")
+    Base.metadata.create_all(bind=engine)
+    for table in Base.metadata.sorted_tables:
+        if table.name in existing_tables:
+            _sync_columns(engine, table)
+
+    inspector = inspect(engine)
+    for table in Base.metadata.sorted_tables:
+        existing = {index["name"] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in existing:
+                logger.info(f">> Creating index {index.name} on {table.name}")
+                index.create(bind=engine, checkfirst=True)
+
+    if engine.dialect.name == "sqlite":
+        _normalize_sqlite_timestamps(engine)
+    if full_text_search:  # after the tables (and any SQLite rebuild of predictions)
+        ensure_full_text_search(engine)
+
+    return {table.name for table in Base.metadata.sorted_tables} - existing_tables
+
+
+def _sync_columns(engine: Engine, table):
+    """Add missing nullable columns, relax NOT NULL where the model allows NULL"""
+    columns = {column["name"]: column for column in inspect(engine).get_columns(table.name)}
+
+    for column in table.columns:
+        if column.name in columns:
+            continue
+        if not column.nullable:
+            logger.warning(f"!! {table.name}.{column.name} is NOT NULL, add it by hand")
+            continue
+        column_type = column.type.compile(dialect=engine.dialect)
+        logger.info(f">> Adding column {table.name}.{column.name}")
+        with engine.begin() as connection:
+            connection.exec_driver_sql(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}")
+
+    relaxed = [
+        column.name for column in table.columns
+        if column.nullable and not column.primary_key
+        and column.name in columns and not columns[column.name]["nullable"]
+    ]
+    if not relaxed:
+        return
+    logger.info(f">> Allowing NULL in {table.name}: {', '.join(relaxed)}")
+    if engine.dialect.name == "sqlite":
+        _rebuild_sqlite_table(engine, table)  # SQLite cannot ALTER a constraint
+        return
+    with engine.begin() as connection:
+        for name in relaxed:
+            connection.exec_driver_sql(f"ALTER TABLE {table.name} ALTER COLUMN {name} DROP NOT NULL")
+
+
+def _rebuild_sqlite_table(engine: Engine, table):
+    """Recreate a SQLite table from the model and copy its rows (indexes are re-created after)"""
+    rebuilt = f"{table.name}__rebuild"
+    ddl = str(CreateTable(table).compile(dialect=engine.dialect)).strip()
+    ddl = ddl.replace(f"CREATE TABLE {table.name} ", f"CREATE TABLE {rebuilt} ", 1)
+    existing = {column["name"] for column in inspect(engine).get_columns(table.name)}
+    copied = ", ".join(column.name for column in table.columns if column.name in existing)
+
+    with engine.begin() as connection:
+        connection.exec_driver_sql(ddl)
+        connection.exec_driver_sql(f"INSERT INTO {rebuilt} ({copied}) SELECT {copied} FROM {table.name}")
+        connection.exec_driver_sql(f"DROP TABLE {table.name}")
+        connection.exec_driver_sql(f"ALTER TABLE {rebuilt} RENAME TO {table.name}")
+
+
+def _normalize_sqlite_timestamps(engine: Engine):
+    """
+    Give server-default timestamps of predictions the format SQLAlchemy binds
+
+    SQLite stores DateTime as text: CURRENT_TIMESTAMP writes
+    "2024-01-01 10:00:00" but bound values are "2024-01-01 10:00:00.000000",
+    and the two never compare equal -> keyset cursors would loop.
+    Only rows saved before predictions got a Python-side default have the
+    short form, so this runs ONCE per database (PRAGMA user_version)
+    """
+    with engine.begin() as connection:
+        if connection.exec_driver_sql("PRAGMA user_version").scalar() >= SQLITE_TIMESTAMPS_NORMALIZED:
+            return
+        column = Prediction.__table__.c.created_at
+        count = connection.execute(
+            update(Prediction.__table__)
+            .where(func.length(column) == 19)
+            .values({column.name: func.strftime("%Y-%m-%d %H:%M:%f000", column)})
+        ).rowcount
+        connection.exec_driver_sql(f"PRAGMA user_version = {SQLITE_TIMESTAMPS_NORMALIZED}")
+    logger.info(f"OK Normalized {count} prediction timestamps (one-off)")
+
+
+# ============ PostgreSQL monthly partitions of predictions ============
+def _create_partitioned_predictions(engine: Engine):
+    """
+    CREATE TABLE predictions ... PARTITION BY RANGE (created_at)
+
+    The DDL is compiled from the model so the columns stay in sync; only
+    the primary key changes, PostgreSQL requires the partition key in it.
+    The ORM keeps using `id` alone (it is still unique: one sequence).
+    """
+    ddl = str(CreateTable(Prediction.__table__).compile(dialect=engine.dialect)).strip()
+    ddl = ddl.replace("PRIMARY KEY (id)", "PRIMARY KEY (id, created_at)")
+    ddl = f"{ddl} PARTITION BY RANGE (created_at)"
+    with engine.begin() as connection:
+        connection.exec_driver_sql(ddl)
+    logger.info("OK predictions table created, partitioned by month")
+
+
+def is_partitioned(engine: Engine) -> bool:
+    if engine.dialect.name != "postgresql":
+        return False
+    with engine.connect() as connection:
+        kind = connection.execute(
+            text("SELECT relkind FROM pg_class WHERE relname = :name AND relkind IN ('r', 'p')"),
+            {"name": Prediction.__tablename__},
+        ).scalar()
+    return kind == "p"
+
+
+def _month_start(year: int, month: int) -> date:
+    # month may run past 12 (next year)
+    return date(year + (month - 1) // 12, (month - 1) % 12 + 1, 1)
+
+
+def month_partitions(engine: Engine) -> dict[str, tuple[date, date]]:
+    """Monthly partitions created by ensure_month_partitions: name -> (from, to)"""
+    with engine.connect() as connection:
+        names = connection.execute(
+            text("SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+                 "WHERE i.inhparent = CAST(:parent AS regclass)"),
+            {"parent": Prediction.__tablename__},
+        ).scalars().all()
+    partitions = {}
+    for name in names:
+        match = PARTITION_NAME.match(name)
+        if match:
+            year, month = int(match.group(1)), int(match.group(2))
+            partitions[name] = (_month_start(year, month), _month_start(year, month + 1))
+    return partitions
+
+
+def ensure_month_partitions(engine: Engine, months_ahead: int = 2):
+    """
+    Partitions for this month and the next `months_ahead`, plus a DEFAULT
+    partition for rows outside of them (e.g. imported history)
+    """
+    table = Prediction.__tablename__
+    today = datetime.now(timezone.utc).date()
+    with engine.begin() as connection:
+        connection.exec_driver_sql(f"CREATE TABLE IF NOT EXISTS {table}_default PARTITION OF {table} DEFAULT")
+
+    for offset in range(months_ahead + 1):
+        start = _month_start(today.year, today.month + offset)
+        end = _month_start(start.year, start.month + 1)
+        name = f"{table}_p{start.year:04d}{start.month:02d}"
+        try:
+            with engine.begin() as connection:
+                connection.exec_driver_sql(
+                    f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF {table} "
+                    f"FOR VALUES FROM ('{start.isoformat()} 00:00:00+00') TO ('{end.isoformat()} 00:00:00+00')"
+                )
+        except DBAPIError as e:
+            # rows of that month already sit in the DEFAULT partition
+            logger.warning(f"!! Could not create partition {name}: {str(e.orig)}")
+
+
+
+# ============ Database full-text search (search_backend = "database") ============
+FTS_TABLE = f"{Prediction.__tablename__}_fts"       # SQLite: FTS5, rowid = predictions.id
+SEARCH_VECTOR = "search_vector"                     # PostgreSQL: tsvector column of case_texts
+SEARCH_CONFIG = "english"                           # PostgreSQL text search configuration
+FULL_TEXT_DIALECTS = ("postgresql", "sqlite")      # databases search_backend = "database" works with
+
+
+def ensure_full_text_search(engine: Engine):
+    """
+    Full-text index maintained by the database itself
+
+    PostgreSQL: case_texts.search_vector, a stored generated tsvector
+    column (each distinct text once) with a GIN index. Rows saved before
+    dedup keep their text inline and are found once moved
+    (python -m services.case_texts)
+    SQLite: a contentless FTS5 table (index only, no copy of the texts)
+    fed by triggers on predictions, filled once from existing rows
+    Other databases: refused here, at startup, instead of failing every /search
+    """
+    if engine.dialect.name not in FULL_TEXT_DIALECTS:
+        raise RuntimeError(f"search_backend = database needs one of {', '.join(FULL_TEXT_DIALECTS)}, "
+                           f"not {engine.dialect.name}: set SEARCH_BACKEND=memory")
+    if engine.dialect.name == "postgresql":
+        _ensure_search_vector(engine)
+    else:
+        _ensure_fts5(engine)
+
+
+def _ensure_search_vector(engine: Engine):
+    table = CaseText.__tablename__
+    columns = {column["name"] for column in inspect(engine).get_columns(table)}
+    if SEARCH_VECTOR not in columns:
+        logger.info(f">> Adding {table}.{SEARCH_VECTOR} (rewrites {table} once)")
+    with engine.begin() as connection:
+        connection.exec_driver_sql(
+            f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS {SEARCH_VECTOR} tsvector "
+            f"GENERATED ALWAYS AS (to_tsvector('{SEARCH_CONFIG}', case_text)) STORED"
+        )
+        connection.exec_driver_sql(
+            f"CREATE INDEX IF NOT EXISTS ix_{table}_{SEARCH_VECTOR} ON {table} USING gin ({SEARCH_VECTOR})"
+        )
+
+
+def _ensure_fts5(engine: Engine):
+    predictions, texts = Prediction.__tablename__, CaseText.__tablename__
+    text_of = (f"coalesce({{row}}.case_text, "
+               f"(SELECT case_text FROM {texts} WHERE hash = {{row}}.case_hash))")
+    created = FTS_TABLE not in inspect(engine).get_table_names()
+    with engine.begin() as connection:
+        connection.exec_driver_sql(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} "
+            f"USING fts5(case_text, content='', tokenize='porter unicode61')"
+        )
+        # contentless: a delete must hand back the exact text that was indexed
+        # (triggers are dropped with the table: re-created after a rebuild)
+        connection.exec_driver_sql(
+            f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_insert AFTER INSERT ON {predictions} BEGIN "
+            f"INSERT INTO {FTS_TABLE} (rowid, case_text) VALUES (new.id, {text_of.format(row='new')}); END"
+        )
+        connection.exec_driver_sql(
+            f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_delete AFTER DELETE ON {predictions} BEGIN "
+            f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}, rowid, case_text) "
+            f"VALUES ('delete', old.id, {text_of.format(row='old')}); END"
+        )
+        if created:
+            count = connection.exec_driver_sql(
+                f"INSERT INTO {FTS_TABLE} (rowid, case_text) "
+                f"SELECT p.id, coalesce(p.case_text, t.case_text) FROM {predictions} p "
+                f"LEFT JOIN {texts} t ON t.hash = p.case_hash"
+            ).rowcount
+            logger.info(f"OK {FTS_TABLE} created, {count} predictions indexed")
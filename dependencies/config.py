@@ -22,6 +22,99 @@ class Settings(BaseSettings):
     debug : bool = False
     max_prediction_length : int  = 1000
     default_confidence_threshold : float = 0.5
+    batch_chunk_size : int = 1000  # rows sent to the model per batched call
+    persist_chunk_size : int = 5000  # rows per INSERT batch / commit when saving predictions
+    dedup_predictions : bool = True  # predict_case reuses the stored answer for a known text + model version
+    export_batch_size : int = 2000   # rows fetched per round trip by /legal/history/export
+    
+    # Retention / archival of predictions (services/retention.py)
+    retention_days : int = 0                   # 0 = keep predictions forever
+    retention_chunk_size : int = 5000          # rows archived + deleted per transaction
+    retention_interval_seconds : float = 3600  # how often the app runs a retention pass
+    archive_dir : str = "data/archive"         # expired rows -> .jsonl.gz per day
+    partition_predictions : bool = True        # PostgreSQL: NEW predictions tables partitioned by month
+    partition_months_ahead : int = 2           # monthly partitions created in advance
+    
+    # Write-behind logging of /legal/legal/predict rows (services/prediction_writer.py)
+    prediction_write_behind : bool = False  # False = commit inside the request (old behaviour)
+    write_behind_flush_ms : float = 200     # flush at least this often...
+    write_behind_batch_size : int = 500     # ...or as soon as this many rows are queued
+    write_behind_queue_size : int = 10_000  # full queue -> the request writes its row itself
+    write_behind_max_retries : int = 5      # failed flushes are retried with backoff, then dropped
+    
+    # SQLite profile for file databases like baro_ai.db (core/database.py)
+    sqlite_tuned : bool = True             # False = driver defaults (rollback journal, no writer queue)
+    sqlite_synchronous : str = "NORMAL"    # with WAL: an app crash loses nothing, a power cut the last commits
+    sqlite_cache_mb : int = 64             # page cache per connection
+    sqlite_mmap_mb : int = 256             # memory-mapped I/O for reads (0 = off)
+    sqlite_busy_timeout_ms : int = 10_000  # wait for another process's write lock instead of failing
+    sqlite_group_commit : int = 64         # queued writes committed in one transaction (1 = commit each)
+    
+    # Full-text search over case texts, /search
+    #   memory   = BM25 index in each worker's memory (services/search_index.py)
+    #   database = tsvector + GIN (PostgreSQL) / FTS5 (SQLite) kept by the database (services/full_text.py)
+    search_backend : str = "memory"
+    search_snapshot_path : str = "data/search/predictions"  # + .npz, reloaded at startup
+    search_refresh_seconds : float = 5.0    # rows written by other processes show up after this
+    search_snapshot_seconds : float = 300   # save the index this often when it changed
+    search_merge_docs : int = 50_000        # new documents kept in the small delta before merging
+    
+    # Similar cases, /legal/similar (services/similarity.py); refresh + snapshot like search_*
+    similar_enabled : bool = True
+    similar_path : str = "data/similar/predictions"  # + .npz snapshot + .<token>.seg vector segments (memory-mapped read-only)
+    similar_dims : int = 256                # hashed TF-IDF vector size (a change rebuilds the index)
+    similar_ivf_min_rows : int = 50_000     # below: exact scan of every vector, above: IVF lists
+    similar_nprobe : int = 8                # IVF lists scanned per query (more = better recall, slower)
+    
+    # Autocomplete, /search/suggest (services/suggest.py); refresh + snapshot like search_*
+    suggest_enabled : bool = True
+    suggest_snapshot_path : str = "data/suggest/terms"  # + .npz, reloaded at startup
+    suggest_max_terms : int = 200_000       # most frequent words kept, rarer ones are forgotten
+    suggest_min_count : int = 2             # words / sections / categories counted fewer times are not suggested
+    
+    # Read replica for history / export / stats (services/replica.py)
+    database_replica_url : str | None = None  # unset = every query runs on DATABASE_URL
+    replica_max_lag_seconds : float = 5.0     # replica further behind -> reads go to the primary
+    replica_check_seconds : float = 5.0       # how often reachability + lag are measured
+    replica_timeout_seconds : float = 2.0     # slower to connect / answer = unreachable
+    
+    # Request size limits (MaxBodySizeMiddleware in main.py)
+    max_body_size : int = 10 * 1024 * 1024         # 10 MB for normal requests
+    max_upload_size : int = 1024 * 1024 * 1024     # 1 GB for batch file uploads
+    upload_path_prefixes : tuple[str, ...] = ("/legal/legal/predict_batch", "/legal/jobs")
+    
+    # Background batch jobs (services/jobs.py, routers/jobs.py)
+    jobs_dir : str = "data/jobs"       # uploaded inputs + result files
+    job_workers : int = 1              # per app process (0 = run `python -m services.jobs` instead)
+    job_poll_seconds : float = 1.0     # how often idle workers look for new jobs
+    job_stale_seconds : float = 60.0   # no heartbeat for this long -> job is resumed elsewhere
+    job_max_attempts : int = 3         # claims before a job that keeps crashing is failed
+    
+    model_version : str = "v1.2.3"       # version loaded at startup (ModelRegistry)
+    # mmap-ed model artifact ({version} is filled in, "" = always load from source).
+    # Written by the first load of a version; rebuilt when the taxonomy file changes.
+    model_artifact_path : str = "data/legal_model-{version}.baro"
+    model_retry_after_seconds : int = 5  # Retry-After sent while the model loads
+    shadow_model_version : str | None = None  # optional shadow model loaded at startup
+    shadow_sample_rate : float = 0.0          # share of requests mirrored to the shadow
+    model_registry_file : str = "model_registry.json"  # shared by all workers ("" = off)
+    model_registry_poll_seconds : float = 2.0
+    
+    # Where the model runs (services/executor.py): "thread" or "process"
+    inference_executor : str = "thread"
+    inference_workers : int = 4  # threads or worker processes
+    
+    # Micro-batching of single-text inference (services/batcher.py)
+    micro_batch_enabled : bool = True
+    micro_batch_window_ms : float = 5.0   # how long to wait for more requests
+    micro_batch_max_size : int = 64       # run as soon as this many are waiting
+    micro_batch_queue_depth : int = 1024  # beyond this -> 503 "Server is busy"
+    
+    # Prediction result cache (services/cache.py)
+    cache_enabled : bool = True
+    cache_max_entries : int = 10_000
+    cache_max_bytes : int = 16 * 1024 * 1024  # 16 MB
+    cache_ttl_seconds : float = 3600
     
     class Config:
         env_file = ".env"
@@ -1,9 +1,18 @@
-from functools import lru_cache
+from fastapi import Request
 
+import os
 import time
 
+import numpy as np
+
+from dependencies.config import get_settings
 from utils.exceptions import ModelNotLoadedException, PredictionException
 from utils.logger import logger
+from services.artifacts import ModelArtifact, write_artifact
+from services.classifier import (AUTOMATON_FORMAT, KeywordClassifier, compile_automaton, load_taxonomy,
+                                 taxonomy_digest)
+
+TASKS = ("category", "crime")
 
 class FakeLegalModel:
     """
@@ -14,31 +23,91 @@ class FakeLegalModel:
     - model = joblib.load("sklearn_model.pkl")
     - model = transformers.AutoModel.from_pretrained("...")
     """
-    def __init__(self):
+    def __init__(self, model_version: str | None = None, taxonomy_path: str | None = None,
+                 artifact_path: str | None = None):
         #print("Loading Legal AI Model... (this takes time!)")
         try:
-            logger.info(">> Loading Legal AI Model...")
-            time.sleep(2)  # Simulate slow model loading
+            settings = get_settings()
+            model_version = model_version or settings.model_version
+            artifact_path = (artifact_path or settings.model_artifact_path).format(version=model_version)
+            logger.info(f">> Loading Legal AI Model {model_version}...")
+            
+            digest = taxonomy_digest(taxonomy_path)
+            self.artifact = self._open_artifact(artifact_path, digest, model_version) if artifact_path else None
+            if self.artifact is not None:
+                # mmap: the automaton tables are used in place, every worker
+                # on this host shares one copy of them (page cache)
+                taxonomy = self.artifact.json("taxonomy")
+                tables = {task: self._artifact_tables(task) for task in TASKS}
+                logger.info(f"   Mapped model artifact {artifact_path}")
+            else:
+                time.sleep(2)  # Simulate slow model loading
+                taxonomy = load_taxonomy(taxonomy_path)
+                # Compile keyword rules ONCE (one automaton per task)
+                tables = {task: compile_automaton(taxonomy[task]) for task in TASKS}
+                if artifact_path:
+                    # first worker pays the load, the others just map the file
+                    self._save_artifact(artifact_path, model_version, taxonomy, digest, tables)
+            
+            self.category_classifier = KeywordClassifier(taxonomy["category"], tables["category"])
+            self.crime_classifier = KeywordClassifier(taxonomy["crime"], tables["crime"])
             #print("Model loaded successfully!")
             logger.info("Model loaded successfully..!")
-            self.model_version = "v1.2.3"
+            self.model_version = model_version
         except Exception as e:
             logger.error(f"XX model loading failed: {str(e)}")
             raise ModelNotLoadedException("Failed to load ML model..!")
+    
+    @staticmethod
+    def _open_artifact(path: str, digest: str, model_version: str) -> ModelArtifact | None:
+        """
+        The artifact at `path`, or None (rebuilt by the caller) if missing,
+        unreadable (truncated, corrupt) or built for another model version,
+        taxonomy or automaton layout
+        """
+        if not os.path.exists(path):
+            return None
+        try:
+            artifact = ModelArtifact(path)
+        except (ValueError, OSError) as e:
+            logger.warning(f"!! Model artifact {path} is unreadable, rebuilding: {str(e)}")
+            return None
+        if artifact.metadata.get("model_version") != model_version:
+            logger.warning(f"!! Model artifact {path} was built for model "
+                           f"{artifact.metadata.get('model_version')}, rebuilding")
+            artifact.close()
+            return None
+        if artifact.metadata.get("taxonomy_sha256") != digest:
+            logger.warning(f"!! Model artifact {path} was built from another taxonomy, rebuilding")
+            artifact.close()
+            return None
+        if artifact.metadata.get("automaton_format") != AUTOMATON_FORMAT:
+            logger.warning(f"!! Model artifact {path} has an old automaton layout, rebuilding")
+            artifact.close()
+            return None
+        return artifact
+    
+    def _artifact_tables(self, task: str) -> dict:
+        return {
+            **self.artifact.metadata["automata"][task],  # width, accepting_rows, start
+            "classes": self.artifact.section(f"{task}.classes"),
+            "delta": self.artifact.int32(f"{task}.delta"),
+            "output_offsets": self.artifact.int32(f"{task}.output_offsets"),
+            "outputs": self.artifact.int32(f"{task}.outputs"),
+        }
+    
+    @staticmethod
+    def _save_artifact(path: str, model_version: str, taxonomy: dict, digest: str, tables: dict):
+        try:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            write_model_artifact(path, model_version, taxonomy, digest, tables)
+        except OSError as e:
+            logger.warning(f"!! Could not write model artifact {path}: {str(e)}")
         
     def predict_category(self, text: str) -> tuple[str, float]:
         """Predict legal category"""
         try:
-            text_lower = text.lower()
-        
-            if "property" in text_lower:
-                return "Property Law", 0.80
-            elif "contract" in text_lower:
-                return "Contract Law", 0.80
-            elif "family" in text_lower or "divorce" in text_lower:
-                return "Family Law", 0.80
-            else:
-                return "General Law", 0.80
+            return self.category_classifier.predict(text)
         except Exception as e:
             logger.error(f"XX Prediction failed:{str(e)}")
             raise PredictionException("case prediction failed")
@@ -46,29 +115,83 @@ class FakeLegalModel:
     def predict_crime(self, text: str) -> tuple[str, float]:
         """Predict crime type"""
         try:
-            text_lower = text.lower()
-        
-            if "theft" in text_lower:
-                return "IPC 379 - Theft", 0.92
-            elif "assault" in text_lower:
-                return "IPC 323 - Assault", 0.88
-            elif "fraud" in text_lower:
-                return "IPC 420 - Cheating", 0.85
-            else:
-                return "IPC General Section", 0.65
+            return self.crime_classifier.predict(text)
         except Exception as e:
             logger.error(f"Prediction failed: {str(e)}")
             raise PredictionException("FIR classification Failed ")
+    
+    def predict_category_batch(self, texts) -> tuple[np.ndarray, np.ndarray]:
+        """Predict legal category for many texts, vectorized for large batches (arrays aligned with input)"""
+        try:
+            return self.category_classifier.predict_many(texts)
+        except Exception as e:
+            logger.error(f"XX Batch prediction failed: {str(e)}")
+            raise PredictionException("batch case prediction failed")
+    
+    def predict_crime_batch(self, texts) -> tuple[np.ndarray, np.ndarray]:
+        """Predict crime type for many texts, vectorized for large batches (arrays aligned with input)"""
+        try:
+            return self.crime_classifier.predict_many(texts)
+        except Exception as e:
+            logger.error(f"XX Batch prediction failed: {str(e)}")
+            raise PredictionException("batch FIR classification failed")
+
+def write_model_artifact(path: str, model_version: str, taxonomy: dict, digest: str,
+                         tables: dict | None = None):
+    """
+    Artifact for FakeLegalModel: the taxonomy (labels, confidences) as JSON
+    plus the compiled automaton of each task as mapped sections
+    """
+    tables = tables or {task: compile_automaton(taxonomy[task]) for task in TASKS}
+    sections = {"taxonomy": ("json", taxonomy)}
+    automata = {}
+    for task in TASKS:
+        sections[f"{task}.classes"] = ("bytes", tables[task]["classes"])
+        sections[f"{task}.delta"] = ("int32", tables[task]["delta"])
+        sections[f"{task}.output_offsets"] = ("int32", tables[task]["output_offsets"])
+        sections[f"{task}.outputs"] = ("int32", tables[task]["outputs"])
+        automata[task] = {key: tables[task][key] for key in ("width", "accepting_rows", "start")}
+    write_artifact(path, sections, metadata={"model_version": model_version, "taxonomy_sha256": digest,
+                                             "automaton_format": AUTOMATON_FORMAT, "automata": automata})
+
+
+def _ready_registry(request: Request):
+    """
+    Shared ModelRegistry, or a fast 503 + Retry-After while it is not ready
+    
+    WHY: The model loads in the background; endpoints must not wait for it
+    """
+    registry = getattr(request.app.state, "model_registry", None)
+    if registry is None or not registry.ready:
+        status = registry.status if registry is not None else "loading"
+        raise ModelNotLoadedException(
+            detail=f"ML model is {status}, try again shortly",
+            retry_after=get_settings().model_retry_after_seconds,
+        )
+    return registry
+
+
+def get_model_registry(request: Request):
+    """Get the ModelRegistry (active / shadow versions, hot swap)"""
+    return _ready_registry(request)
+
 
-@lru_cache()  # IMPORTANT: Load model once, cache forever!
-def get_legal_model() -> FakeLegalModel:
+def get_legal_model(request: Request) -> FakeLegalModel:
     """
-    Get ML model instance (cached)
+    Get the ONE shared ACTIVE model instance (owned by the ModelRegistry)
     
-    WHY: Loading models is SLOW (takes seconds)
-    HOW: @lru_cache loads once, reuses forever
-    WHEN: First request loads model, subsequent requests use cached model
+    WHY: Loading models is SLOW (takes seconds) - never load a second copy
+    HOW: Reads request.app.state.model_registry
+    WHEN: Every endpoint that needs the model
+    """
+    return _ready_registry(request).model
+
+
+def get_inference(request: Request):
+    """
+    Get the shared InferenceService (created once the model is loaded)
     
-    In production, this saves HUGE amounts of time!
+    WHY: All model calls go through one place (cache, micro-batching, executor)
+    HOW: Reads request.app.state.model_registry
     """
-    return FakeLegalModel()
\ No newline at end of file
+    return _ready_registry(request).inference
@@ -37,7 +37,9 @@ errorlog = "-"
 loglevel = 'info'
 max_requests = 1000  # Restart workers (memory leak protection)
 max_requests_jitter = 100
-preload_app = True
+preload_app = True  # app code imported once in master (models load per worker in
+                    # startup_event); INFERENCE_EXECUTOR=process pools are per
+                    # worker too, their processes start from a forkserver
 graceful_timeout = 30
 
 # =====================================================
@@ -1,5 +1,6 @@
 # main.py
 from fastapi import FastAPI , Request
+from fastapi.concurrency import run_in_threadpool
 from dotenv import load_dotenv
 import os
 
@@ -31,11 +32,25 @@ from utils.error_handlers import (
 from middleware.logging import LoggingMiddleware
 
 from dependencies.models import FakeLegalModel
-
-from core.database import engine , Base
+from dependencies.config import get_settings
+from services.registry import ModelRegistry
+from services.jobs import JobRunner
+from services.prediction_writer import PredictionWriter
+from services.retention import RetentionManager
+from services.replica import ReplicaRouter
+from services.search_index import SearchIndex
+from services.similarity import SimilarityIndex
+from services.suggest import SuggestIndex
+
+from core.database import engine , Base, async_engine
+from core.schema import prepare_database
+from core.database import SessionLocal, sqlite_writer
 from models.predictions import Prediction
+from models.jobs import BatchJob
+from models.rollups import PredictionRollup
+from models.case_texts import CaseText
 
-from routers import auth , legal
+from routers import auth , legal, models, jobs
 
 from core.limiter import limiter
 from slowapi.middleware import SlowAPIMiddleware
@@ -68,7 +83,8 @@ async def startup_event():
     
     WHY: Load heavy resources before first request
     WHAT: ML models, database connections, caches
-    WHEN: Server startup (before accepting requests)
+    WHEN: Server startup (the model keeps loading in the background,
+          /api/ready says when model endpoints can be used)
     """
     logger.info("=" * 60)
     logger.info(">> BARO AI API Starting...")
@@ -76,17 +92,49 @@ async def startup_event():
     logger.info(f"  Environment: {os.getenv('DEBUG', 'production')}")
     logger.info("=" * 60)
     
-    # Load ML Model
-    logger.info(">> Loading ML Model...")
-    try:
-        app.state.legal_model = FakeLegalModel()
-        logger.info(f"OK Model loaded! Version: {app.state.legal_model.model_version}")
-    except Exception as e:
-        logger.error(f"XX Failed to load model: {str(e)}")
-        raise  # Stop server if model fails to load
+    # Schema first: everything below reads or writes the tables
+    await run_in_threadpool(prepare_database, engine, get_settings())
+    
+    # Load ML Model in the background (+ inference service once loaded)
+    app.state.model_registry = ModelRegistry(FakeLegalModel, get_settings())
+    app.state.model_registry.start()
+    
+    # Write-behind logging of predictions (optional)
+    if get_settings().prediction_write_behind:
+        app.state.prediction_writer = PredictionWriter(get_settings())
+        app.state.prediction_writer.start()
+    
+    # Archive + delete expired predictions (optional)
+    if get_settings().retention_days > 0:
+        app.state.retention = RetentionManager(get_settings())
+        app.state.retention.start()
+    
+    # Read replica for history / export / stats (optional)
+    if get_settings().database_replica_url:
+        app.state.replica = ReplicaRouter(get_settings())
+        app.state.replica.start()
+    
+    # Full-text search index (snapshot + catch-up in the background)
+    if get_settings().search_backend == "memory":
+        app.state.search_index = SearchIndex(get_settings())
+        app.state.search_index.start()
+    
+    # Similar-case vectors (memory-mapped, catch-up in the background)
+    if get_settings().similar_enabled:
+        app.state.similarity_index = SimilarityIndex(get_settings())
+        app.state.similarity_index.start()
+    
+    # Autocomplete counts (snapshot + catch-up in the background)
+    if get_settings().suggest_enabled:
+        app.state.suggest_index = SuggestIndex(get_settings())
+        app.state.suggest_index.start()
+    
+    # Background batch job workers (wait for the model before claiming jobs)
+    app.state.job_runner = JobRunner(get_settings(), app.state.model_registry)
+    app.state.job_runner.start()
     
     logger.info("=" * 60)
-    logger.info("OK BARO AI API Ready!")
+    logger.info("OK BARO AI API accepting requests (model loading...)")
     logger.info("=" * 60)
 
 
@@ -103,10 +151,52 @@ async def shutdown_event():
     logger.info("XX BARO AI API Shutting Down...")
     logger.info("Cleaning up resources...")
     
-    # Cleanup model (if needed)
-    if hasattr(app.state, "legal_model"):
+    # Stop job workers first: running jobs are put back in the queue
+    if hasattr(app.state, "job_runner"):
+        logger.info("   Stopping batch job workers...")
+        await app.state.job_runner.stop()
+        del app.state.job_runner
+    
+    # Cleanup model + inference service (if needed)
+    if hasattr(app.state, "model_registry"):
         logger.info("   Unloading ML model...")
-        del app.state.legal_model
+        await app.state.model_registry.stop()
+        del app.state.model_registry
+    
+    if hasattr(app.state, "retention"):
+        await app.state.retention.stop()
+        del app.state.retention
+    
+    # Flush predictions still waiting in the write-behind queue
+    if hasattr(app.state, "prediction_writer"):
+        logger.info("   Flushing queued predictions...")
+        await app.state.prediction_writer.stop()
+        del app.state.prediction_writer
+    
+    if hasattr(app.state, "replica"):
+        await app.state.replica.stop()
+        del app.state.replica
+    
+    # Snapshot the search index (after the last writes were published)
+    if hasattr(app.state, "search_index"):
+        logger.info("   Saving search index...")
+        await app.state.search_index.stop()
+        del app.state.search_index
+    if hasattr(app.state, "similarity_index"):
+        logger.info("   Saving similar-case index...")
+        await app.state.similarity_index.stop()
+        del app.state.similarity_index
+    if hasattr(app.state, "suggest_index"):
+        logger.info("   Saving suggest index...")
+        await app.state.suggest_index.stop()
+        del app.state.suggest_index
+    
+    # Let the SQLite writer finish queued writes
+    if sqlite_writer is not None:
+        sqlite_writer.close()
+    
+    # Close pooled async database connections
+    await async_engine.dispose()
     
     logger.info("OK Shutdown complete!")
     logger.info("=" * 80)
@@ -139,6 +229,8 @@ app.include_router(legal.router)
 app.include_router(users.router)
 app.include_router(search.router)
 app.include_router(auth.router)
+app.include_router(models.router)
+app.include_router(jobs.router)
 app.include_router(legal.router)
 
 # aading rate limiter instance 
@@ -163,6 +255,8 @@ def root():
             "fir_classification": "/legal/fir-classify",
             "user_info": "/users/{user_id}",
             "search": "/search?q=query",
+            "suggest": "/search/suggest?prefix=...",
+            "similar_cases": "/legal/similar?text=...",
             "Logging test" :"/logging",
             "exception" : "/exception",
             "error handler" : "/use each functions path"
@@ -172,17 +266,40 @@ def root():
 
 @app.get("/api/health", tags=["Main"])
 def health_check(request : Request):
-    """Health check endpoint"""
-    model_loaded = hasattr(request.app.state , "legal_model")
-    model_version = request.app.state.legal_model.model_version if model_loaded  else "N/A"
+    """Health check endpoint (liveness - answers while the model is loading)"""
+    registry = getattr(request.app.state, "model_registry", None)
+    model_loaded = registry is not None and registry.ready
+    model_version = registry.active_version if model_loaded  else "N/A"
     return {
         "status": "healthy",
         "app": os.getenv("API_NAME"),
-        "Model loaded": True,
-        "Model version" : "v1.2.3"
+        "Model loaded": model_loaded,
+        "Model version" : model_version
     }
 
 
+@app.get("/api/ready", tags=["Main"])
+def readiness_check(request : Request):
+    """
+    Readiness endpoint
+    
+    200 when the model is ready, 503 while it is loading or if it failed
+    (load balancers / rolling deploys should route traffic on this)
+    """
+    registry = getattr(request.app.state, "model_registry", None)
+    if registry is None:
+        return JSONResponse(status_code=503, content={"status": "loading"})
+    
+    body = registry.describe()
+    if registry.ready:
+        return body
+    return JSONResponse(
+        status_code=503,
+        content=body,
+        headers={"Retry-After": str(get_settings().model_retry_after_seconds)}
+    )
+
+
 #========= Logging and exceptions ============================
 @app.get("/Logging", tags={"Logging Test"})
 def test_logger():
@@ -281,27 +398,88 @@ def test_crash():
     return {"result": result}
 
 
-Base.metadata.create_all(bind = engine) # creates table automaticlay
-
 #Global Request Size Limit (Production)
-from starlette.middleware.base import BaseHTTPMiddleware
-class MaxBodySizeMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request, call_next):
-        # 1024*10 = 10 kb
-        max_body_size = 1024*1024*10 # for mb 1024*1024*10 = 10mb 
+class BodyTooLarge(Exception):
+    pass
+
+
+class MaxBodySizeMiddleware:
+    """
+    Reject payloads above the size limit WITHOUT buffering them
+    
+    WHY: `await request.body()` kept every request body in memory
+    HOW: Check Content-Length up front, and count bytes as they stream in
+         for requests without one. Upload endpoints get their own limit.
+    """
+    def __init__(self, app):
+        self.app = app
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        
+        settings = get_settings()
+        path = scope["path"]
+        max_body_size = (
+            settings.max_upload_size
+            if path.startswith(settings.upload_path_prefixes)
+            else settings.max_body_size  # 1024*1024*10 = 10mb
+        )
+        
+        headers = dict(scope["headers"])
+        content_length = headers.get(b"content-length")
+        if content_length and content_length.isdigit() and int(content_length) > max_body_size:
+            response = JSONResponse( status_code=413, content={"detail" :"paylaod too large"})
+            return await response(scope, receive, send)
+        
+        received = 0
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > max_body_size:
+                    raise BodyTooLarge()
+            return message
+        
+        response_started = False
+        async def tracking_send(message):
+            nonlocal response_started
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
         
-        body = await request.body()
-        if len(body) > max_body_size:
-            return JSONResponse( status_code=413, content={"detail" :"paylaod too large"})
-        return await call_next(request)
+        try:
+            await self.app(scope, limited_receive, tracking_send)
+        except BodyTooLarge:
+            if response_started:
+                raise
+            response = JSONResponse( status_code=413, content={"detail" :"paylaod too large"})
+            await response(scope, receive, send)
     
 app.add_middleware(MaxBodySizeMiddleware)
 
 @app.get("/metrics")
-def metrics():
+def metrics(request: Request):
+    registry = getattr(request.app.state, "model_registry", None)
+    inference = registry.inference if registry is not None else None
+    job_runner = getattr(request.app.state, "job_runner", None)
+    prediction_writer = getattr(request.app.state, "prediction_writer", None)
+    replica = getattr(request.app.state, "replica", None)
+    search_index = getattr(request.app.state, "search_index", None)
+    similarity_index = getattr(request.app.state, "similarity_index", None)
+    suggest_index = getattr(request.app.state, "suggest_index", None)
     return {
         "service": "BARO AI API",
         "status": "running",
         "version": "1.0",
-        "environment": "production"
+        "environment": "production",
+        "inference": inference.stats() if inference else {},
+        "jobs": job_runner.stats() if job_runner else {},
+        "prediction_writer": prediction_writer.stats() if prediction_writer else {},
+        "replica": replica.stats() if replica else {},
+        "sqlite_writer": sqlite_writer.stats() if sqlite_writer else {},
+        "search_index": search_index.stats() if search_index else {},
+        "similarity_index": similarity_index.stats() if similarity_index else {},
+        "suggest_index": suggest_index.stats() if suggest_index else {}
     }
\ No newline at end of file
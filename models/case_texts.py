@@ -0,0 +1,15 @@
+from sqlalchemy import Column, String, DateTime
+from sqlalchemy.sql import func
+from core.database import Base
+
+
+class CaseText(Base):
+    """
+    Every distinct case text, stored once and addressed by its SHA-256
+
+    Predictions point at it through `case_hash` (services/case_texts.py)
+    """
+    __tablename__ = "case_texts"
+    hash = Column(String(64), primary_key=True)  # sha256 hex of the UTF-8 text
+    case_text = Column(String, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -0,0 +1,40 @@
+from sqlalchemy import Column, Integer, String, Float, DateTime, Text, BigInteger, Boolean
+from sqlalchemy.sql import func
+from core.database import Base
+
+
+class BatchJob(Base):
+    """
+    One uploaded batch file, processed in the background (services/jobs.py)
+
+    The row is also the job's checkpoint: `last_row` / `result_bytes` are
+    committed after every chunk, so a restarted worker resumes from there.
+    """
+    __tablename__ = "batch_jobs"
+    id = Column(String(32), primary_key=True)  # uuid4 hex
+    status = Column(String(20), nullable=False, index=True)  # queued / running / succeeded / failed
+    filename = Column(String(255))
+    input_format = Column(String(10), nullable=False)   # csv / jsonl
+    output_format = Column(String(10), nullable=False)  # ndjson / csv
+    text_field = Column(String(100), nullable=False)
+    input_path = Column(String(500), nullable=False)
+    result_path = Column(String(500), nullable=False)
+    input_bytes = Column(BigInteger, nullable=False, default=0)
+    persist = Column(Boolean, nullable=False, default=False)  # also save rows to predictions
+
+    # progress / checkpoint
+    processed_rows = Column(Integer, nullable=False, default=0)
+    last_row = Column(Integer, nullable=False, default=0)        # last input row already classified
+    bytes_read = Column(BigInteger, nullable=False, default=0)   # approximate position in the input
+    result_bytes = Column(BigInteger, nullable=False, default=0)  # committed size of the result file
+    busy_seconds = Column(Float, nullable=False, default=0.0)    # time spent processing (throughput)
+
+    # claiming
+    worker_id = Column(String(100))
+    attempts = Column(Integer, nullable=False, default=0)
+    heartbeat_at = Column(DateTime(timezone=True))
+    error = Column(Text)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
+    started_at = Column(DateTime(timezone=True))
+    finished_at = Column(DateTime(timezone=True))
@@ -1,12 +1,34 @@
-from sqlalchemy import Column , Integer , String , Float , DateTime
+from datetime import datetime, timezone
+
+from sqlalchemy import Column , Integer , String , Float , DateTime, Index
 from sqlalchemy.sql import func
 from core.database import Base
 
+
+def _utcnow():
+    return datetime.now(timezone.utc)
+
+
 class Prediction(Base):
     __tablename__ = "predictions"
     id  = Column(Integer ,primary_key=True , index=True)
-    case_text = Column(String, nullable=False)
+    # new rows keep the text in case_texts (by case_hash), legacy rows inline
+    case_text = Column(String, nullable=True)
+    case_hash = Column(String(64), nullable=True)
     category = Column(String(100),nullable=False)
-    confidence = Column(Float, nullable=False)  
-    model_version = Column(String(20), nullable=False) 
-    created_at = Column(DateTime(timezone=True),server_default=func.now())
+    confidence = Column(Float, nullable=False)
+    model_version = Column(String(20), nullable=False)
+    # python default as well: SQLite keeps CURRENT_TIMESTAMP without microseconds,
+    # which would not compare equal to bound cursor values (keyset pagination)
+    created_at = Column(DateTime(timezone=True),server_default=func.now(), default=_utcnow)
+
+    # Keyset pagination of /legal/legal/history walks (created_at, id)
+    # newest first; each filter gets its own index with the same tail so
+    # every page is one index range scan, whatever the table size
+    __table_args__ = (
+        Index("ix_predictions_created_at_id", "created_at", "id"),
+        Index("ix_predictions_category_created_at_id", "category", "created_at", "id"),
+        Index("ix_predictions_model_version_created_at_id", "model_version", "created_at", "id"),
+        # dedup lookup in predict_case (+ finding unreferenced case texts)
+        Index("ix_predictions_case_hash_model_version", "case_hash", "model_version"),
+    )
@@ -0,0 +1,23 @@
+from sqlalchemy import Column, Integer, String, Float, DateTime, PrimaryKeyConstraint
+from core.database import Base
+
+
+class PredictionRollup(Base):
+    """
+    Predictions per (hour, category, model_version), kept up to date on
+    every insert / delete (services/rollups.py) so /legal/stats never
+    scans the predictions table
+
+    The sum (not the average) of confidences is stored so rows can be
+    added and removed exactly.
+    """
+    __tablename__ = "prediction_rollups"
+    bucket = Column(DateTime(timezone=True), nullable=False)  # start of the hour, UTC
+    category = Column(String(100), nullable=False)
+    model_version = Column(String(20), nullable=False)
+    count = Column(Integer, nullable=False, default=0)
+    confidence_sum = Column(Float, nullable=False, default=0.0)
+
+    __table_args__ = (
+        PrimaryKeyConstraint("bucket", "category", "model_version"),
+    )
@@ -0,0 +1,62 @@
+# routers/jobs.py
+from fastapi import APIRouter, Depends, File, HTTPException, Query, UploadFile, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse
+from sqlalchemy.orm import Session
+
+from core.dependencies import get_db
+from core.security import verify_api_key
+from dependencies.config import Settings, get_settings
+from models.jobs import BatchJob
+from services.jobs import SUCCEEDED, create_job, job_summary
+
+router = APIRouter(
+    prefix="/legal/jobs",
+    tags=["Batch Jobs"],
+    dependencies=[Depends(verify_api_key)],
+)
+
+
+def _get_job_or_404(job_id: str, db: Session) -> BatchJob:
+    job = db.get(BatchJob, job_id)
+    if job is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Job not found")
+    return job
+
+
+@router.post("", status_code=status.HTTP_202_ACCEPTED)
+async def submit_job(
+    file: UploadFile = File(...),
+    output: str = Query(default="ndjson", pattern="^(ndjson|csv)$", description="Result file format"),
+    input_format: str = Query(default="auto", pattern="^(auto|csv|jsonl)$"),
+    text_field: str = Query(default="Crime Type", description="CSV column / JSON key holding the text"),
+    persist: bool = Query(default=False, description="Also save every prediction (bulk insert)"),
+    settings: Settings = Depends(get_settings),
+):
+    """
+    Queue a batch file (CSV / JSONL, optionally gzip) for background classification
+
+    Returns the job id right away; poll GET /legal/jobs/{job_id} for progress.
+    """
+    job = await run_in_threadpool(create_job, settings, file.file, file.filename,
+                                  input_format, text_field, output, persist)
+    return job_summary(job)
+
+
+@router.get("/{job_id}")
+def get_job(job_id: str, db: Session = Depends(get_db)):
+    """Status, progress and throughput of a batch job"""
+    return job_summary(_get_job_or_404(job_id, db))
+
+
+@router.get("/{job_id}/result")
+def download_job_result(job_id: str, db: Session = Depends(get_db)):
+    """Result file of a finished job (NDJSON or CSV)"""
+    job = _get_job_or_404(job_id, db)
+    if job.status != SUCCEEDED:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT,
+                            detail=f"Job is {job.status}, results are not ready")
+
+    media_type = "text/csv" if job.output_format == "csv" else "application/x-ndjson"
+    return FileResponse(job.result_path, media_type=media_type,
+                        filename=f"{job.id}.{job.output_format}")
@@ -8,7 +8,8 @@ from dependencies.Request_id import get_request_id # import dependecies
 
 from dependencies.config import get_settings , Settings # import Config
 
-from dependencies.models import get_legal_model , FakeLegalModel # importing model
+from dependencies.models import get_legal_model , FakeLegalModel, get_inference # importing model
+from services.inference import InferenceService
 
 from dependencies.auth import verify_api_key
 
@@ -18,12 +19,30 @@ from fastapi.concurrency import run_in_threadpool
 
 from fastapi import APIRouter, UploadFile,File,Request
 from fastapi.concurrency import run_in_threadpool
-import csv
-from io import StringIO
+import io
+from fastapi import Query, Response
+from datetime import datetime
+from services.history import encode_cursor, history_filters, history_page_query, iter_export, rows_by_id
+from fastapi.responses import StreamingResponse
+from services.batch_io import (CSV_COLUMNS, PERSISTED_CSV_COLUMNS, GzipChunker, classify_chunks,
+                               detect_input_format, iter_texts, open_text_stream,
+                               to_csv, to_ndjson)
+from services.persistence import persist_records, remove_prediction, save_prediction
+from services.case_texts import find_prediction, text_hash
+from core.database import run_write_async
+from services.events import prediction_events
+from services.rollups import apply_rollups, as_utc, hour_bucket, prediction_row, summarize
+from models.rollups import PredictionRollup
 
 # adding database for the Prediction model
-from core.dependencies import get_db
+from core.dependencies import (get_db, get_async_db, get_prediction_writer, get_read_connect, get_read_db,
+                               get_similarity_index, get_suggest_index)
+from services.prediction_writer import PredictionWriter
+from services.similarity import SimilarityIndex
+from services.suggest import SuggestIndex
+from sqlalchemy import select
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from models.predictions import Prediction
 
 
@@ -66,10 +85,10 @@ async def case_analyze(request: CaseRequest ,
                  request_M : Request,
                  request_id : str = Depends(get_request_id),
                  settings: Settings =  Depends(get_settings),
-                 model: FakeLegalModel = Depends(get_legal_model)):
+                 model: FakeLegalModel = Depends(get_legal_model),
+                 inference: InferenceService = Depends(get_inference)):
     
-                # Get model from app.state (loaded at startup)
-                model = request_M.app.state.legal_model
+                # model comes from the shared ModelProvider (503 until loaded)
                  
                 logger.info(f">> processing case analysis for request : {request_id}")
                 logger.info(f"   [BARO AI] Request: {request_id}")
@@ -78,12 +97,9 @@ async def case_analyze(request: CaseRequest ,
                 # use the model
                 #category , confidence = model.predict_category(request_body.case_text)
                 
-                # Run blocking prediction in threadpool 
-                # so it doesn't block the event loop
-                category, confidence = await run_in_threadpool(
-                model.predict_category,
-                body.case_text,
-                 )
+                # Micro-batched with other concurrent requests,
+                # runs in threadpool so it doesn't block the event loop
+                category, confidence = await inference.predict_category(body.case_text)
 #---------------------------------------------------------------------#    
 #settings: Settings =  Depends(get_settings),
 #"This line defines a settings variable that takes the shape of the
@@ -109,26 +125,9 @@ async def case_analyze(request: CaseRequest ,
     
                 print(f"Using model version: {model.model_version}")
                
-                # Dummy logic (replace with ML model later)
-                
-                case_lower = request.case_text.lower()
-    
                 # Use settings in logic 
                 if len(request.case_text) > settings.max_prediction_length:
                     print(f" Case text too long! MAX: {settings.max_prediction_length}")
-        
-                if "property" in case_lower or "land" in case_lower:
-                    category = "Property Law"
-                    confidence = 0.85
-                elif "contract" in case_lower or "agreement" in case_lower:
-                    category = "Contract Law"
-                    confidence = 0.85
-                elif "divorce" in case_lower or "marriage" in case_lower:
-                    category = "Family Law"
-                    confidence = 0.82
-                else:
-                    category = "General Law"
-                    confidence = settings.default_confidence_threshold
     
                 print(f"Completed request {request_id}") # prints request id
     
@@ -142,10 +141,12 @@ async def case_analyze(request: CaseRequest ,
 
 @router.post("/fir-classify", response_model=FIRResponse, 
              dependencies=[Depends(verify_api_key)]) # Protect this endpoint
-def classify_fir(request: FIRRequest ,
+async def classify_fir(request: FIRRequest ,
                  request_id:str = Depends(get_request_id),
                  settings:Settings = Depends(get_settings),
-                 model : FakeLegalModel = Depends(get_legal_model)):
+                 model : FakeLegalModel = Depends(get_legal_model),
+                 inference: InferenceService = Depends(get_inference),
+                 suggest_index: SuggestIndex | None = Depends(get_suggest_index)):
     """
     Classify FIR and predict IPC section
     
@@ -159,26 +160,13 @@ def classify_fir(request: FIRRequest ,
     
     print(f"Using model version: {model.model_version}")
     
-    crime_type, confidence = model.predict_crime(request.description)
+    crime_type, confidence = await inference.predict_crime(request.description)
+    if suggest_index is not None:  # frequent sections rank first in /search/suggest
+        suggest_index.record("section", crime_type)
     
     # use teh settings logic 
     if len(request.description)>settings.max_prediction_length:
         print(f"Fir text too long! MAX:{settings.max_prediction_length}")
-    # Dummy logic (replace with ML model later)
-    desc_lower = request.description.lower()
-    
-    if "theft" in desc_lower or "stolen" in desc_lower:
-        crime_type = "IPC 379 - Theft"
-        confidence = 0.92
-    elif "assault" in desc_lower or "attack" in desc_lower:
-        crime_type = "IPC 323 - Assault"
-        confidence = 0.88
-    elif "fraud" in desc_lower or "cheating" in desc_lower:
-        crime_type = "IPC 420 - Cheating"
-        confidence = 0.95
-    else: 
-        crime_type = "IPC General Section"
-        confidence = settings.default_confidence_threshold
     
     print(f"Completed request {request_id}") # prints request id
     
@@ -191,42 +179,92 @@ def classify_fir(request: FIRRequest ,
 
 ###########################################
 
+async def classify_upload(raw, filename: str | None, input_format: str, text_field: str,
+                          settings: Settings, inference: InferenceService, persist: bool = False):
+    """
+    Stream an uploaded file through the model, one chunk at a time
+    
+    WHY: Reading the whole upload into memory needed GBs for big files
+    HOW: The spooled upload is parsed row by row (in the threadpool),
+         `chunk_size` texts at a time go to ONE batched model call,
+         and each chunk of results is yielded before the next is read
+         With `persist`, every chunk is also bulk-saved to the
+         predictions table (records get their new "id"). The whole upload
+         runs on the model version that was active when it started
+    """
+    fmt = detect_input_format(filename, input_format)
+    rows = iter_texts(open_text_stream(raw), fmt, text_field)
+    with inference.pin() as pinned:
+        async for records in classify_chunks(rows, settings.batch_chunk_size, pinned):
+            if persist:
+                await persist_records(records, pinned.version, settings.persist_chunk_size)
+            yield records
+
+
 @router.post("/legal/predict_batch")
 async def predict_batch(
-    file : UploadFile = File(...), request: Request = None):
+    file : UploadFile = File(...), request: Request = None,
+    stream: bool = Query(default=False, description="Stream results back instead of one JSON body"),
+    output: str = Query(default="ndjson", pattern="^(ndjson|csv)$", description="Streamed result format"),
+    input_format: str = Query(default="auto", pattern="^(auto|csv|jsonl)$"),
+    text_field: str = Query(default="Crime Type", description="CSV column / JSON key holding the text"),
+    persist: bool = Query(default=False, description="Also save every prediction (bulk insert)"),
+    settings: Settings = Depends(get_settings),
+    inference: InferenceService = Depends(get_inference)):
     """
-    TEMP: Dummy batch endpoint.
-    - Echoes the crime text from CSV.
-    - Returns a fixed 'General Law' label and 0.8 confidence as placeholders.
+    Batch prediction from a CSV or JSONL upload (optionally gzip-compressed)
+    - Reads the `text_field` ("Crime Type") column / key of every row.
+    - Rows are classified in chunks of `batch_chunk_size` with ONE
+      batched model call per chunk (not one thread hop per row).
+    - stream=true: results are streamed back as NDJSON or CSV while the
+      file is being read, memory stays flat whatever the file size.
+    - persist=true: predictions are saved chunk by chunk with bulk
+      inserts, each result also carries its new prediction "id".
     """
-    model = request.app.state.legal_model
-    contents = await file.read()
-    decoded = contents.decode("utf-8")
-    
-    reader = csv.DictReader(StringIO(decoded))
-    
-    results = []
-    
-    for row in reader:
-        text = row.get("Crime Type")
-        
-        if not text:
-            continue
+    if stream:
+        # FastAPI closes uploads when this function returns, but the response
+        # body runs after that -> take ownership of the spooled file
+        raw, file.file = file.file, io.BytesIO()
+        results = classify_upload(raw, file.filename, input_format, text_field,
+                                  settings, inference, persist)
+        columns = PERSISTED_CSV_COLUMNS if persist else CSV_COLUMNS
         
+        async def body():
+            first = True
+            try:
+                async for records in results:
+                    for record in records:
+                        record["case_text"] = record["case_text"][:50]
+                    if output == "csv":
+                        yield to_csv(records, header=first, columns=columns)
+                    else:
+                        yield to_ndjson(records)
+                    first = False
+            finally:
+                await results.aclose()  # client gone: unpin the model now
+                raw.close()
         
-        category, confidence = await run_in_threadpool(
-            model.predict_category,
-            text)
-        
-        results.append({
-            "case__text" : text[:50] , 
-            "category":category,
-            "confidence" :confidence
-        })
+        media_type = "text/csv" if output == "csv" else "application/x-ndjson"
+        return StreamingResponse(body(), media_type=media_type)
+    
+    # Old behaviour: one JSON body with every result
+    results = classify_upload(file.file, file.filename, input_format, text_field,
+                              settings, inference, persist)
+    collected = []
+    async for records in results:
+        for record in records:
+            result = {
+                "case__text" : record["case_text"][:50] , 
+                "category": record["category"],
+                "confidence" : record["confidence"]
+            }
+            if persist:
+                result["id"] = record["id"]
+            collected.append(result)
      
     return{
-        "total_processed": len(results),
-        "results" : results
+        "total_processed": len(collected),
+        "results" : collected
     }   
 ######################################################################### 
 # code for database
@@ -239,6 +277,8 @@ def test_db( case_text:str , db:Session = Depends(get_db)):
                       model_version = "v1.0")
     
     db.add(pred)
+    db.flush()
+    apply_rollups(db, [prediction_row(pred)])
     db.commit()
     db.refresh(pred)
     return {"saved ID":pred.id}
@@ -250,27 +290,35 @@ def test_db( case_text:str , db:Session = Depends(get_db)):
 async def predict_case(
     body: CaseAnalysisRequest,
     request: Request,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     api_key : str = Depends(verify_api_key),
-    current_user: dict = Depends(get_current_user),):
+    current_user: dict = Depends(get_current_user),
+    inference: InferenceService = Depends(get_inference),
+    writer: PredictionWriter | None = Depends(get_prediction_writer),
+    settings: Settings = Depends(get_settings),):
     clean_text = bleach.clean(body.case_text)
-    model = request.app.state.legal_model
 
-    category, confidence = await run_in_threadpool(
-        model.predict_category,
-        body.case_text
-    )
-
-    prediction = Prediction(
-        case_text=body.case_text,
-        category=category,
-        confidence=confidence,
-        model_version="v1.2.3"
-    )
-
-    db.add(prediction)
-    db.commit()
-    db.refresh(prediction)
+    # the model that answers this request and its version, read together
+    with inference.pin() as pinned:
+        model_version = pinned.version
+        
+        # same text already answered by this model version -> reuse, no model call
+        stored = None
+        if settings.dedup_predictions:
+            stored = await find_prediction(db, text_hash(body.case_text), model_version)
+        if stored is not None:
+            category, confidence = stored.category, stored.confidence
+        else:
+            category, confidence = await pinned.predict_category(body.case_text)
+
+    # write-behind: queued and saved by the background writer within
+    # milliseconds; direct commit when it is off (or its queue is full)
+    queued = writer is not None and writer.submit(body.case_text, category, confidence, model_version)
+    if not queued:
+        # awaited without blocking the event loop (SQLite: via the serialized
+        # writer); no refresh, nothing generated by the database is returned
+        prediction_id = await run_write_async(save_prediction, body.case_text, category, confidence, model_version)
+        prediction_events.inserted([(prediction_id, body.case_text)])
 
     return {
         "category": category,
@@ -281,35 +329,164 @@ async def predict_case(
 # fecth the history 
 
 @router.get("/legal/history")
-def get_history(
-    limit: int = 10,
-    db: Session = Depends(get_db),
+async def get_history(
+    response: Response,
+    limit: int = Query(default=10, ge=1, le=1000),
+    cursor: str | None = Query(default=None, description="X-Next-Cursor of the previous page"),
+    category: str | None = None,
+    model_version: str | None = None,
+    since: datetime | None = Query(default=None, description="created_at >= since"),
+    until: datetime | None = Query(default=None, description="created_at < until"),
+    db: AsyncSession = Depends(get_read_db),
     api_key : str = Depends(verify_api_key),
     current_user : dict =  Depends(get_current_user)
-):  # sourcery skip: inline-immediately-returned-variable
-    records = db.query(Prediction)\
-                .order_by(Prediction.created_at.desc())\
-                .limit(limit)\
-                .all()
+):
+    """
+    Prediction history, newest first
+    
+    Keyset pagination: when there are more rows, the response carries an
+    X-Next-Cursor header, pass it back as `cursor` for the next page
+    (every page costs the same, however deep).
+    """
+    filters = history_filters(category, model_version, since, until)
+    records = (await db.execute(history_page_query(limit, cursor, filters))).mappings().all()
+    
+    if len(records) > limit:
+        records = records[:limit]
+        last = records[-1]
+        response.headers["X-Next-Cursor"] = encode_cursor(last["created_at"], last["id"])
 
     return records
 
+@router.get("/similar")
+async def similar_cases(
+    text: str = Query(..., min_length=10, max_length=5000, description="Case text to compare"),
+    limit: int = Query(default=10, ge=1, le=100),
+    index: SimilarityIndex | None = Depends(get_similarity_index),
+    db: AsyncSession = Depends(get_async_db),
+    api_key : str = Depends(verify_api_key),
+    current_user : dict =  Depends(get_current_user)
+):
+    """
+    Stored predictions whose case text is most similar to `text`
+    
+    Cosine similarity of hashed TF-IDF vectors (services/similarity.py):
+    exact over every case while there are few, IVF lists (approximate,
+    `mode`: "ivf") above similar_ivf_min_rows; then the rows are read
+    from the database.
+    """
+    if index is None or not index.ready:
+        raise HTTPException(status_code=503, detail="Similar-case index is not available yet")
+    mode, hits = await run_in_threadpool(index.search, text, limit)
+    
+    # primary, not the replica: a row indexed from its event may not be replicated yet
+    rows = await rows_by_id(db, [prediction_id for prediction_id, _ in hits])
+    gone = [prediction_id for prediction_id, _ in hits if prediction_id not in rows]
+    if gone:  # deleted by another process, the index learns it now
+        index.remove(gone)
+    
+    return {
+        "mode": mode,
+        "results": [
+            {
+                "id": prediction_id,
+                "similarity": round(similarity, 4),
+                "title": rows[prediction_id]["case_text"][:80],
+                "category": rows[prediction_id]["category"],
+                "confidence": rows[prediction_id]["confidence"],
+                "model_version": rows[prediction_id]["model_version"],
+                "created_at": rows[prediction_id]["created_at"],
+            }
+            for prediction_id, similarity in hits if prediction_id in rows
+        ]
+    }
+
+@router.get("/history/export")
+async def export_history(
+    output: str = Query(default="ndjson", pattern="^(ndjson|csv)$"),
+    gzip: bool = Query(default=False, description="Compress on the fly (.gz download)"),
+    category: str | None = None,
+    model_version: str | None = None,
+    since: datetime | None = Query(default=None, description="created_at >= since"),
+    until: datetime | None = Query(default=None, description="created_at < until"),
+    settings: Settings = Depends(get_settings),
+    connect = Depends(get_read_connect),
+    api_key : str = Depends(verify_api_key),
+    current_user : dict =  Depends(get_current_user)
+):
+    """
+    Download predictions of any time range (oldest first) as NDJSON or CSV
+    
+    Streamed straight from a database cursor: memory stays flat whether
+    it is a day or a month of predictions.
+    """
+    filters = history_filters(category, model_version, since, until)
+    chunks = iter_export(filters, output, settings.export_batch_size, connect)
+    filename = f"predictions.{output}"
+    media_type = "text/csv" if output == "csv" else "application/x-ndjson"
+    
+    if gzip:
+        async def compressed():
+            gzipper = GzipChunker()
+            async for chunk in chunks:
+                data = gzipper.compress(chunk)
+                if data:
+                    yield data
+            yield gzipper.flush()
+        
+        body, filename, media_type = compressed(), filename + ".gz", "application/gzip"
+    else:
+        body = chunks
+    
+    return StreamingResponse(
+        body,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+
+@router.get("/stats")
+async def prediction_stats(
+    interval: str = Query(default="day", pattern="^(hour|day|total)$"),
+    category: str | None = None,
+    model_version: str | None = None,
+    since: datetime | None = Query(default=None, description="from this hour on"),
+    until: datetime | None = Query(default=None, description="before this hour"),
+    db: AsyncSession = Depends(get_read_db),
+    api_key : str = Depends(verify_api_key),
+    current_user : dict =  Depends(get_current_user)
+):
+    """
+    Prediction counts and average confidence per interval, category and model version
+    
+    Read from the hourly rollups only (never from the predictions table),
+    so the cost depends on the time range, not on the number of predictions.
+    """
+    query = select(PredictionRollup)
+    if category is not None:
+        query = query.where(PredictionRollup.category == category)
+    if model_version is not None:
+        query = query.where(PredictionRollup.model_version == model_version)
+    if since is not None:
+        query = query.where(PredictionRollup.bucket >= hour_bucket(since))
+    if until is not None:
+        query = query.where(PredictionRollup.bucket < as_utc(until))
+    
+    rollups = (await db.scalars(query)).all()
+    return summarize(rollups, interval)
+
+
 # to delet endpoint 
 
 @router.delete("/legal/history/{prediction_id}")
-def delete_prediction(
+async def delete_prediction(
     prediction_id: int,
-    db: Session = Depends(get_db)
 ):
-    record = db.query(Prediction)\
-               .filter(Prediction.id == prediction_id)\
-               .first()
+    deleted = await run_write_async(remove_prediction, prediction_id)
 
-    if not record:
+    if not deleted:
         raise HTTPException(status_code=404, detail="Not found")
-
-    db.delete(record)
-    db.commit()
+    prediction_events.deleted([prediction_id])
 
     return {"message": "Deleted"}
 
@@ -0,0 +1,62 @@
+# routers/models.py
+from fastapi import APIRouter, Depends, status
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel, Field
+
+from core.security import verify_api_key
+from dependencies.models import get_model_registry
+from services.registry import ModelRegistry
+
+router = APIRouter(
+    prefix="/models",
+    tags=["Model Registry"],
+    dependencies=[Depends(verify_api_key)],  # admin only
+)
+
+
+# versions end up in artifact file names -> no path characters
+VERSION_PATTERN = r"^[A-Za-z0-9._-]+$"
+
+
+class ActivateRequest(BaseModel):
+    version: str = Field(..., min_length=1, max_length=20, pattern=VERSION_PATTERN)
+
+
+class ShadowRequest(BaseModel):
+    version: str = Field(..., min_length=1, max_length=20, pattern=VERSION_PATTERN)
+    sample_rate: float = Field(default=0.1, gt=0.0, le=1.0)
+
+
+@router.get("")
+def registry_status(registry: ModelRegistry = Depends(get_model_registry)):
+    """Active / pending / shadow model versions"""
+    return registry.describe()
+
+
+@router.post("/activate", status_code=status.HTTP_202_ACCEPTED)
+async def activate_model(body: ActivateRequest, registry: ModelRegistry = Depends(get_model_registry)):
+    """
+    Load a model version in the background and hot-swap it in
+
+    Returns immediately; poll GET /models to see when it is active.
+    """
+    if not registry.activate(body.version):
+        return JSONResponse(
+            status_code=status.HTTP_409_CONFLICT,
+            content={"detail": f"Model {registry.pending_version} is already loading"},
+        )
+    return {"message": f"Loading model {body.version}", "active_version": registry.active_version}
+
+
+@router.post("/shadow")
+async def set_shadow_model(body: ShadowRequest, registry: ModelRegistry = Depends(get_model_registry)):
+    """Load a shadow model and mirror a sample of traffic to it (logged only)"""
+    await registry.load_shadow(body.version, body.sample_rate)
+    return registry.describe()["shadow"]
+
+
+@router.delete("/shadow")
+async def remove_shadow_model(registry: ModelRegistry = Depends(get_model_registry)):
+    """Stop mirroring traffic to the shadow model"""
+    registry.clear_shadow()
+    return {"message": "Shadow model removed"}
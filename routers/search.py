@@ -1,7 +1,16 @@
 # routers/search.py
-from fastapi import APIRouter, Query
+from fastapi import APIRouter, HTTPException, Query
 from fastapi import Depends
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core.dependencies import get_async_db, get_search_index, get_suggest_index
 from dependencies.Request_id import get_request_id
+from dependencies.config import Settings, get_settings
+from services.full_text import search_database
+from services.history import rows_by_id
+from services.search_index import SearchIndex
+from services.suggest import MAX_SUGGESTIONS, SuggestIndex
 
 router = APIRouter(
     prefix="/search",
@@ -10,7 +19,7 @@ router = APIRouter(
 
 
 @router.get("")  # Empty string means just /search
-def search(
+async def search(
     q: str = Query(
         ...,
         min_length=1,
@@ -19,22 +28,88 @@ def search(
     ),
     page: int = Query(default=1, ge=1, le=100),
     limit: int = Query(default=100, ge=1, le=100),
+    fuzzy: bool = Query(default=False, description="Also match words with 1-2 typos"),
+    submitted: bool = Query(default=False, description="Sent by the user (enter, a picked suggestion), not as-you-type"),
+    index: SearchIndex | None = Depends(get_search_index),
+    suggest_index: SuggestIndex | None = Depends(get_suggest_index),
+    db: AsyncSession = Depends(get_async_db),
+    settings: Settings = Depends(get_settings),
     request_id : str  = Depends(get_request_id)
 ):
     """
-    Search cases, users, and legal documents
-    
-    Returns paginated search results matching the query.
+    Search case texts, best matches first
+
+    Returns one page of matching predictions and the total number of
+    matches. Ranking runs on the in-process index (services/search_index.py)
+    or, with search_backend = "database", in SQL (services/full_text.py);
+    then the rows of the page are read from the database.
+    fuzzy=true (memory backend): misspelled words are replaced by the
+    closest indexed terms first, listed in `fuzzy_terms`.
+    The words of a submitted search, or of one with results, count for
+    /search/suggest; keystrokes of search-as-you-type that find nothing don't.
     """
     print(f" Search -> Request ID: {request_id}")
-    return {
+    offset = (page - 1) * limit
+    terms = None
+    if settings.search_backend == "database":
+        if fuzzy:
+            raise HTTPException(status_code=400, detail="fuzzy=true needs search_backend = memory")
+        total, hits = await search_database(db, q, offset, limit)
+    elif index is None or not index.ready:
+        raise HTTPException(status_code=503, detail="Search index is not available yet")
+    else:
+        if fuzzy:
+            terms = await run_in_threadpool(index.fuzzy_terms, q)
+        total, hits = await run_in_threadpool(index.search, q if terms is None else " ".join(terms),
+                                              offset, limit)
+
+    # primary, not the replica: a row indexed from its event may not be replicated yet
+    ids = [prediction_id for prediction_id, _ in hits]
+    rows = await rows_by_id(db, ids)
+    gone = [prediction_id for prediction_id in ids if prediction_id not in rows]
+    if gone and index is not None:  # deleted by another process, the index learns it now
+        index.remove(gone)
+        total -= len(gone)
+    if suggest_index is not None and page == 1 and (submitted or total > 0):
+        suggest_index.record("search", q)
+
+    response = {
         "query": q,
         "page": page,
         "limit": limit,
-        "total_results": 42,
+        "total_results": total,
         "results": [
-            {"id": i, "title": f"Result {i} matching '{q}'", "type": "case"}
-            for i in range(1, 4)
+            {
+                "id": prediction_id,
+                "title": rows[prediction_id]["case_text"][:80],
+                "type": "case",
+                "score": round(score, 4),
+                "category": rows[prediction_id]["category"],
+                "confidence": rows[prediction_id]["confidence"],
+                "model_version": rows[prediction_id]["model_version"],
+                "created_at": rows[prediction_id]["created_at"],
+            }
+            for prediction_id, score in hits if prediction_id in rows
         ]
     }
-    
\ No newline at end of file
+    if terms is not None:
+        response["fuzzy_terms"] = terms
+    return response
+
+
+@router.get("/suggest")
+async def suggest(
+    prefix: str = Query(..., min_length=1, max_length=100, description="What the user typed so far"),
+    limit: int = Query(default=10, ge=1, le=MAX_SUGGESTIONS),
+    index: SuggestIndex | None = Depends(get_suggest_index),
+):
+    """
+    Completions of a prefix for search-as-you-type, most frequent first
+
+    Words of the case texts and of past searches, IPC sections and
+    categories (services/suggest.py). Answered from a prebuilt sorted
+    array well under a millisecond, so it runs on the event loop.
+    """
+    if index is None or not index.ready:
+        raise HTTPException(status_code=503, detail="Suggestions are not available yet")
+    return {"prefix": prefix, "suggestions": index.suggest(prefix, limit)}
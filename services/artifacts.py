@@ -0,0 +1,157 @@
+# services/artifacts.py
+"""
+Memory-mapped model artifacts
+
+File layout (little endian):
+
+    b"BAROART1"              8 bytes magic
+    header length            8 bytes unsigned int
+    header                   JSON: {"metadata": {...},
+                                    "sections": {name: {"offset", "length", "kind"}}}
+    sections                 raw bytes, each aligned to 64 bytes
+
+Sections are read straight out of an `mmap` of the file, so every gunicorn
+worker on a host shares ONE physical copy through the page cache instead of
+holding its own. Only "bytes" and "int32" sections are shared that way; a
+"json" section is parsed into each process, keep it small. Section kinds:
+    "json"     small metadata (labels, confidences) -> parsed
+    "bytes"    raw blobs (byte lookup tables) -> zero-copy memoryview
+    "int32"    integer tables (automaton transitions) -> zero-copy memoryview.cast("i")
+"""
+import json
+import mmap
+import os
+import struct
+import sys
+from array import array
+
+from utils.logger import logger
+
+MAGIC = b"BAROART1"
+ALIGNMENT = 64
+_LENGTH = struct.Struct("<Q")
+
+
+def _align(offset: int) -> int:
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def _encode(kind: str, value) -> bytes:
+    if kind == "json":
+        return json.dumps(value, separators=(",", ":")).encode("utf-8")
+    if kind == "int32":
+        value = array("i", value)
+        if sys.byteorder == "big":
+            value.byteswap()
+        return value.tobytes()
+    if kind == "bytes":
+        return bytes(value)
+    raise ValueError(f"Unknown artifact section kind '{kind}'")
+
+
+def write_artifact(path: str, sections: dict[str, tuple[str, object]], metadata: dict | None = None):
+    """
+    Write an artifact file atomically
+
+    sections = {"taxonomy": ("json", {...}), "crime.delta": ("int32", array("i", ...))}
+    """
+    payloads = {name: (kind, _encode(kind, value)) for name, (kind, value) in sections.items()}
+
+    # header size depends on the offsets it contains -> grow until stable
+    header_len = 0
+    while True:
+        offset = _align(len(MAGIC) + _LENGTH.size + header_len)
+        index = {}
+        for name, (kind, data) in payloads.items():
+            index[name] = {"offset": offset, "length": len(data), "kind": kind}
+            offset = _align(offset + len(data))
+        header = json.dumps({"metadata": metadata or {}, "sections": index}).encode("utf-8")
+        if len(header) == header_len:
+            break
+        header_len = len(header)
+
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(MAGIC)
+        f.write(_LENGTH.pack(len(header)))
+        f.write(header)
+        for name, (_, data) in payloads.items():
+            f.seek(index[name]["offset"])
+            f.write(data)
+    os.replace(tmp_path, path)  # other workers never see a half written file
+    logger.info(f"OK Model artifact written: {path} ({', '.join(payloads)})")
+
+
+class ModelArtifact:
+    """
+    Read-only, memory-mapped view of an artifact file
+
+    WHY: Per-worker copies of the model made resident memory grow with
+         (model size x workers)
+    HOW: mmap the file once; sections are slices of the mapping, so pages
+         are loaded lazily and shared by every process mapping the file
+    """
+
+    def __init__(self, path: str):
+        """Raises ValueError when the file is not a complete artifact (truncated, corrupt)"""
+        self.path = path
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)  # empty file: ValueError
+        try:
+            self.metadata, self.sections = self._read_header()
+        except ValueError:
+            self._mmap.close()
+            raise
+        self._view = memoryview(self._mmap)
+
+    def _read_header(self) -> tuple[dict, dict]:
+        start = len(MAGIC) + _LENGTH.size
+        if len(self._mmap) < start or self._mmap[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{self.path} is not a BARO model artifact")
+        (header_len,) = _LENGTH.unpack_from(self._mmap, len(MAGIC))
+        try:
+            header = json.loads(self._mmap[start:start + header_len])
+            metadata, sections = header["metadata"], header["sections"]
+            truncated = [name for name, info in sections.items()
+                         if info["offset"] + info["length"] > len(self._mmap)]
+        except (ValueError, KeyError, TypeError) as e:
+            raise ValueError(f"{self.path} has a corrupt header: {str(e)}") from e
+        if truncated:
+            raise ValueError(f"{self.path} is truncated (sections {', '.join(truncated)})")
+        return metadata, sections
+
+    def section(self, name: str) -> memoryview:
+        """Zero-copy view of one section"""
+        info = self.sections[name]
+        return self._view[info["offset"]:info["offset"] + info["length"]]
+
+    def json(self, name: str):
+        return json.loads(self.section(name).tobytes())
+
+    def int32(self, name: str) -> memoryview | array:
+        """Zero-copy int32 view (a byte-swapped copy on big-endian hosts)"""
+        view = self.section(name).cast("i")
+        if sys.byteorder == "big":
+            view = array("i", view)
+            view.byteswap()
+        return view
+
+    def close(self):
+        self._view.release()
+        self._mmap.close()
+
+    def __getstate__(self):
+        # a process-pool worker re-maps the same file (still shared page cache)
+        return {"path": self.path}
+
+    def __setstate__(self, state):
+        self.__init__(state["path"])
+
+
+if __name__ == "__main__":
+    # python -m services.artifacts data/legal_taxonomy.json data/legal_model-v1.2.3.baro v1.2.3
+    from dependencies.models import write_model_artifact
+    from services.classifier import load_taxonomy, taxonomy_digest
+
+    taxonomy_path, out_path, version = sys.argv[1:4]
+    write_model_artifact(out_path, version, load_taxonomy(taxonomy_path), taxonomy_digest(taxonomy_path))
@@ -0,0 +1,127 @@
+# services/batch_io.py
+import csv
+import gzip
+import io
+import json
+import zlib
+from itertools import islice
+from typing import AsyncIterator, BinaryIO, Iterable, Iterator
+
+from fastapi.concurrency import run_in_threadpool
+
+GZIP_MAGIC = b"\x1f\x8b"
+INPUT_FORMATS = ("auto", "csv", "jsonl")
+OUTPUT_FORMATS = ("ndjson", "csv")
+CSV_COLUMNS = ["row", "case_text", "category", "confidence"]
+PERSISTED_CSV_COLUMNS = CSV_COLUMNS + ["id"]  # + primary key of the saved prediction
+
+
+def detect_input_format(filename: str | None, requested: str = "auto") -> str:
+    """csv / jsonl from the query parameter, else from the file name"""
+    if requested != "auto":
+        return requested
+    name = (filename or "").lower()
+    if name.endswith(".gz"):
+        name = name[:-3]
+    return "jsonl" if name.endswith((".jsonl", ".ndjson")) else "csv"
+
+
+def open_text_stream(raw: BinaryIO) -> io.TextIOBase:
+    """
+    Wrap an uploaded binary file in a streaming text reader
+
+    gzip is detected from the magic bytes (not the file name), decoding is
+    incremental, so only one buffer of the file is in memory at a time
+    """
+    raw.seek(0)
+    head = raw.read(2)
+    raw.seek(0)
+    if head == GZIP_MAGIC:
+        raw = gzip.GzipFile(fileobj=raw, mode="rb")
+    # utf-8-sig: Excel likes to start CSV files with a BOM
+    return io.TextIOWrapper(raw, encoding="utf-8-sig", errors="replace", newline="")
+
+
+def iter_texts(stream: io.TextIOBase, input_format: str, text_field: str) -> Iterator[tuple[int, str]]:
+    """
+    Yield (row number, text) one row at a time; rows without text are skipped
+
+    csv   -> column `text_field` of each row
+    jsonl -> key `text_field` of each JSON object (one per line)
+    """
+    if input_format == "jsonl":
+        for row_number, line in enumerate(stream, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            text = record.get(text_field) if isinstance(record, dict) else None
+            if text:
+                yield row_number, str(text)
+    else:
+        for row_number, row in enumerate(csv.DictReader(stream), start=1):
+            text = row.get(text_field)
+            if text:
+                yield row_number, text
+
+
+def iter_chunks(rows: Iterable, size: int) -> Iterator[list]:
+    """Group an iterator into lists of at most `size` items"""
+    rows = iter(rows)
+    while chunk := list(islice(rows, size)):
+        yield chunk
+
+
+async def classify_chunks(rows: Iterable[tuple[int, str]], chunk_size: int,
+                          inference) -> AsyncIterator[list[dict]]:
+    """
+    Classify (row, text) pairs `chunk_size` at a time, one batched model call per chunk
+
+    Rows are pulled in the threadpool (parsing / gunzip never blocks the
+    event loop) and each chunk of results is yielded before the next one
+    is read, so memory stays flat whatever the input size.
+    """
+    chunks = iter_chunks(rows, chunk_size)
+    while (chunk := await run_in_threadpool(next, chunks, None)) is not None:
+        texts = [text for _, text in chunk]
+        categories, confidences = await inference.predict_category_batch(texts)
+        yield [
+            {"row": row, "case_text": text, "category": category, "confidence": confidence}
+            for (row, text), category, confidence in zip(chunk, categories, confidences)
+        ]
+
+
+def to_ndjson(records: Iterable[dict]) -> str:
+    return "".join(json.dumps(record) + "\n" for record in records)
+
+
+def to_csv(records: Iterable[dict], header: bool = False, columns: list[str] = CSV_COLUMNS) -> str:
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=columns, extrasaction="ignore")
+    if header:
+        writer.writeheader()
+    writer.writerows(records)
+    return buffer.getvalue()
+
+
+class GzipChunker:
+    """
+    Gzip a response while it is being streamed
+
+    Each text chunk is compressed as soon as it is produced (one zlib
+    stream, so the result is ONE valid .gz file), nothing is buffered
+    beyond zlib's own window
+    """
+
+    def __init__(self, level: int = 6):
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)  # gzip header
+
+    def compress(self, text: str) -> bytes:
+        return self._compressor.compress(text.encode("utf-8"))
+
+    def flush(self) -> bytes:
+        return self._compressor.flush()
+
@@ -0,0 +1,139 @@
+# services/batcher.py
+import asyncio
+import time
+from typing import Awaitable, Callable
+
+from utils.exceptions import ModelNotLoadedException, ServiceOverloadedException
+from utils.logger import logger
+
+# batch_fn(model, texts) -> (labels, confidences), aligned with texts
+BatchFn = Callable[[object, list[str]], Awaitable[tuple[list[str], list[float]]]]
+
+
+class MicroBatcher:
+    """
+    Dynamic micro-batching in front of the model
+
+    WHY: Concurrent single-text requests each paid a separate model call
+    HOW: Requests go into a bounded asyncio queue. One background task takes
+         the first waiting request, keeps collecting for `window_ms` (or until
+         `max_batch_size` texts), runs ONE batched model call per model
+         the callers were pinned to (one, except right after a hot swap)
+         and resolves every caller's future with its own result
+    WHEN: Started in startup_event, stopped in shutdown_event
+    """
+
+    def __init__(
+        self,
+        batch_fn: BatchFn,
+        window_ms: float = 5.0,
+        max_batch_size: int = 64,
+        max_queue_size: int = 1024,
+        name: str = "batcher",
+    ):
+        self.batch_fn = batch_fn
+        self.window = window_ms / 1000
+        self.max_batch_size = max_batch_size
+        self.max_queue_size = max_queue_size
+        self.name = name
+
+        self._queue: asyncio.Queue | None = None
+        self._task: asyncio.Task | None = None
+        self._current: list[tuple[str, asyncio.Future, object]] = []
+
+        # simple counters for /metrics
+        self.batches = 0
+        self.items = 0
+
+    async def start(self):
+        """Create the queue and the collector task (needs a running loop)"""
+        if self._task is not None:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_queue_size)
+        self._task = asyncio.create_task(self._run(), name=f"micro-batcher-{self.name}")
+        logger.info(f">> Micro-batcher '{self.name}' started "
+                    f"(window={self.window * 1000:.1f}ms, max_batch={self.max_batch_size})")
+
+    async def stop(self):
+        """Stop collecting and fail anything still waiting"""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+        # fail the batch that was being collected / run, then everything queued
+        pending = self._current
+        self._current = []
+        while not self._queue.empty():
+            pending.append(self._queue.get_nowait())
+        _fail(pending, ModelNotLoadedException("Server is shutting down"))
+        logger.info(f"OK Micro-batcher '{self.name}' stopped")
+
+    async def submit(self, text: str, model) -> tuple[str, float]:
+        """Queue one text for `model` and wait for its (label, confidence)"""
+        if self._task is None:
+            raise ModelNotLoadedException(f"Micro-batcher '{self.name}' is not running")
+
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self._queue.put_nowait((text, future, model))
+        except asyncio.QueueFull:
+            logger.warning(f"!! Micro-batcher '{self.name}' queue full ({self.max_queue_size})")
+            raise ServiceOverloadedException()
+        return await future
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    async def _collect(self) -> list[tuple[str, asyncio.Future, object]]:
+        """Wait for the first request, then gather more until window or size limit"""
+        batch = self._current = [await self._queue.get()]
+        deadline = time.monotonic() + self.window
+
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        while True:
+            batch = await self._collect()
+            # callers that gave up (client disconnected) don't need a result
+            live = [item for item in batch if not item[1].done()]
+            if live:
+                await self._process(live)
+            self._current = []
+
+    async def _process(self, batch: list[tuple[str, asyncio.Future, object]]):
+        groups: dict[int, list] = {}
+        for item in batch:
+            groups.setdefault(id(item[2]), []).append(item)
+        for group in groups.values():
+            try:
+                labels, confidences = await self.batch_fn(group[0][2], [text for text, _, _ in group])
+            except Exception as e:
+                logger.error(f"XX Micro-batch '{self.name}' failed: {str(e)}")
+                _fail(group, e)
+                continue
+
+            self.batches += 1
+            self.items += len(group)
+            for (_, future, _), label, confidence in zip(group, labels, confidences):
+                if not future.done():
+                    future.set_result((label, confidence))
+
+
+def _fail(batch: list[tuple[str, asyncio.Future, object]], exc: Exception):
+    for _, future, _ in batch:
+        if not future.done():
+            future.set_exception(exc)
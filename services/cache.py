@@ -0,0 +1,112 @@
+# services/cache.py
+import hashlib
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+from utils.logger import logger
+
+# rough per-entry overhead (OrderedDict slot + tuple + floats) on top of key/label sizes
+_ENTRY_OVERHEAD = 200
+
+
+def normalize_text(text: str) -> str:
+    """Collapse whitespace so resubmitted / templated texts share one cache key"""
+    return " ".join(text.split())
+
+
+class PredictionCache:
+    """
+    Bounded prediction cache with TTL + LRU eviction
+
+    WHY: Templated FIRs and resubmitted cases ran full inference every time
+    HOW: key = sha256(normalized text) + task + model version
+         - entries expire after `ttl_seconds`
+         - least recently used entries are evicted when either
+           `max_entries` or the `max_bytes` budget is exceeded
+         - a different model version never reads old entries, and
+           `invalidate()` drops everything when the model is swapped
+    """
+
+    def __init__(self, max_entries: int = 10_000, max_bytes: int = 16 * 1024 * 1024,
+                 ttl_seconds: float = 3600):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+
+        # key -> (label, confidence, expires_at, size)
+        self._entries: OrderedDict[str, tuple[str, float, float, int]] = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @staticmethod
+    def make_key(task: str, text: str, model_version: str) -> str:
+        digest = hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+        return f"{task}:{model_version}:{digest}"
+
+    def get(self, task: str, text: str, model_version: str) -> tuple[str, float] | None:
+        key = self.make_key(task, text, model_version)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            label, confidence, expires_at, size = entry
+            if expires_at <= time.monotonic():
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)  # mark as most recently used
+            self.hits += 1
+            return label, confidence
+
+    def put(self, task: str, text: str, model_version: str, label: str, confidence: float):
+        key = self.make_key(task, text, model_version)
+        size = sys.getsizeof(key) + sys.getsizeof(label) + _ENTRY_OVERHEAD
+        if size > self.max_bytes or self.max_entries <= 0:
+            return
+
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (label, confidence, time.monotonic() + self.ttl_seconds, size)
+            self._bytes += size
+
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def invalidate(self):
+        """Drop everything (called when the model is swapped)"""
+        with self._lock:
+            dropped = len(self._entries)
+            self._entries.clear()
+            self._bytes = 0
+        logger.info(f">> Prediction cache invalidated ({dropped} entries dropped)")
+
+    def _remove(self, key: str):
+        entry = self._entries.pop(key)
+        self._bytes -= entry[3]
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
@@ -0,0 +1,169 @@
+# services/case_texts.py
+import hashlib
+from functools import lru_cache
+from typing import Iterable
+
+from sqlalchemy import Select, exists, func, insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from models.case_texts import CaseText
+from models.predictions import Prediction
+from utils.logger import logger
+
+
+def text_hash(text: str) -> str:
+    """Content address of a case text (exact text, the stored copy must be identical)"""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+@lru_cache
+def _insert_new(dialect: str):
+    """
+    INSERT .. ON CONFLICT on the Table, built (and compiled) once per dialect
+
+    PostgreSQL: DO UPDATE (same value, a HOT update) so an existing text
+    is row-locked until the prediction pointing at it commits; the
+    cleanup below skips locked rows instead of deleting them under it.
+    SQLite: one writer at a time, DO NOTHING is enough
+    """
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        statement = dialect_insert(CaseText.__table__)
+        return statement.on_conflict_do_update(index_elements=["hash"], set_={"hash": statement.excluded.hash})
+    from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    return dialect_insert(CaseText.__table__).on_conflict_do_nothing(index_elements=["hash"])
+
+
+def store_case_texts(db: Session, texts: Iterable[str]) -> list[str]:
+    """
+    Save each distinct text once, return the hash of every input text
+
+    Content-addressed: a text that is already stored costs nothing
+    but the hash. Runs in the caller's transaction.
+    """
+    texts = list(texts)
+    hashes = [text_hash(text) for text in texts]
+    rows = list({digest: {"hash": digest, "case_text": text}
+                 for digest, text in zip(hashes, texts)}.values())
+    if not rows:
+        return hashes
+
+    dialect = db.get_bind().dialect.name
+    if dialect in ("postgresql", "sqlite"):
+        db.execute(_insert_new(dialect), rows)
+    else:
+        known = set(db.scalars(select(CaseText.hash).where(CaseText.hash.in_([row["hash"] for row in rows]))))
+        missing = [row for row in rows if row["hash"] not in known]
+        if missing:
+            db.execute(insert(CaseText), missing)
+    return hashes
+
+
+async def find_prediction(db: AsyncSession, case_hash: str, model_version: str) -> Prediction | None:
+    """Latest stored prediction of the same text by the same model version"""
+    return await db.scalar(
+        select(Prediction)
+        .where(Prediction.case_hash == case_hash, Prediction.model_version == model_version)
+        .order_by(Prediction.id.desc())
+        .limit(1)
+    )
+
+
+def case_text_column():
+    """Text of a prediction: from case_texts, or inline for rows saved before dedup"""
+    return func.coalesce(Prediction.case_text, CaseText.case_text).label("case_text")
+
+
+def with_case_texts(query: Select) -> Select:
+    return query.select_from(Prediction).outerjoin(CaseText, CaseText.hash == Prediction.case_hash)
+
+
+def _delete_unreferenced(db: Session, *conditions) -> int:
+    """
+    Delete the matching texts no prediction points at
+
+    Locks them first, skipping rows a concurrent save holds (PostgreSQL):
+    that save is about to commit a prediction using the text. The delete
+    checks the references again: its newer snapshot sees a save that
+    committed just before the lock was taken
+    """
+    referenced = exists().where(Prediction.case_hash == CaseText.hash)
+    unused = db.scalars(
+        select(CaseText.hash).where(*conditions, ~referenced).with_for_update(skip_locked=True)
+    ).all()
+    if not unused:
+        return 0
+    return db.execute(CaseText.__table__.delete().where(CaseText.hash.in_(unused), ~referenced)).rowcount
+
+
+def delete_text_if_unreferenced(db: Session, case_hash: str) -> bool:
+    """Remove one case text if no prediction points at it (index probe, caller's transaction)"""
+    return _delete_unreferenced(db, CaseText.hash == case_hash) > 0
+
+
+def delete_unreferenced_chunk(db: Session, after: str = "", chunk_size: int = 5000) -> tuple[int, str | None]:
+    """
+    Remove the unreferenced texts among the next `chunk_size` hashes after `after`
+
+    Returns (texts removed, last hash looked at); None once the table is
+    done. Bounded: one primary-key range plus an index probe per hash, so
+    each call can be its own short transaction
+    """
+    hashes = db.scalars(
+        select(CaseText.hash).where(CaseText.hash > after).order_by(CaseText.hash).limit(chunk_size)
+    ).all()
+    if not hashes:
+        return 0, None
+    return _delete_unreferenced(db, CaseText.hash.in_(hashes)), hashes[-1]
+
+
+def delete_unreferenced(db: Session, chunk_size: int = 5000) -> int:
+    """
+    Remove case texts no prediction points at anymore (after retention / deletes)
+
+    Chunked by hash, one transaction per chunk, safe to stop and run again.
+    """
+    removed, after = 0, ""
+    while after is not None:
+        count, after = delete_unreferenced_chunk(db, after, chunk_size)
+        db.commit()
+        removed += count
+    return removed
+
+
+def move_inline_texts(db: Session, chunk_size: int = 5000) -> int:
+    """
+    Move the text of predictions saved before dedup into case_texts
+
+    Chunked, one transaction per chunk, safe to stop and run again.
+    """
+    moved = 0
+    while True:
+        rows = db.execute(
+            select(Prediction.id, Prediction.case_text)
+            .where(Prediction.case_hash.is_(None), Prediction.case_text.is_not(None))
+            .limit(chunk_size)
+        ).all()
+        if not rows:
+            return moved
+        hashes = store_case_texts(db, [row.case_text for row in rows])
+        db.execute(
+            update(Prediction),
+            [{"id": row.id, "case_hash": digest, "case_text": None} for row, digest in zip(rows, hashes)],
+        )
+        db.commit()
+        moved += len(rows)
+        logger.info(f"   {moved} case texts moved")
+
+
+if __name__ == "__main__":
+    # python -m services.case_texts   (dedupe texts of existing predictions)
+    from core.database import SessionLocal, engine
+    from core.schema import sync_schema
+
+    sync_schema(engine)
+    with SessionLocal() as db:
+        total = move_inline_texts(db)
+        removed = delete_unreferenced(db)
+    print(f"{total} predictions now point at case_texts ({removed} unused texts removed)")
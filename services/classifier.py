@@ -0,0 +1,247 @@
+# services/classifier.py
+import hashlib
+import json
+from array import array
+from collections import deque
+from pathlib import Path
+
+import numpy as np
+
+from utils.logger import logger
+
+# Declarative keyword taxonomy shipped with the app (labels, keywords, confidences)
+DEFAULT_TAXONOMY_PATH = Path(__file__).resolve().parent.parent / "data" / "legal_taxonomy.json"
+AUTOMATON_FORMAT = 2  # layout of the compiled tables (model artifacts of another one are rebuilt)
+SCAN_CELLS = 1 << 21  # padded bytes per group of a batch scan (count_hits_many): ~16 MB of work arrays
+SCAN_MIN_TEXTS = 128  # smaller batches: one Python pass per text is faster (NumPy costs per byte position)
+
+
+def load_taxonomy(path: str | Path | None = None) -> dict:
+    """
+    Load the keyword taxonomy file
+
+    WHY: Categories and keywords live in data, not in if/elif chains
+    HOW: Plain JSON -> {"category": {...}, "crime": {...}}
+    """
+    path = Path(path) if path else DEFAULT_TAXONOMY_PATH
+    with open(path, encoding="utf-8") as f:
+        taxonomy = json.load(f)
+    logger.info(f">> Loaded taxonomy from {path} ({', '.join(taxonomy)})")
+    return taxonomy
+
+
+def taxonomy_digest(path: str | Path | None = None) -> str:
+    """SHA-256 of the taxonomy file: a model artifact built from other contents is stale"""
+    path = Path(path) if path else DEFAULT_TAXONOMY_PATH
+    return hashlib.sha256(path.read_bytes()).hexdigest()
+
+
+def compile_automaton(spec: dict) -> dict:
+    """
+    Aho-Corasick automaton of all keywords of one task, as a complete DFA
+
+    WHY: One pass over the text finds every keyword, whatever their number
+    HOW: A trie over the UTF-8 bytes of the casefolded keywords, failure
+         links computed breadth-first and folded into a full transition
+         table, so the scan never backtracks. Bytes that occur in no
+         keyword share class 0. States are numbered with the accepting
+         ones first and stored as row offsets (state * width): a step is
+         one index, an accepting state is one comparison. Each accepting
+         state lists the label of every keyword ending there: its own
+         and those reached by following failure links (dictionary suffix
+         links), so "car theft" also counts "theft".
+    Returns flat tables (services/artifacts.py maps them as they are):
+        classes         bytes(256)  byte -> character class
+        delta           int32       row offset + class -> next row offset
+        output_offsets  int32       accepting state -> start of its labels in outputs (CSR)
+        outputs         int32       label numbers of the keywords ending in each accepting state
+        width, accepting_rows, start
+    """
+    classes = bytearray(256)
+    goto: list[dict[int, int]] = [{}]
+    owner = [-1]  # state -> label number of the keyword ending exactly there
+    for number, entry in enumerate(spec["labels"]):
+        for keyword in entry["keywords"]:
+            state = 0
+            for byte in keyword.casefold().encode("utf-8"):
+                if not classes[byte]:
+                    classes[byte] = max(classes) + 1
+                nxt = goto[state].get(classes[byte])
+                if nxt is None:
+                    nxt = goto[state][classes[byte]] = len(goto)
+                    goto.append({})
+                    owner.append(-1)
+                state = nxt
+            if state and owner[state] < 0:  # first label that lists a keyword owns it
+                owner[state] = number
+    width = max(classes) + 1
+
+    # breadth-first: failure links, complete transitions, every keyword ending at each state
+    table = [[0] * width for _ in goto]
+    output = [[number] if number >= 0 else [] for number in owner]
+    queue = deque()
+    for cls, nxt in goto[0].items():
+        table[0][cls] = nxt
+        queue.append((nxt, 0))
+    while queue:
+        state, fail = queue.popleft()
+        output[state] = output[state] + output[fail]  # fail is shallower: already complete
+        row = table[state]
+        row[:] = table[fail]
+        for cls, nxt in goto[state].items():
+            row[cls] = nxt
+            queue.append((nxt, table[fail][cls]))
+
+    order = sorted(range(len(goto)), key=lambda s: not output[s])  # accepting states first, stable
+    rank = [0] * len(goto)
+    for new, old in enumerate(order):
+        rank[old] = new
+    accepting = sum(1 for labels in output if labels)
+    offsets = [0]
+    for old in order[:accepting]:
+        offsets.append(offsets[-1] + len(output[old]))
+    return {
+        "classes": bytes(classes),
+        "delta": array("i", (rank[nxt] * width for old in order for nxt in table[old])),
+        "output_offsets": array("i", offsets),
+        "outputs": array("i", (number for old in order[:accepting] for number in output[old])),
+        "width": width,
+        "accepting_rows": accepting * width,
+        "start": rank[0] * width,
+    }
+
+
+class KeywordClassifier:
+    """
+    Multi-keyword classifier for one task (category / crime)
+
+    WHY: The old code lower-cased the text and ran one `in` scan per keyword,
+         so every new keyword meant another pass over a 5,000 char text
+    HOW: All keywords are compiled ONCE into an Aho-Corasick DFA
+         (compile_automaton) and the text is scanned in one pass, one
+         table step per byte. Every keyword found counts one hit for its
+         label (overlapping ones too), the label with most hits wins
+         (taxonomy order breaks ties) with the confidence the taxonomy
+         gives it.
+         Batches (predict_many) step the same DFA over all texts at once
+         with NumPy, one vector operation per byte position.
+         `tables` are the automaton read from a model artifact instead of
+         compiled (memoryviews over the mapping, used in place)
+    """
+
+    def __init__(self, spec: dict, tables: dict | None = None):
+        self.default_label = spec["default"]["label"]
+        self.default_confidence = float(spec["default"]["confidence"])
+
+        self.labels = [entry["label"] for entry in spec["labels"]]
+        self.confidences = [float(entry["confidence"]) for entry in spec["labels"]]
+
+        tables = tables or compile_automaton(spec)
+        self._classes = tables["classes"]
+        self._delta = tables["delta"]
+        offsets, outputs = tables["output_offsets"], tables["outputs"]
+        self._state_labels = [tuple(outputs[offsets[s]:offsets[s + 1]]) for s in range(len(offsets) - 1)]
+        self._state_hits = np.zeros((len(self._state_labels), len(self.labels)), np.int64)  # accepting state -> hits
+        for state, numbers in enumerate(self._state_labels):
+            np.add.at(self._state_hits[state], list(numbers), 1)
+        self._width = tables["width"]
+        self._accepting_rows = tables["accepting_rows"]
+        self._start = tables["start"]
+
+    def count_hits(self, text: str) -> list[int]:
+        """Single pass over the text -> hits per label number (every keyword ending at each byte)"""
+        hits = [0] * len(self.labels)
+        delta, state_labels, width, accepting = self._delta, self._state_labels, self._width, self._accepting_rows
+        state = self._start
+        for cls in text.casefold().encode("utf-8").translate(self._classes):
+            state = delta[state + cls]
+            if state < accepting:
+                for number in state_labels[state // width]:
+                    hits[number] += 1
+        return hits
+
+    def rank_hits(self, hits: list[int]) -> list[tuple[str, float]]:
+        """Turn hit counts into a ranked [(label, confidence)] list"""
+        ranked = sorted((number for number, count in enumerate(hits) if count),
+                        key=lambda number: -hits[number])  # stable: taxonomy order breaks ties
+        if not ranked:
+            return [(self.default_label, self.default_confidence)]
+        return [(self.labels[number], self.confidences[number]) for number in ranked]
+
+    def rank(self, text: str) -> list[tuple[str, float]]:
+        """All matching labels, best first"""
+        return self.rank_hits(self.count_hits(text))
+
+    def predict(self, text: str) -> tuple[str, float]:
+        """Best label and its confidence"""
+        return self.rank(text)[0]
+
+    def count_hits_many(self, texts) -> np.ndarray:
+        """
+        Hits per label number of many texts -> int array (texts x labels)
+
+        The DFA runs over all texts together: sorted longest first, their
+        character classes laid out position x text, each byte position is
+        ONE add + ONE table lookup over every text that long (NumPy work
+        per position instead of Python work per byte). Texts go in groups
+        of at most SCAN_CELLS padded bytes. It pays off from about
+        SCAN_MIN_TEXTS texts (~1.4-2x faster at 256-1000 texts of 200-5,000
+        chars); smaller batches (micro-batches) are counted text by text.
+        """
+        if len(texts) < SCAN_MIN_TEXTS:
+            hits = [self.count_hits(str(text)) for text in texts]
+            return np.array(hits, np.int64).reshape(len(hits), len(self.labels))
+        encoded = [str(text).casefold().encode("utf-8").translate(self._classes) for text in texts]
+        lengths = np.fromiter(map(len, encoded), np.int64, len(encoded))
+        order = np.argsort(-lengths, kind="stable")
+        hits = np.zeros((len(encoded), len(self.labels)), np.int64)
+        first = 0
+        while first < len(order) and lengths[order[first]] > 0:
+            group = order[first:first + max(1, SCAN_CELLS // int(lengths[order[first]]))]
+            first += len(group)
+            rows, states = self._scan([encoded[i] for i in group], lengths[group])
+            np.add.at(hits, group[rows], self._state_hits[states])
+        return hits
+
+    def _scan(self, encoded: list[bytes], lengths: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """(text, accepting state) of every keyword end in `encoded` (sorted longest first)"""
+        longest = int(lengths[0])
+        classes = np.zeros((longest, len(encoded)), np.int32)  # same type as the states: no cast per step
+        classes.T[np.arange(longest) < lengths[:, None]] = np.frombuffer(b"".join(encoded), np.uint8)
+        # visited[position, text]: state after that byte; past a text's end it stays non-accepting
+        visited = np.full((longest + 1, len(encoded)), self._accepting_rows, np.int32)
+        visited[0] = self._start
+        delta = np.frombuffer(self._delta, np.int32)
+        step = np.empty(len(encoded), np.int32)
+        ends = lengths.tolist()
+        start = 0
+        for active in range(len(encoded), 0, -1):  # the shortest texts drop out first
+            end = ends[active - 1]  # every one of the first `active` texts is this long
+            if end <= start:
+                continue
+            previous, current = visited[:-1, :active], visited[1:, :active]
+            columns, row = classes[:, :active], step[:active]
+            for position in range(start, end):
+                np.add(previous[position], columns[position], out=row)
+                delta.take(row, out=current[position], mode="clip")  # clip: indices are valid, no copy
+            start = end
+        positions, rows = np.nonzero(visited[1:] < self._accepting_rows)
+        return rows, visited[1:][positions, rows] // self._width
+
+    def predict_many(self, texts) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Best label and confidence of many texts (count_hits_many)
+
+        Accepts any sequence of strings (list, tuple, NumPy array of str)
+        and returns NumPy arrays of labels (str objects) and confidences
+        aligned with the input, the same answers as predict() per text.
+        """
+        hits = self.count_hits_many(texts)
+        best = np.full(len(hits), len(self.labels))  # default label
+        if self.labels:
+            top = hits.argmax(axis=1)  # first maximum: taxonomy order breaks ties
+            matched = hits[np.arange(len(hits)), top] > 0
+            best[matched] = top[matched]
+        labels = np.array([*self.labels, self.default_label], dtype=object)
+        confidences = np.array([*self.confidences, self.default_confidence], dtype=np.float64)
+        return labels[best], confidences[best]
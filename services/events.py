@@ -0,0 +1,55 @@
+# services/events.py
+from typing import Callable, Iterable
+
+from utils.logger import logger
+
+
+class PredictionEvents:
+    """
+    In-process notifications about committed prediction rows
+
+    WHY: Derived structures (the search index) must follow inserts and
+         deletes, without every write path knowing about each of them
+    HOW: Write paths call inserted() / deleted() AFTER their commit;
+         subscribers run synchronously in the caller's thread and must be
+         quick. A failing subscriber is logged, never breaks the write.
+         Rows written by other processes are not seen here (subscribers
+         catch up from the table themselves)
+    """
+
+    def __init__(self):
+        self._on_inserted: list[Callable] = []
+        self._on_deleted: list[Callable] = []
+
+    def subscribe(self, on_inserted: Callable | None = None, on_deleted: Callable | None = None):
+        if on_inserted is not None:
+            self._on_inserted.append(on_inserted)
+        if on_deleted is not None:
+            self._on_deleted.append(on_deleted)
+
+    def unsubscribe(self, on_inserted: Callable | None = None, on_deleted: Callable | None = None):
+        if on_inserted in self._on_inserted:
+            self._on_inserted.remove(on_inserted)
+        if on_deleted in self._on_deleted:
+            self._on_deleted.remove(on_deleted)
+
+    def inserted(self, rows: Iterable[tuple[int, str]]):
+        """rows: (prediction id, case text)"""
+        self._publish(self._on_inserted, list(rows))
+
+    def deleted(self, ids: Iterable[int]):
+        self._publish(self._on_deleted, list(ids))
+
+    @staticmethod
+    def _publish(handlers: list[Callable], items: list):
+        if not items:
+            return
+        for handler in handlers:
+            try:
+                handler(items)
+            except Exception as e:
+                logger.error(f"XX Prediction event handler {getattr(handler, '__qualname__', handler)} "
+                             f"failed: {str(e)}")
+
+
+prediction_events = PredictionEvents()
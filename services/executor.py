@@ -0,0 +1,169 @@
+# services/executor.py
+import asyncio
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable
+
+from utils.logger import logger
+
+# Model instance living inside a pool worker process
+_worker_model = None
+
+
+def _init_worker(model_factory: Callable):
+    """
+    Runs once in every new pool worker: builds its model ONCE
+
+    Workers start from a clean interpreter (forkserver / spawn), so they
+    inherit nothing from the gunicorn worker; what is shared between them is
+    the memory-mapped model artifact (services/artifacts.py), through the
+    page cache.
+    """
+    global _worker_model
+    if _worker_model is None:
+        _worker_model = model_factory()
+
+
+def _call_model(method: str, arg):
+    return getattr(_worker_model, method)(arg)
+
+
+class ThreadInferenceExecutor:
+    """
+    Runs model methods in a dedicated thread pool
+
+    WHY: Keeps inference off Starlette's shared threadpool (used by every
+         sync endpoint); fine for light models that release the GIL
+    HOW: Every call names the model instance it runs on, so nothing has to
+         happen here when a new version is swapped in
+    """
+
+    kind = "thread"
+
+    def __init__(self, model, workers: int = 4):
+        self.workers = workers
+        self._pool: ThreadPoolExecutor | None = None
+
+    def start(self):
+        self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="inference")
+        logger.info(f">> Inference executor: thread pool ({self.workers} threads)")
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def add_model(self, model, model_factory: Callable | None = None):
+        pass
+
+    def release(self, model):
+        pass
+
+    async def run(self, model, method: str, arg):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._pool, getattr(model, method), arg)
+
+
+class ProcessInferenceExecutor:
+    """
+    Runs model methods in a pool of worker processes
+
+    WHY: A CPU-heavy model serializes on the GIL in a thread pool
+    HOW: One pool per model instance in use (the active one, plus a
+         swapped-out one until its last pinned request is done, see
+         InferenceService.pin); each worker process loads its model in
+         `_init_worker`.
+         Every gunicorn worker owns its own pool, so the model is loaded
+         once per pool worker; the big parts (artifact tables) are mapped,
+         not copied. Workers come from a "forkserver" (or "spawn"), never
+         from a fork of the gunicorn worker, which already runs an event
+         loop and threads. If a worker dies the pool is marked broken; we
+         rebuild it and retry the call once.
+    WHEN: Started in startup_event of each gunicorn worker
+    """
+
+    kind = "process"
+
+    def __init__(self, model, model_factory: Callable, workers: int = 2):
+        self.model = model
+        self.model_factory = model_factory
+        self.workers = workers
+        self.restarts = 0
+        self._pools: dict = {}      # model instance -> its pool
+        self._factories: dict = {}  # model instance -> factory its workers load it with
+        self._lock = threading.Lock()
+
+    def _context(self):
+        # forking a process with running threads can copy a lock held by
+        # another thread -> deadlocked child; the fork server is single threaded
+        if "forkserver" in multiprocessing.get_all_start_methods():
+            context = multiprocessing.get_context("forkserver")
+            context.set_forkserver_preload(["dependencies.models"])
+            return context
+        return multiprocessing.get_context("spawn")
+
+    def _new_pool(self, model_factory: Callable) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=self._context(),
+            initializer=_init_worker,
+            initargs=(model_factory,),
+        )
+
+    def start(self):
+        self.add_model(self.model, self.model_factory)
+        logger.info(f">> Inference executor: process pool ({self.workers} workers, "
+                    f"{self._context().get_start_method()})")
+
+    def shutdown(self):
+        with self._lock:
+            pools, self._pools = list(self._pools.values()), {}
+            self._factories = {}
+        for pool in pools:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    def add_model(self, model, model_factory: Callable | None = None):
+        """Workers for a new model (the pools of older ones stay until released)"""
+        with self._lock:
+            self.model = model
+            if model_factory is not None:
+                self.model_factory = model_factory
+            self._factories[model] = self.model_factory
+            self._pools[model] = self._new_pool(self.model_factory)
+
+    def release(self, model):
+        """No request uses `model` any more: stop its workers (running calls finish)"""
+        with self._lock:
+            pool = self._pools.pop(model, None)
+            self._factories.pop(model, None)
+        if pool is not None:
+            pool.shutdown(wait=False)
+
+    def _restart(self, model, broken_pool: ProcessPoolExecutor):
+        with self._lock:
+            if self._pools.get(model) is not broken_pool:
+                return  # another caller already replaced it (or it was released)
+            logger.error("XX Inference worker died, restarting process pool")
+            self.restarts += 1
+            self._pools[model] = self._new_pool(self._factories[model])
+        broken_pool.shutdown(wait=False)
+
+    async def run(self, model, method: str, arg):
+        loop = asyncio.get_running_loop()
+        pool = self._pools[model]
+        try:
+            return await loop.run_in_executor(pool, _call_model, method, arg)
+        except BrokenProcessPool:
+            self._restart(model, pool)
+            return await loop.run_in_executor(self._pools[model], _call_model, method, arg)
+
+
+def create_executor(settings, model, model_factory: Callable):
+    """Build the executor selected by `settings.inference_executor`"""
+    if settings.inference_executor == "process":
+        return ProcessInferenceExecutor(model, model_factory, workers=settings.inference_workers)
+    if settings.inference_executor != "thread":
+        logger.warning(f"!! Unknown inference_executor '{settings.inference_executor}', using thread")
+    return ThreadInferenceExecutor(model, workers=settings.inference_workers)
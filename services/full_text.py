@@ -0,0 +1,66 @@
+# services/full_text.py
+from sqlalchemy import Integer, func, literal_column, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql import column, table
+
+from core.schema import FTS_TABLE, SEARCH_CONFIG, SEARCH_VECTOR
+from models.case_texts import CaseText
+from models.predictions import Prediction
+from services.search_index import tokenize
+
+_fts = table(FTS_TABLE, column("rowid", Integer))
+
+
+def _sqlite_match(terms: list[str]):
+    # tokens are [a-z0-9]+ only: quoting each one keeps FTS5 syntax out of user input
+    return literal_column(FTS_TABLE).op("MATCH")(" OR ".join(f'"{term}"' for term in terms))
+
+
+def _postgres_query(terms: list[str]):
+    return func.to_tsquery(literal_column(f"'{SEARCH_CONFIG}'::regconfig"), " | ".join(terms))
+
+
+async def search_database(db: AsyncSession, query: str, offset: int,
+                          limit: int) -> tuple[int, list[tuple[int, float]]]:
+    """
+    /search with search_backend = "database": ranked page + total in SQL
+
+    WHY: The in-memory index (services/search_index.py) costs every worker
+         the memory of the whole index
+    HOW: Same query semantics as the memory backend: any of the words
+         (OR), best first, ties newest first. SQLite: FTS5 bm25() on
+         predictions_fts. PostgreSQL: ts_rank_cd over case_texts
+         (GIN index on search_vector) joined to the predictions using
+         each text. The tables are set up by ensure_full_text_search
+         (core/schema.py)
+    Returns (number of matching predictions, [(prediction id, score)]).
+    """
+    terms = list(dict.fromkeys(tokenize(query)))
+    if not terms:
+        return 0, []
+
+    dialect = db.get_bind().dialect.name
+    if dialect == "sqlite":
+        match = _sqlite_match(terms)
+        rank = func.bm25(literal_column(FTS_TABLE))  # lower = better
+        page = (
+            select(_fts.c.rowid, (-rank).label("score"))
+            .where(match)
+            .order_by(rank, _fts.c.rowid.desc())
+        )
+        count = select(func.count()).select_from(_fts).where(match)
+    else:  # postgresql: ensure_full_text_search refuses other databases at startup
+        vector = literal_column(f"{CaseText.__tablename__}.{SEARCH_VECTOR}")
+        tsquery = _postgres_query(terms)
+        rank = func.ts_rank_cd(vector, tsquery)
+        matching = (
+            select(Prediction.id)
+            .join(CaseText, CaseText.hash == Prediction.case_hash)
+            .where(vector.op("@@")(tsquery))
+        )
+        page = matching.add_columns(rank.label("score")).order_by(rank.desc(), Prediction.id.desc())
+        count = select(func.count()).select_from(matching.subquery())
+
+    total = await db.scalar(count)
+    rows = (await db.execute(page.limit(limit).offset(offset))).all()
+    return total, [(row[0], float(row[1])) for row in rows]
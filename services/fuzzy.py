@@ -0,0 +1,140 @@
+# services/fuzzy.py
+from typing import Iterable
+
+import numpy as np
+
+ALPHABET = "$abcdefghijklmnopqrstuvwxyz0123456789"  # tokens are [a-z0-9]+, "$" pads both ends
+GRAMS = len(ALPHABET) ** 3
+_CODES = np.zeros(256, np.int64)
+_CODES[np.frombuffer(ALPHABET.encode("ascii"), np.uint8)] = np.arange(len(ALPHABET))
+_CODE = {char: i for i, char in enumerate(ALPHABET)}
+
+
+def max_edits(term: str) -> int:
+    """Typos tolerated in a term: none up to 2 characters, 1 up to 5, else 2"""
+    return 0 if len(term) <= 2 else 1 if len(term) <= 5 else 2
+
+
+def trigrams(term: str) -> set[int]:
+    """Distinct trigram keys of "$term$" """
+    codes = [_CODE[char] for char in f"${term}$"]
+    return {codes[i] * 1369 + codes[i + 1] * 37 + codes[i + 2] for i in range(len(codes) - 2)}
+
+
+def edit_distances(word: str, candidates: list[str], limit: int) -> np.ndarray:
+    """
+    Levenshtein distance with adjacent transpositions (optimal string
+    alignment) from `word` to each candidate, capped at limit + 1
+
+    One dynamic-programming row per character of `word`, computed for all
+    candidates at once (insertions along a row are a running minimum);
+    candidates drop out as soon as a whole row exceeds the limit
+    """
+    lengths = np.fromiter(map(len, candidates), np.int64, len(candidates))
+    width = int(lengths.max())
+    chars = np.zeros((len(candidates), width), np.uint8)  # 0 never equals a token character
+    starts = np.repeat(np.cumsum(lengths) - lengths, lengths)
+    joined = np.frombuffer("".join(candidates).encode("ascii"), np.uint8)
+    chars[np.repeat(np.arange(len(candidates)), lengths), np.arange(len(joined)) - starts] = joined
+    word = np.frombuffer(word.encode("ascii"), np.uint8)
+
+    columns = np.arange(width + 1)
+    result = np.full(len(candidates), limit + 1)
+    active = np.arange(len(candidates))  # candidates still within the limit
+    before, previous = None, np.tile(columns, (len(candidates), 1))
+    for i in range(1, len(word) + 1):
+        best = np.minimum(previous[:, 1:] + 1, previous[:, :-1] + (chars != word[i - 1]))
+        if i > 1:
+            swapped = (chars[:, :-1] == word[i - 1]) & (chars[:, 1:] == word[i - 2])
+            best[:, 1:] = np.where(swapped, np.minimum(best[:, 1:], before[:, :-2] + 1), best[:, 1:])
+        row = np.concatenate([np.full((len(active), 1), i), best], axis=1)
+        before, previous = previous, np.minimum.accumulate(row - columns, axis=1) + columns
+        within = previous.min(axis=1) <= limit  # a row minimum never decreases again
+        if not within.all():
+            active, chars, lengths = active[within], chars[within], lengths[within]
+            before, previous = before[within], previous[within]
+            if len(active) == 0:
+                return result
+    result[active] = np.minimum(previous[np.arange(len(active)), lengths], limit + 1)
+    return result
+
+
+class TrigramIndex:
+    """
+    Terms by the trigrams they contain: typo-tolerant term lookup
+
+    WHY: A misspelled query word ("thfet", "boundry") matches no posting;
+         comparing it with every term of a million-term vocabulary costs
+         seconds
+    HOW: CSR arrays trigram -> term numbers, built with a few vectorized
+         passes (one sort). A term within k edits of the query shares at
+         least (query trigrams - 4k) of them (a transposition breaks 4),
+         so only terms that reach that count, at least 1, and have a close
+         enough length get the exact edit distance, computed for all of
+         them at once. Terms added later wait in a small dict until the
+         owner rebuilds the arrays (due)
+    """
+
+    def __init__(self, terms: list[str] = ()):
+        self.terms = list(terms)
+        self._indexed = len(self.terms)
+        lengths = np.fromiter((len(term) for term in self.terms), np.int64, len(self.terms))
+        self._lengths = lengths.astype(np.int32)
+        self._offsets = np.zeros(GRAMS + 1, np.int64)
+        self._ids = np.zeros(0, np.int32)
+        self._pending: dict[int, list[int]] = {}  # trigram -> terms added since the build
+        if lengths.sum():
+            self._build(lengths)
+
+    def _build(self, lengths: np.ndarray):
+        codes = _CODES[np.frombuffer("".join(f"${term}$" for term in self.terms).encode("ascii"), np.uint8)]
+        owner = np.repeat(np.arange(len(lengths)), lengths)  # one window per character
+        at = np.arange(len(owner)) + 2 * owner               # window start in the padded string
+        keys = codes[at] * 1369 + codes[at + 1] * 37 + codes[at + 2]
+        pairs = np.unique(keys * len(lengths) + owner)       # distinct (trigram, term), by trigram
+        self._ids = (pairs % len(lengths)).astype(np.int32)
+        np.cumsum(np.bincount(pairs // len(lengths), minlength=GRAMS), out=self._offsets[1:])
+
+    def add(self, terms: Iterable[str]):
+        """Terms not in the index yet"""
+        for term in terms:
+            number = len(self.terms)
+            self.terms.append(term)
+            for gram in trigrams(term):
+                self._pending.setdefault(gram, []).append(number)
+
+    def due(self) -> bool:
+        """Enough terms wait in the dict to rebuild the arrays"""
+        return len(self.terms) - self._indexed > max(4096, self._indexed // 8)
+
+    def closest(self, term: str) -> tuple[list[str], int]:
+        """
+        The indexed terms fewest edits away from `term` (at most max_edits)
+        and that number of edits; ([], 0) when there is none.
+        One edit is tried first: its trigram filter is much tighter
+        """
+        limit = max_edits(term)
+        if limit == 0:
+            return [], 0
+        grams = trigrams(term)
+        parts = [self._ids[self._offsets[gram]:self._offsets[gram + 1]] for gram in grams]
+        parts += [np.asarray(self._pending[gram], np.int32) for gram in grams if gram in self._pending]
+        numbers = np.concatenate(parts) if parts else np.zeros(0, np.int32)
+        base = numbers[numbers < self._indexed]
+        numbers = np.concatenate([base[np.abs(self._lengths[base] - len(term)) <= limit],
+                                  numbers[numbers >= self._indexed]])
+        if len(numbers) == 0:
+            return [], 0
+        numbers, shared = np.unique(numbers, return_counts=True)
+
+        for edits in range(1, limit + 1):
+            candidates = [self.terms[number] for number in
+                          numbers[shared >= max(1, len(grams) - 4 * edits)].tolist()
+                          if abs(len(self.terms[number]) - len(term)) <= edits]
+            if not candidates:
+                continue
+            distances = edit_distances(term, candidates, edits)
+            if (distances <= edits).any():
+                best = int(distances.min())
+                return list(dict.fromkeys(candidates[i] for i in np.flatnonzero(distances == best))), best
+        return [], 0
@@ -0,0 +1,137 @@
+# services/history.py
+import base64
+import json
+from datetime import datetime, timezone
+from typing import AsyncIterator, Callable
+
+from sqlalchemy import Select, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core.database import async_engine
+from models.predictions import Prediction
+from services.batch_io import to_csv, to_ndjson
+from services.case_texts import case_text_column, with_case_texts
+from utils.exceptions import BaroException
+
+EXPORT_COLUMNS = ["id", "case_text", "category", "confidence", "model_version", "created_at"]
+
+
+def encode_cursor(created_at: datetime, prediction_id: int) -> str:
+    """Opaque page token pointing at the last row of a page"""
+    raw = json.dumps({"t": created_at.isoformat(), "i": prediction_id}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, int]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded))
+        return datetime.fromisoformat(data["t"]), int(data["i"])
+    except (ValueError, KeyError, TypeError):
+        raise BaroException(detail="Invalid cursor")
+
+
+def _utc(value: datetime) -> datetime:
+    # stored timestamps are UTC; an offset given by the client is converted
+    return value.astimezone(timezone.utc) if value.tzinfo is not None else value
+
+
+def history_filters(category: str | None = None, model_version: str | None = None,
+                    since: datetime | None = None, until: datetime | None = None) -> list:
+    """WHERE clauses shared by history, export and stats (since inclusive, until exclusive)"""
+    clauses = []
+    if category is not None:
+        clauses.append(Prediction.category == category)
+    if model_version is not None:
+        clauses.append(Prediction.model_version == model_version)
+    if since is not None:
+        clauses.append(Prediction.created_at >= _utc(since))
+    if until is not None:
+        clauses.append(Prediction.created_at < _utc(until))
+    return clauses
+
+
+def history_page_query(limit: int, cursor: str | None = None, filters: list | None = None) -> Select:
+    """
+    One page of predictions, newest first, by keyset (created_at, id)
+
+    WHY: OFFSET pagination reads and throws away every skipped row, so
+         deep pages get slower as the table grows
+    HOW: The cursor is the (created_at, id) of the previous page's last
+         row; `(created_at, id) < cursor` + ORDER BY both DESC is a range
+         scan on the matching composite index (models/predictions.py),
+         the cost of a page does not depend on how deep it is
+    """
+    query = export_select().where(*(filters or []))
+    if cursor is not None:
+        created_at, prediction_id = decode_cursor(cursor)
+        # plain tuple on the right: values are bound with the columns' types
+        query = query.where(tuple_(Prediction.created_at, Prediction.id) < (created_at, prediction_id))
+    # one extra row tells whether there is a next page
+    return query.order_by(Prediction.created_at.desc(), Prediction.id.desc()).limit(limit + 1)
+
+
+def export_columns() -> list:
+    return [case_text_column() if name == "case_text" else getattr(Prediction, name)
+            for name in EXPORT_COLUMNS]
+
+
+def export_select() -> Select:
+    """Column-only select of predictions with their text resolved from case_texts"""
+    return with_case_texts(select(*export_columns()))
+
+
+async def rows_by_id(db: AsyncSession, prediction_ids: list[int]) -> dict:
+    """Predictions ranked by an index (search, similar cases), by id; deleted ones are missing"""
+    if not prediction_ids:
+        return {}
+    result = await db.execute(export_select().where(Prediction.id.in_(prediction_ids)))
+    return {row["id"]: row for row in result.mappings()}
+
+
+def export_record(row) -> dict:
+    """One exported / archived prediction (row of a column-only select)"""
+    return {
+        "id": row.id,
+        "case_text": row.case_text,
+        "category": row.category,
+        "confidence": row.confidence,
+        "model_version": row.model_version,
+        "created_at": row.created_at.isoformat() if row.created_at else None,
+    }
+
+
+async def iter_export(filters: list, output: str, batch_size: int,
+                      connect: Callable = async_engine.connect) -> AsyncIterator[str]:
+    """
+    Stream predictions oldest first as NDJSON / CSV text chunks, in constant memory
+
+    WHY: Pulling history page by page (and .all() into ORM objects) was
+         the only way to get predictions out for offline analysis
+    HOW: A column-only SELECT (plain rows, no ORM identity map) is streamed
+         with a server-side cursor (asyncpg) / incremental fetch (SQLite);
+         `batch_size` rows are fetched, formatted and yielded at a time.
+         Uses its own connection from `connect` (primary or read replica):
+         the response body runs after the request's dependencies are closed
+    """
+    query = (
+        export_select()
+        .where(*filters)
+        .order_by(Prediction.created_at, Prediction.id)
+        .execution_options(yield_per=batch_size)
+    )
+
+    header = output == "csv"
+    async with connect() as connection:
+        result = await connection.stream(query)
+        async for rows in result.partitions():
+            records = [export_record(row) for row in rows]
+            if output == "csv":
+                yield to_csv(records, header=header, columns=EXPORT_COLUMNS)
+                header = False
+            else:
+                yield to_ndjson(records)
+
+    if header:  # no rows: still a valid CSV file
+        yield to_csv([], header=True, columns=EXPORT_COLUMNS)
+
@@ -0,0 +1,284 @@
+# services/inference.py
+import asyncio
+import random
+import time
+from contextlib import contextmanager
+from typing import Callable, Iterator
+
+from fastapi.concurrency import run_in_threadpool
+
+from dependencies.config import Settings
+from services.batcher import MicroBatcher
+from services.cache import PredictionCache
+from services.executor import create_executor
+from utils.logger import logger
+
+
+class PinnedModel:
+    """
+    One model instance and its version, fixed for a whole request
+
+    WHY: Reading the active version and running the model at two different
+         moments let a hot swap in between store a prediction under a
+         version that did not compute it
+    HOW: Same API as InferenceService, every call runs on `model` and
+         `version` is what the caller persists
+    WHEN: InferenceService.pin()
+    """
+
+    def __init__(self, service: "InferenceService", model):
+        self.service = service
+        self.model = model
+        self.version = model.model_version
+
+    async def predict_category(self, text: str) -> tuple[str, float]:
+        return await self.service._predict_one(self.model, "category", text)
+
+    async def predict_crime(self, text: str) -> tuple[str, float]:
+        return await self.service._predict_one(self.model, "crime", text)
+
+    async def predict_category_batch(self, texts: list[str]) -> tuple[list[str], list[float]]:
+        return await self.service._predict_many(self.model, "category", texts)
+
+    async def predict_crime_batch(self, texts: list[str]) -> tuple[list[str], list[float]]:
+        return await self.service._predict_many(self.model, "crime", texts)
+
+
+class InferenceService:
+    """
+    Single entry point for every model call made by the endpoints
+
+    WHY: Endpoints should not care HOW the model is run (batched, threaded...)
+    HOW: Results are looked up in the PredictionCache first; misses of
+         single-text calls go through a MicroBatcher per task, misses of
+         batch calls go straight to the model's batch API. The model itself
+         runs on the selected executor (thread pool or process pool).
+         A sampled share of single-text calls is mirrored to an optional
+         shadow model whose output is only logged, never returned.
+         A request pins the active model once (pin) and uses it for
+         every call, so a hot swap never changes the model under it
+    WHEN: Created by ModelProvider once the model is loaded
+    """
+
+    def __init__(self, model, settings: Settings, model_factory: Callable | None = None):
+        self.settings = settings
+        self.executor = create_executor(settings, model, model_factory or type(model))
+        self.cache = (
+            PredictionCache(
+                max_entries=settings.cache_max_entries,
+                max_bytes=settings.cache_max_bytes,
+                ttl_seconds=settings.cache_ttl_seconds,
+            )
+            if settings.cache_enabled else None
+        )
+        self._model = model
+        self._pins: dict = {}  # model instance -> requests holding it
+        self._retired: set = set()  # swapped-out models still pinned
+
+        self.shadow_model = None
+        self.shadow_sample_rate = 0.0
+        self.shadow_stats = {"calls": 0, "agreements": 0, "errors": 0, "latency_ms_total": 0.0}
+        self._shadow_tasks: set[asyncio.Task] = set()
+
+        self.batchers: dict[str, MicroBatcher] = {}
+        if settings.micro_batch_enabled:
+            for task in ("category", "crime"):
+                self.batchers[task] = MicroBatcher(
+                    batch_fn=self._batch_fn(task),
+                    window_ms=settings.micro_batch_window_ms,
+                    max_batch_size=settings.micro_batch_max_size,
+                    max_queue_size=settings.micro_batch_queue_depth,
+                    name=task,
+                )
+
+    @property
+    def model(self):
+        return self._model
+
+    def swap_model(self, new_model, model_factory: Callable | None = None):
+        """
+        Atomically make `new_model` the one used by new calls
+
+        Requests already running keep the instance they pinned; the old
+        one is released once the last of them is done.
+        Swapping to another version invalidates every cached prediction.
+        """
+        old_model = self._model
+        self.executor.add_model(new_model, model_factory)
+        self._model = new_model
+        if self._pins.get(old_model):
+            self._retired.add(old_model)
+        else:
+            self.executor.release(old_model)
+        if self.cache is not None and new_model.model_version != old_model.model_version:
+            self.cache.invalidate()
+
+    @contextmanager
+    def pin(self) -> Iterator[PinnedModel]:
+        """The active model, kept for everything done inside the block"""
+        model = self._model
+        self._pins[model] = self._pins.get(model, 0) + 1
+        try:
+            yield PinnedModel(self, model)
+        finally:
+            self._pins[model] -= 1
+            if not self._pins[model]:
+                del self._pins[model]
+                if model in self._retired:
+                    self._retired.discard(model)
+                    self.executor.release(model)
+
+    def set_shadow(self, model, sample_rate: float):
+        """Mirror `sample_rate` (0..1) of single-text calls to `model` (None = off)"""
+        self.shadow_model = model
+        self.shadow_sample_rate = sample_rate if model is not None else 0.0
+        self.shadow_stats = {"calls": 0, "agreements": 0, "errors": 0, "latency_ms_total": 0.0}
+
+    def _maybe_shadow(self, task: str, text: str, label: str):
+        if self.shadow_model is None or random.random() >= self.shadow_sample_rate:
+            return
+        shadow_task = asyncio.create_task(self._run_shadow(self.shadow_model, task, text, label))
+        self._shadow_tasks.add(shadow_task)  # keep a reference until it finishes
+        shadow_task.add_done_callback(self._shadow_tasks.discard)
+
+    async def _run_shadow(self, shadow, task: str, text: str, active_label: str):
+        method = shadow.predict_category if task == "category" else shadow.predict_crime
+        start = time.perf_counter()
+        try:
+            label, confidence = await run_in_threadpool(method, text)
+        except Exception as e:
+            self.shadow_stats["errors"] += 1
+            logger.warning(f"!! [shadow {shadow.model_version}] {task} failed: {str(e)}")
+            return
+        latency_ms = (time.perf_counter() - start) * 1000
+
+        self.shadow_stats["calls"] += 1
+        self.shadow_stats["agreements"] += label == active_label
+        self.shadow_stats["latency_ms_total"] += latency_ms
+        logger.info(
+            f"   [shadow {shadow.model_version}] {task}: active='{active_label}' "
+            f"shadow='{label}' ({confidence}) agree={label == active_label} "
+            f"latency={latency_ms:.2f}ms"
+        )
+
+    def _batch_fn(self, task: str):
+        async def run(model, texts: list[str]) -> tuple[list[str], list[float]]:
+            return await self._run_batch(model, task, texts)
+        return run
+
+    async def _run_batch(self, model, task: str, texts: list[str]) -> tuple[list[str], list[float]]:
+        method = "predict_category_batch" if task == "category" else "predict_crime_batch"
+        return await self.executor.run(model, method, texts)
+
+    async def _run_one(self, model, task: str, text: str) -> tuple[str, float]:
+        batcher = self.batchers.get(task)
+        if batcher is not None:
+            return await batcher.submit(text, model)
+
+        method = "predict_category" if task == "category" else "predict_crime"
+        return await self.executor.run(model, method, text)
+
+    async def start(self):
+        self.executor.start()
+        for batcher in self.batchers.values():
+            await batcher.start()
+        logger.info(f"OK Inference service ready (micro-batching: {bool(self.batchers)})")
+
+    async def stop(self):
+        for batcher in self.batchers.values():
+            await batcher.stop()
+        for shadow_task in list(self._shadow_tasks):
+            shadow_task.cancel()
+        self.executor.shutdown()
+
+    async def _predict_one(self, model, task: str, text: str) -> tuple[str, float]:
+        if self.cache is None:
+            label, confidence = await self._run_one(model, task, text)
+            self._maybe_shadow(task, text, label)
+            return label, confidence
+
+        version = model.model_version
+        cached = self.cache.get(task, text, version)
+        if cached is not None:
+            self._maybe_shadow(task, text, cached[0])
+            return cached
+
+        label, confidence = await self._run_one(model, task, text)
+        self.cache.put(task, text, version, label, confidence)
+        self._maybe_shadow(task, text, label)
+        return label, confidence
+
+    async def _predict_many(self, model, task: str, texts: list[str]) -> tuple[list[str], list[float]]:
+        if self.cache is None:
+            return await self._run_batch(model, task, texts)
+
+        version = model.model_version
+        labels: list = [None] * len(texts)
+        confidences: list = [None] * len(texts)
+        missing = []  # indexes that need the model
+        for i, text in enumerate(texts):
+            cached = self.cache.get(task, text, version)
+            if cached is None:
+                missing.append(i)
+            else:
+                labels[i], confidences[i] = cached
+
+        if missing:
+            new_labels, new_confidences = await self._run_batch(model, task, [texts[i] for i in missing])
+            for i, label, confidence in zip(missing, new_labels, new_confidences):
+                labels[i], confidences[i] = label, confidence
+                self.cache.put(task, texts[i], version, label, confidence)
+
+        return labels, confidences
+
+    # ============ Public API used by the routers ============
+    # one call on the active model; pin() when the version matters too
+    async def predict_category(self, text: str) -> tuple[str, float]:
+        with self.pin() as pinned:
+            return await pinned.predict_category(text)
+
+    async def predict_crime(self, text: str) -> tuple[str, float]:
+        with self.pin() as pinned:
+            return await pinned.predict_crime(text)
+
+    async def predict_category_batch(self, texts: list[str]) -> tuple[list[str], list[float]]:
+        with self.pin() as pinned:
+            return await pinned.predict_category_batch(texts)
+
+    async def predict_crime_batch(self, texts: list[str]) -> tuple[list[str], list[float]]:
+        with self.pin() as pinned:
+            return await pinned.predict_crime_batch(texts)
+
+    def stats(self) -> dict:
+        return {
+            "executor": {
+                "kind": self.executor.kind,
+                "workers": self.executor.workers,
+                "restarts": getattr(self.executor, "restarts", 0),
+            },
+            "cache": self.cache.stats() if self.cache is not None else {},
+            "shadow": self.shadow_summary(),
+            "batchers": self._batcher_stats(),
+        }
+
+    def shadow_summary(self) -> dict:
+        calls = self.shadow_stats["calls"]
+        return {
+            "version": self.shadow_model.model_version if self.shadow_model else None,
+            "sample_rate": self.shadow_sample_rate,
+            "calls": calls,
+            "errors": self.shadow_stats["errors"],
+            "agreement": round(self.shadow_stats["agreements"] / calls, 4) if calls else None,
+            "avg_latency_ms": round(self.shadow_stats["latency_ms_total"] / calls, 3) if calls else None,
+        }
+
+    def _batcher_stats(self) -> dict:
+        return {
+            task: {
+                "queue_depth": batcher.queue_depth,
+                "batches": batcher.batches,
+                "items": batcher.items,
+                "avg_batch_size": round(batcher.items / batcher.batches, 2) if batcher.batches else 0,
+            }
+            for task, batcher in self.batchers.items()
+        }
@@ -0,0 +1,366 @@
+# services/jobs.py
+import asyncio
+import os
+import shutil
+import socket
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import BinaryIO
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import and_, func, or_, select, update
+from sqlalchemy.orm import Session
+
+from core.database import run_write, sessionlocal
+from dependencies.config import Settings
+from models.jobs import BatchJob
+from services.batch_io import (CSV_COLUMNS, PERSISTED_CSV_COLUMNS, classify_chunks, detect_input_format,
+                               iter_texts, open_text_stream, to_csv, to_ndjson)
+from services.persistence import persist_records
+from utils.logger import logger
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _aware(value: datetime | None) -> datetime | None:
+    # SQLite hands timezone-aware columns back naive (they are stored as UTC)
+    if value is not None and value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value
+
+
+# ============ Submitting / reporting (used by routers/jobs.py) ============
+def create_job(settings: Settings, raw: BinaryIO, filename: str | None,
+               input_format: str, text_field: str, output_format: str,
+               persist: bool = False) -> BatchJob:
+    """
+    Copy an upload into `jobs_dir` and queue it (blocking, run in the threadpool)
+
+    The upload is copied block by block, never read into memory.
+    """
+    os.makedirs(settings.jobs_dir, exist_ok=True)
+    job_id = uuid.uuid4().hex
+    input_path = os.path.join(settings.jobs_dir, f"{job_id}.input")
+    result_path = os.path.join(settings.jobs_dir, f"{job_id}.{output_format}")
+
+    raw.seek(0)
+    with open(input_path, "wb") as f:
+        shutil.copyfileobj(raw, f, 1024 * 1024)
+
+    job = BatchJob(
+        id=job_id,
+        status=QUEUED,
+        filename=filename,
+        input_format=detect_input_format(filename, input_format),
+        output_format=output_format,
+        text_field=text_field,
+        input_path=input_path,
+        result_path=result_path,
+        input_bytes=os.path.getsize(input_path),
+        persist=persist,
+    )
+    run_write(_insert_job, job)
+    logger.info(f">> Batch job {job_id} queued ({job.input_bytes} bytes, {job.input_format})")
+    return job
+
+
+def _insert_job(db: Session, job: BatchJob):
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+
+
+def _rowcount(db: Session, statement) -> int:
+    return db.execute(statement).rowcount
+
+
+def job_summary(job: BatchJob) -> dict:
+    """Status block returned by the jobs endpoints"""
+    if job.status == SUCCEEDED:
+        progress = 1.0
+    elif job.input_bytes:
+        progress = min(job.bytes_read / job.input_bytes, 0.99)
+    else:
+        progress = 0.0
+
+    return {
+        "job_id": job.id,
+        "status": job.status,
+        "filename": job.filename,
+        "processed_rows": job.processed_rows,
+        "progress": round(progress, 4),
+        "rows_per_second": round(job.processed_rows / job.busy_seconds, 1) if job.busy_seconds else None,
+        "attempts": job.attempts,
+        "error": job.error,
+        "created_at": _aware(job.created_at),
+        "started_at": _aware(job.started_at),
+        "finished_at": _aware(job.finished_at),
+        "result_url": f"/legal/jobs/{job.id}/result" if job.status == SUCCEEDED else None,
+    }
+
+
+# ============ Local worker pool ============
+class LostJobError(Exception):
+    """Another worker took the job over (our heartbeat went stale)"""
+
+
+class JobRunner:
+    """
+    Local worker pool for batch jobs, the database is the queue
+
+    WHY: Big batch files had to finish inside ONE HTTP request (gunicorn
+         timeout = 120) and kept a request worker busy the whole time
+    HOW: `job_workers` asyncio workers poll the batch_jobs table and claim
+         a job with an atomic compare-and-set UPDATE, so gunicorn workers
+         (or hosts) sharing the database never run the same job twice.
+         A job is classified chunk by chunk through the InferenceService;
+         after each chunk the results are appended to the result file and
+         the position is committed together with a heartbeat. If a worker
+         dies, its heartbeat goes stale and the job is claimed again,
+         resuming after the last committed chunk
+    WHEN: Started in startup_event when job_workers > 0, or as a separate
+          process (python -m services.jobs) with job_workers=0 on the web side
+    """
+
+    def __init__(self, settings: Settings, registry):
+        self.settings = settings
+        self.registry = registry
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self.current: dict[str, str] = {}  # worker name -> job id
+        self.completed = 0
+        self.failed = 0
+        self._tasks: list[asyncio.Task] = []
+
+    def start(self):
+        for n in range(self.settings.job_workers):
+            name = f"{self.worker_id}:{n}"
+            self._tasks.append(asyncio.create_task(self._work(name), name=f"job-worker-{n}"))
+        logger.info(f"OK Batch job workers started ({self.settings.job_workers})")
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def stats(self) -> dict:
+        return {
+            "workers": len(self._tasks),
+            "running": dict(self.current),
+            "completed": self.completed,
+            "failed": self.failed,
+        }
+
+    async def _work(self, worker: str):
+        poll = self.settings.job_poll_seconds
+        while True:
+            if not self.registry.ready:
+                await asyncio.sleep(poll)
+                continue
+            try:
+                job_id = await run_in_threadpool(self._claim, worker)
+            except Exception as e:
+                logger.error(f"XX [{worker}] Could not poll batch jobs: {str(e)}")
+                job_id = None
+            if job_id is None:
+                await asyncio.sleep(poll)
+                continue
+
+            self.current[worker] = job_id
+            try:
+                await self._run(job_id, worker)
+            except Exception as e:  # e.g. loading the job: it goes stale and is claimed again
+                logger.error(f"XX [{worker}] Batch job {job_id} could not be run: {str(e)}")
+                await asyncio.sleep(poll)
+            finally:
+                self.current.pop(worker, None)
+
+    # ============ Claiming ============
+    def _claimable(self):
+        stale_before = _now() - timedelta(seconds=self.settings.job_stale_seconds)
+        return or_(
+            BatchJob.status == QUEUED,
+            and_(BatchJob.status == RUNNING, BatchJob.heartbeat_at < stale_before),
+        )
+
+    def _claim(self, worker: str) -> str | None:
+        """Claim the oldest queued (or abandoned) job, None if there is nothing to do"""
+        with sessionlocal() as db:
+            candidates = db.execute(
+                select(BatchJob.id).where(self._claimable()).order_by(BatchJob.created_at).limit(5)
+            ).scalars().all()
+
+        for job_id in candidates:
+            if run_write(self._claim_job, job_id, worker):
+                return job_id
+        return None
+
+    def _claim_job(self, db: Session, job_id: str, worker: str) -> bool:
+        now = _now()
+        # compare-and-set: only one worker's UPDATE matches the row
+        claimed = db.execute(
+            update(BatchJob)
+            .where(BatchJob.id == job_id, self._claimable())
+            .values(status=RUNNING, worker_id=worker, heartbeat_at=now,
+                    attempts=BatchJob.attempts + 1,
+                    started_at=func.coalesce(BatchJob.started_at, now))
+            .execution_options(synchronize_session=False)
+        )
+        return claimed.rowcount == 1
+
+    def _load(self, job_id: str) -> BatchJob:
+        with sessionlocal() as db:
+            job = db.get(BatchJob, job_id)
+            db.expunge(job)
+            return job
+
+    def _checkpoint(self, job_id: str, worker: str, **values):
+        """Commit progress; only the worker that owns the job may write it"""
+        statement = (
+            update(BatchJob)
+            .where(BatchJob.id == job_id, BatchJob.worker_id == worker, BatchJob.status == RUNNING)
+            .values(heartbeat_at=_now(), **values)
+            .execution_options(synchronize_session=False)
+        )
+        if run_write(_rowcount, statement) != 1:
+            raise LostJobError(job_id)
+
+    def _release(self, job_id: str, worker: str):
+        """Shutdown: put the job back in the queue so it resumes right away"""
+        statement = (
+            update(BatchJob)
+            .where(BatchJob.id == job_id, BatchJob.worker_id == worker, BatchJob.status == RUNNING)
+            .values(status=QUEUED, worker_id=None, attempts=BatchJob.attempts - 1)
+            .execution_options(synchronize_session=False)
+        )
+        run_write(_rowcount, statement)
+
+    # ============ Processing ============
+    async def _run(self, job_id: str, worker: str):
+        job = await run_in_threadpool(self._load, job_id)
+        if job.attempts > self.settings.job_max_attempts:
+            await run_in_threadpool(self._checkpoint, job_id, worker, status=FAILED, finished_at=_now(),
+                                    error=f"Gave up after {self.settings.job_max_attempts} attempts")
+            self.failed += 1
+            logger.error(f"XX [{worker}] Batch job {job_id} gave up after {job.attempts - 1} attempts")
+            return
+
+        if job.last_row:
+            logger.info(f">> [{worker}] Resuming batch job {job_id} after row {job.last_row}")
+        else:
+            logger.info(f">> [{worker}] Starting batch job {job_id}")
+
+        try:
+            await self._process(job, worker)
+        except asyncio.CancelledError:
+            await run_in_threadpool(self._release, job_id, worker)
+            logger.info(f"   [{worker}] Batch job {job_id} released for resume")
+            raise
+        except LostJobError:
+            logger.warning(f"!! [{worker}] Batch job {job_id} was taken over by another worker")
+        except Exception as e:
+            self.failed += 1
+            logger.error(f"XX [{worker}] Batch job {job_id} failed: {str(e)}")
+            try:
+                await run_in_threadpool(self._checkpoint, job_id, worker,
+                                        status=FAILED, error=str(e), finished_at=_now())
+            except LostJobError:
+                pass
+        else:
+            self.completed += 1
+
+    async def _process(self, job: BatchJob, worker: str):
+        raw = await run_in_threadpool(open, job.input_path, "rb")
+        # resume: drop whatever was written after the last committed chunk
+        result = await run_in_threadpool(open, job.result_path, "r+b" if job.result_bytes else "wb")
+        try:
+            await run_in_threadpool(result.truncate, job.result_bytes)
+            result.seek(job.result_bytes)
+
+            # keep a reference: a collected TextIOWrapper closes `raw` with it
+            stream = open_text_stream(raw)
+            rows = (
+                (row, text)
+                for row, text in iter_texts(stream, job.input_format, job.text_field)
+                if row > job.last_row
+            )
+            processed, result_bytes, busy = job.processed_rows, job.result_bytes, job.busy_seconds
+            columns = PERSISTED_CSV_COLUMNS if job.persist else CSV_COLUMNS
+            if job.output_format == "csv" and result_bytes == 0:
+                result.write(to_csv([], header=True, columns=columns).encode("utf-8"))
+
+            started = time.perf_counter()
+            with self.registry.inference.pin() as pinned:  # one model version for the whole run
+                async for records in classify_chunks(rows, self.settings.batch_chunk_size,
+                                                     pinned):
+                    if job.persist:
+                        # a crash before the checkpoint re-saves this chunk on resume
+                        await persist_records(records, pinned.version,
+                                              self.settings.persist_chunk_size)
+                    data = to_csv(records, columns=columns) if job.output_format == "csv" else to_ndjson(records)
+                    await run_in_threadpool(self._append, result, data.encode("utf-8"))
+
+                    now = time.perf_counter()
+                    processed += len(records)
+                    result_bytes = result.tell()
+                    busy += now - started
+                    started = now
+                    await run_in_threadpool(
+                        self._checkpoint, job.id, worker,
+                        processed_rows=processed, last_row=records[-1]["row"],
+                        bytes_read=raw.tell(), result_bytes=result_bytes, busy_seconds=busy,
+                    )
+
+            await run_in_threadpool(self._append, result, b"")
+            await run_in_threadpool(
+                self._checkpoint, job.id, worker,
+                status=SUCCEEDED, finished_at=_now(), bytes_read=job.input_bytes,
+                result_bytes=result.tell(), busy_seconds=busy + time.perf_counter() - started,
+            )
+            logger.info(f"OK [{worker}] Batch job {job.id} done: {processed} rows")
+        finally:
+            raw.close()
+            result.close()
+
+    @staticmethod
+    def _append(f: BinaryIO, data: bytes):
+        # on disk BEFORE the checkpoint that points past it
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+
+
+if __name__ == "__main__":
+    # Standalone job worker, keeps batch work off the web workers:
+    #   JOB_WORKERS=2 python -m services.jobs   (and JOB_WORKERS=0 for gunicorn)
+    from core.database import engine
+    from core.schema import prepare_database
+    from dependencies.config import get_settings
+    from dependencies.models import FakeLegalModel
+    from services.registry import ModelRegistry
+
+    async def main():
+        settings = get_settings()
+        await run_in_threadpool(prepare_database, engine, settings)  # same schema path as main.py
+        registry = ModelRegistry(FakeLegalModel, settings)
+        registry.start()
+        runner = JobRunner(settings, registry)
+        runner.start()
+        try:
+            await asyncio.Event().wait()
+        finally:
+            await runner.stop()
+            await registry.stop()
+
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
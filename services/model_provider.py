@@ -0,0 +1,92 @@
+# services/model_provider.py
+import asyncio
+import time
+from typing import Callable
+
+from dependencies.config import Settings
+from services.inference import InferenceService
+from utils.logger import logger
+
+LOADING = "loading"
+READY = "ready"
+FAILED = "failed"
+
+
+class ModelProvider:
+    """
+    One shared owner of the legal model for the whole worker
+
+    WHY: Loading the model in startup_event blocked the server for the
+         whole load time, and get_legal_model() loaded a SECOND copy on
+         the first request that depended on it
+    HOW: The model is built in a background thread while the server is
+         already answering liveness checks. Until it is ready, model
+         endpoints get a fast 503 + Retry-After (see dependencies/models.py)
+    WHEN: start() in startup_event, stop() in shutdown_event
+          (used through its subclass services.registry.ModelRegistry)
+    """
+
+    def __init__(self, model_factory: Callable, settings: Settings):
+        self.model_factory = model_factory
+        self.settings = settings
+
+        self.status = LOADING
+        self.error: str | None = None
+        self.model = None
+        self.inference: InferenceService | None = None
+
+        self.started_at: float | None = None
+        self.load_seconds: float | None = None
+        self._task: asyncio.Task | None = None
+
+    @property
+    def ready(self) -> bool:
+        return self.status == READY
+
+    def start(self):
+        """Kick off loading in the background and return immediately"""
+        self.started_at = time.monotonic()
+        self._task = asyncio.create_task(self._load(), name="model-loader")
+
+    async def _load(self):
+        loop = asyncio.get_running_loop()
+        logger.info(">> Loading ML Model in background...")
+        try:
+            model = await loop.run_in_executor(None, self.model_factory)
+
+            inference = InferenceService(model, self.settings, model_factory=self.model_factory)
+            await inference.start()
+        except Exception as e:
+            self.status = FAILED
+            self.error = str(e)
+            logger.error(f"XX Failed to load model: {str(e)}")
+            return
+
+        self.model = model
+        self.inference = inference
+        self.load_seconds = round(time.monotonic() - self.started_at, 3)
+        self.status = READY
+        logger.info(f"OK Model loaded in {self.load_seconds}s! Version: {model.model_version}")
+
+    async def stop(self):
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+        if self.inference is not None:
+            logger.info("   Stopping inference service...")
+            await self.inference.stop()
+            self.inference = None
+        self.model = None
+
+    def describe(self) -> dict:
+        """Status block for the readiness endpoint"""
+        return {
+            "status": self.status,
+            "model_version": self.model.model_version if self.model else None,
+            "load_seconds": self.load_seconds,
+            "error": self.error,
+        }
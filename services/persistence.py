@@ -0,0 +1,151 @@
+# services/persistence.py
+import csv
+import io
+from datetime import datetime, timezone
+from typing import Iterable
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from core.database import run_write
+from models.predictions import Prediction
+from services.batch_io import iter_chunks
+from services.case_texts import delete_text_if_unreferenced, store_case_texts
+from services.events import prediction_events
+from services.rollups import apply_rollups, prediction_row
+from utils.logger import logger
+
+PREDICTION_COLUMNS = ("case_hash", "category", "confidence", "model_version", "created_at")
+
+
+def _rows(records: Iterable[dict], model_version: str) -> Iterable[dict]:
+    # created_at set here (not by the database): the rollups need it
+    created_at = datetime.now(timezone.utc)
+    for record in records:
+        yield {
+            "case_text": record["case_text"],
+            "category": record["category"],
+            "confidence": record["confidence"],
+            "model_version": model_version,
+            "created_at": created_at,
+        }
+
+
+def _copy_chunk(db: Session, chunk: list[dict]):
+    """PostgreSQL COPY FROM STDIN: fastest path, but returns no ids"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerows([row[column] for column in PREDICTION_COLUMNS] for row in chunk)
+    buffer.seek(0)
+
+    cursor = db.connection().connection.cursor()  # raw psycopg2 cursor, same transaction
+    try:
+        cursor.copy_expert(
+            f"COPY {Prediction.__tablename__} ({', '.join(PREDICTION_COLUMNS)}) FROM STDIN WITH (FORMAT csv)",
+            buffer,
+        )
+    finally:
+        cursor.close()
+
+
+def bulk_insert_predictions(db: Session, records: Iterable[dict], model_version: str,
+                            chunk_size: int = 5000, return_ids: bool = True) -> list[int]:
+    """
+    Save many predictions with a few multi-row statements
+
+    WHY: db.add + commit + refresh per row is one round trip (and one
+         transaction) per prediction -> hours for 100k rows
+    HOW: Rows are inserted `chunk_size` at a time, one commit per chunk.
+         With return_ids the INSERT .. RETURNING is batched into multi-row
+         VALUES statements (SQLAlchemy "insertmanyvalues") and the ids come
+         back in input order. Without ids, PostgreSQL uses COPY instead.
+    WHEN: predict_batch(persist=true) and batch jobs with persist=true
+
+    `records` are result dicts with case_text / category / confidence.
+    """
+    use_copy = not return_ids and db.get_bind().dialect.name == "postgresql"
+    statement = insert(Prediction).returning(Prediction.id, sort_by_parameter_order=True)
+
+    ids: list[int] = []
+    for chunk in iter_chunks(_rows(records, model_version), chunk_size):
+        # texts go to case_texts (once per distinct text), rows only keep the hash
+        hashes = store_case_texts(db, [row.pop("case_text") for row in chunk])
+        for row, case_hash in zip(chunk, hashes):
+            row["case_hash"] = case_hash
+        if use_copy:
+            _copy_chunk(db, chunk)
+        elif return_ids:
+            ids.extend(db.scalars(statement, chunk).all())
+        else:
+            db.execute(insert(Prediction), chunk)  # executemany
+        apply_rollups(db, chunk)  # same transaction as the rows
+        db.commit()
+    return ids
+
+
+def save_predictions(records: list[dict], model_version: str, chunk_size: int,
+                     return_ids: bool = True) -> list[int]:
+    """
+    bulk_insert_predictions with its own session (blocking, run in the threadpool)
+
+    Streaming responses and job workers outlive the request's get_db session.
+    """
+    try:
+        ids = run_write(bulk_insert_predictions, records, model_version, chunk_size, return_ids)
+    except Exception as e:
+        logger.error(f"XX Could not save {len(records)} predictions: {str(e)}")
+        raise
+    # without ids (COPY) the search index finds the rows by polling
+    prediction_events.inserted(zip(ids, (record["case_text"] for record in records)))
+    return ids
+
+
+def save_prediction(db: Session, case_text: str, category: str, confidence: float, model_version: str) -> int:
+    """One prediction (predict_case): text into case_texts, row + rollups in the same transaction; its id"""
+    case_hash, = store_case_texts(db, [case_text])
+    row = {
+        "case_hash": case_hash,
+        "category": category,
+        "confidence": confidence,
+        "model_version": model_version,
+        "created_at": datetime.now(timezone.utc),
+    }
+    result = db.execute(insert(Prediction.__table__), row)  # Core INSERT: no ORM flush / bulk path
+    apply_rollups(db, [row])
+    return result.inserted_primary_key[0]
+
+
+def write_predictions(db: Session, rows: list[dict]) -> list[int]:
+    """Queued rows of the write-behind writer (dicts with case_text) as one multi-row INSERT; their ids"""
+    hashes = store_case_texts(db, [row["case_text"] for row in rows])
+    rows = [{**row, "case_text": None, "case_hash": case_hash} for row, case_hash in zip(rows, hashes)]
+    ids = db.scalars(insert(Prediction).returning(Prediction.id, sort_by_parameter_order=True), rows).all()
+    apply_rollups(db, rows)
+    return list(ids)
+
+
+def remove_prediction(db: Session, prediction_id: int) -> bool:
+    """
+    Delete one prediction and take it out of the rollups; False if it does not exist
+
+    Its case text goes too when no other prediction points at it
+    (retention is optional, nothing else would reclaim it)
+    """
+    prediction = db.get(Prediction, prediction_id)
+    if prediction is None:
+        return False
+    apply_rollups(db, [prediction_row(prediction)], sign=-1)
+    case_hash = prediction.case_hash
+    db.delete(prediction)
+    if case_hash is not None:
+        db.flush()
+        delete_text_if_unreferenced(db, case_hash)
+    return True
+
+
+async def persist_records(records: list[dict], model_version: str, chunk_size: int):
+    """Save one chunk of batch results and add the new row "id" to each record"""
+    ids = await run_in_threadpool(save_predictions, records, model_version, chunk_size)
+    for record, prediction_id in zip(records, ids):
+        record["id"] = prediction_id
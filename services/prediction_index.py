@@ -0,0 +1,192 @@
+# services/prediction_index.py
+import asyncio
+import threading
+import time
+from typing import Iterable
+
+import numpy as np
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import select
+
+from core.database import sessionlocal
+from models.predictions import Prediction
+from services.case_texts import case_text_column, with_case_texts
+from services.events import prediction_events
+from utils.file_lock import file_lock
+from utils.logger import logger
+
+
+class PredictionIndex:
+    """
+    Base of the in-process indexes that follow the predictions table
+
+    WHY: The full-text index (services/search_index.py) and the similar-case
+         index (services/similarity.py) must both see every insert and
+         delete and survive restarts without rebuilding from the table
+    HOW: Updates: prediction_events (this process, right after commit) and
+         a poll of `id > watermark` every `refresh_seconds` (rows written
+         by other workers / processes). Rows indexed from an event are
+         remembered until the poll passes them, so none is added twice.
+         The subclass snapshots itself (save / load) every
+         `snapshot_seconds` when it changed and on shutdown; a restart
+         loads it and only catches up on newer rows.
+         Subclasses implement _prepare / _insert / _delete / save / load,
+         optionally maintain (merges, retraining) and build_started
+    """
+
+    name = "Index"
+
+    def __init__(self, refresh_seconds: float, snapshot_seconds: float):
+        self.refresh_seconds = refresh_seconds
+        self.snapshot_seconds = snapshot_seconds
+        self._lock = threading.RLock()
+        self._maintenance = threading.Lock()  # catch-up / maintain / snapshot: one at a time
+        self.watermark = 0                    # every prediction id <= watermark was polled
+        self._local_ids: set[int] = set()     # indexed from events, not polled yet
+        self.ready = False
+        self.changes = 0
+        self.last_snapshot: float | None = None
+        self._task: asyncio.Task | None = None
+
+    # ============ Subclass hooks ============
+    def _prepare(self, rows: list[tuple[int, str]]) -> list[tuple[int, object]]:
+        """Per-row work done outside the lock (tokenizing, embedding)"""
+        return rows
+
+    def _insert(self, rows: list[tuple[int, object]]):
+        """Index prepared rows (under the lock)"""
+        raise NotImplementedError
+
+    def _delete(self, prediction_ids: np.ndarray) -> int:
+        """Drop rows (under the lock), return how many were indexed"""
+        raise NotImplementedError
+
+    def maintain(self):
+        """Background upkeep after each catch-up chunk (under _maintenance)"""
+
+    def build_started(self):
+        """No snapshot: called before the first catch-up indexes the whole table"""
+
+    def save(self):
+        raise NotImplementedError
+
+    def load(self) -> bool:
+        raise NotImplementedError
+
+    def _snapshot_lock(self, shared: bool = False):
+        """Snapshot files of `self.path` between the workers of a host: exclusive to write, shared to read"""
+        return file_lock(f"{self.path}.lock", shared=shared)
+
+    # ============ Updates ============
+    def add(self, rows: Iterable[tuple[int, str]], local: bool = True):
+        """Index (prediction id, case text) rows; local = from this process' events"""
+        prepared = self._prepare([(int(prediction_id), text) for prediction_id, text in rows if text])
+        with self._lock:
+            fresh = []
+            for prediction_id, item in prepared:
+                if local and prediction_id <= self.watermark:
+                    continue  # the poll got there first
+                if not local and prediction_id in self._local_ids:
+                    continue  # already indexed from its event
+                fresh.append((prediction_id, item))
+                if local:
+                    self._local_ids.add(prediction_id)
+            self._insert(fresh)
+            self.changes += len(fresh)
+
+    def remove(self, prediction_ids: Iterable[int]):
+        ids = np.fromiter(prediction_ids, np.int64)
+        if len(ids) == 0:
+            return
+        with self._lock:
+            self.changes += self._delete(ids)
+            self._local_ids.difference_update(ids.tolist())  # SQLite may hand the id out again
+
+    def catch_up(self, chunk_size: int = 5000) -> int:
+        """Index predictions with id > watermark (other processes, downtime, first build)"""
+        added = 0
+        while True:
+            query = (
+                with_case_texts(select(Prediction.id, case_text_column()))
+                .where(Prediction.id > self.watermark)
+                .order_by(Prediction.id)
+                .limit(chunk_size)
+            )
+            with sessionlocal() as db:
+                rows = db.execute(query).all()
+            if not rows:
+                break
+            self.add(((row.id, row.case_text) for row in rows), local=False)
+            with self._lock:
+                self.watermark = rows[-1].id
+                self._local_ids = {i for i in self._local_ids if i > self.watermark}
+            added += len(rows)
+            self.maintain()
+        return added
+
+    # ============ Background loop ============
+    def start(self):
+        prediction_events.subscribe(on_inserted=self.add, on_deleted=self.remove)
+        self._task = asyncio.create_task(self._run(), name=self.name.lower().replace(" ", "-"))
+
+    def _open(self):
+        with self._maintenance:
+            self._open_locked()
+
+    def _open_locked(self):
+        started = time.perf_counter()
+        try:
+            loaded = self.load()
+        except Exception as e:
+            logger.error(f"XX {self.name} snapshot unreadable, rebuilding: {str(e)}")
+            loaded = False
+        if not loaded:
+            self.build_started()
+        added = self.catch_up()
+        self.ready = True
+        logger.info(f"OK {self.name} ready in {time.perf_counter() - started:.1f}s "
+                    f"({'snapshot + ' if loaded else ''}{added} rows from the table)")
+        if added and not loaded:
+            self.save()
+
+    def _refresh(self):
+        with self._maintenance:
+            self.catch_up()
+            self.maintain()
+            due = self.last_snapshot is None or time.time() - self.last_snapshot >= self.snapshot_seconds
+            if self.changes and due:
+                self.save()
+
+    async def _run(self):
+        try:
+            await run_in_threadpool(self._open)
+        except Exception as e:
+            logger.error(f"XX {self.name} build failed: {str(e)}")
+        while True:
+            await asyncio.sleep(self.refresh_seconds)
+            try:
+                await run_in_threadpool(self._refresh)
+            except Exception as e:
+                logger.error(f"XX {self.name} refresh failed: {str(e)}")
+
+    def stats(self) -> dict:
+        return {
+            "ready": self.ready,
+            "watermark": self.watermark,
+            "last_snapshot": self.last_snapshot,
+        }
+
+    async def stop(self):
+        prediction_events.unsubscribe(on_inserted=self.add, on_deleted=self.remove)
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        if self.ready and self.changes:
+            await run_in_threadpool(self._save)
+
+    def _save(self):
+        with self._maintenance:  # waits for a refresh still running in its thread
+            self.save()
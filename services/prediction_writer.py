@@ -0,0 +1,146 @@
+# services/prediction_writer.py
+import asyncio
+import time
+from datetime import datetime, timezone
+
+from core.database import run_write_async
+from dependencies.config import Settings
+from services.events import prediction_events
+from services.persistence import write_predictions
+from utils.logger import logger
+
+
+class PredictionWriter:
+    """
+    Write-behind buffer for Prediction rows
+
+    WHY: Every /legal/legal/predict call waited for its own INSERT + commit,
+         so request latency followed database commit latency
+    HOW: submit() puts the row on an in-process queue and returns at once.
+         One background task flushes rows as a single multi-row INSERT
+         every `write_behind_flush_ms` or `write_behind_batch_size` rows,
+         retrying failed flushes with exponential backoff. stop() flushes
+         everything still queued.
+         Trade-off: rows still in the queue are lost if the process is
+         killed (SIGKILL / OOM), a clean shutdown loses nothing
+    WHEN: Created in startup_event when prediction_write_behind is on
+    """
+
+    def __init__(self, settings: Settings):
+        self.flush_interval = settings.write_behind_flush_ms / 1000
+        self.batch_size = settings.write_behind_batch_size
+        self.max_retries = settings.write_behind_max_retries
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=settings.write_behind_queue_size)
+
+        self.written = 0
+        self.batches = 0
+        self.retries = 0
+        self.dropped = 0
+        self.rejected = 0            # queue full -> caller wrote the row itself
+        self.last_flush_ms = 0.0     # duration of the last INSERT + commit
+        self.last_lag_ms = 0.0       # oldest row of the last batch: queued -> committed
+        self.max_lag_ms = 0.0
+        self._task: asyncio.Task | None = None
+        self._batch: list = []                     # rows taken off the queue, not flushed yet
+        self._flushing: asyncio.Task | None = None
+
+    def start(self):
+        self._task = asyncio.create_task(self._run(), name="prediction-writer")
+        logger.info(f"OK Prediction write-behind enabled (every {self.flush_interval * 1000:.0f}ms "
+                    f"or {self.batch_size} rows)")
+
+    def submit(self, case_text: str, category: str, confidence: float, model_version: str) -> bool:
+        """Queue one prediction; False if the queue is full (caller should write it directly)"""
+        row = {
+            "case_text": case_text,
+            "category": category,
+            "confidence": confidence,
+            "model_version": model_version,
+            "created_at": datetime.now(timezone.utc),  # request time, not flush time
+        }
+        try:
+            self.queue.put_nowait((time.monotonic(), row))
+        except asyncio.QueueFull:
+            self.rejected += 1
+            return False
+        return True
+
+    async def _collect(self):
+        """Wait for a first row, then gather more until the batch is full or the interval is over"""
+        self._batch.append(await self.queue.get())
+        deadline = time.monotonic() + self.flush_interval
+        while len(self._batch) < self.batch_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                self._batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+
+    async def _run(self):
+        while True:
+            await self._collect()  # rows collected so far stay in self._batch if cancelled
+            batch, self._batch = self._batch, []
+            # shielded: stop() never interrupts a commit half way
+            self._flushing = asyncio.create_task(self._flush(batch))
+            await asyncio.shield(self._flushing)
+
+    async def _flush(self, batch: list):
+        rows = [row for _, row in batch]
+        for attempt in range(self.max_retries + 1):
+            start = time.monotonic()
+            try:
+                ids = await run_write_async(write_predictions, rows)
+            except Exception as e:
+                if attempt == self.max_retries:
+                    self.dropped += len(rows)
+                    logger.error(f"XX Dropped {len(rows)} predictions after "
+                                 f"{self.max_retries} retries: {str(e)}")
+                    return
+                self.retries += 1
+                delay = min(0.1 * 2 ** attempt, 5.0)
+                logger.warning(f"!! Prediction flush failed ({str(e)}), retrying in {delay:.1f}s")
+                await asyncio.sleep(delay)
+                continue
+
+            prediction_events.inserted(zip(ids, (row["case_text"] for row in rows)))
+            now = time.monotonic()
+            self.written += len(rows)
+            self.batches += 1
+            self.last_flush_ms = round((now - start) * 1000, 3)
+            self.last_lag_ms = round((now - batch[0][0]) * 1000, 3)
+            self.max_lag_ms = max(self.max_lag_ms, self.last_lag_ms)
+            return
+
+    async def stop(self):
+        """Stop the background task and flush every queued row"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        if self._flushing is not None and not self._flushing.done():
+            await self._flushing
+        # the half-collected batch + whatever is still queued
+        batch, self._batch = self._batch, []
+        while batch or not self.queue.empty():
+            while not self.queue.empty() and len(batch) < self.batch_size:
+                batch.append(self.queue.get_nowait())
+            await self._flush(batch)
+            batch = []
+        logger.info(f"OK Prediction writer flushed ({self.written} rows written)")
+
+    def stats(self) -> dict:
+        return {
+            "queue_depth": self.queue.qsize(),
+            "written": self.written,
+            "batches": self.batches,
+            "retries": self.retries,
+            "dropped": self.dropped,
+            "rejected": self.rejected,
+            "last_flush_ms": self.last_flush_ms,
+            "last_lag_ms": self.last_lag_ms,
+            "max_lag_ms": self.max_lag_ms,
+        }
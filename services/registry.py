@@ -0,0 +1,186 @@
+# services/registry.py
+import asyncio
+import json
+import os
+import time
+from datetime import datetime, timezone
+from functools import partial
+from typing import Callable
+
+from dependencies.config import Settings
+from services.model_provider import ModelProvider
+from utils.logger import logger
+
+
+class ModelRegistry(ModelProvider):
+    """
+    Model registry: active version, zero-downtime hot swap, shadow model
+
+    WHY: Changing model_version meant restarting every gunicorn worker
+         and paying the full load again
+    HOW: activate(version) loads the new version in a background thread
+         while the old one keeps serving, then swaps it in atomically
+         between requests (requests already running finish on the old
+         instance they pinned, InferenceService.pin). An optional shadow version gets a sampled share of
+         the traffic; its answers are logged, never returned.
+         Every gunicorn worker has its own registry, so the wanted version
+         is also written to a small control file that all workers poll
+    WHEN: Created in startup_event as app.state.model_registry
+    """
+
+    def __init__(self, model_factory: Callable, settings: Settings):
+        self.control_file = settings.model_registry_file
+        # a version activated earlier (by any worker) wins over the setting
+        initial_version = self._read_control_file() or settings.model_version
+
+        # model_factory(model_version=...) -> model
+        super().__init__(partial(model_factory, model_version=initial_version), settings)
+        self.base_factory = model_factory
+
+        self.history: list[dict] = []  # versions activated in this worker
+        self.pending_version: str | None = None
+        self.last_swap_error: str | None = None
+        self.failed_version: str | None = None  # not retried by the control file watcher
+        self.shadow_model = None
+        self._swap_task: asyncio.Task | None = None
+        self._watch_task: asyncio.Task | None = None
+
+    @property
+    def active_version(self) -> str:
+        return self.model.model_version if self.model is not None else self.settings.model_version
+
+    def factory_for(self, version: str) -> Callable:
+        """Picklable factory for one version (process pool workers use it too)"""
+        return partial(self.base_factory, model_version=version)
+
+    async def _load(self):
+        await super()._load()
+        if not self.ready:
+            return
+        self._record(self.model.model_version)
+
+        if self.settings.shadow_model_version and self.settings.shadow_sample_rate > 0:
+            try:
+                await self.load_shadow(self.settings.shadow_model_version,
+                                       self.settings.shadow_sample_rate)
+            except Exception:
+                pass  # already logged; the active model keeps serving
+
+    def start(self):
+        super().start()
+        if self.control_file:
+            self._watch_task = asyncio.create_task(self._watch_control_file(), name="model-registry-watch")
+
+    # ============ Cross-worker control file ============
+    def _read_control_file(self) -> str | None:
+        if not self.control_file or not os.path.exists(self.control_file):
+            return None
+        try:
+            with open(self.control_file, encoding="utf-8") as f:
+                return json.load(f).get("active_version")
+        except (OSError, ValueError) as e:
+            logger.warning(f"!! Could not read {self.control_file}: {str(e)}")
+            return None
+
+    def _write_control_file(self, version: str):
+        if not self.control_file:
+            return
+        tmp_path = f"{self.control_file}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"active_version": version}, f)
+        os.replace(tmp_path, self.control_file)  # atomic, readers never see half a file
+
+    async def _watch_control_file(self):
+        """Follow versions activated through OTHER workers"""
+        while True:
+            await asyncio.sleep(self.settings.model_registry_poll_seconds)
+            if not self.ready:
+                continue
+            wanted = self._read_control_file()
+            if wanted and wanted not in (self.active_version, self.pending_version,
+                                         self.failed_version):
+                logger.info(f">> Control file asks for model {wanted}")
+                self.activate(wanted, broadcast=False)
+
+    def _record(self, version: str):
+        self.history.append({
+            "version": version,
+            "activated_at": datetime.now(timezone.utc).isoformat(),
+        })
+
+    # ============ Hot swap ============
+    def activate(self, version: str, broadcast: bool = True) -> bool:
+        """
+        Start loading `version` in the background; False if a swap is already running
+
+        broadcast=True also records it in the control file so the other
+        gunicorn workers follow within `model_registry_poll_seconds`.
+        """
+        if self._swap_task is not None and not self._swap_task.done():
+            return False
+        if broadcast:
+            self._write_control_file(version)
+        self.pending_version = version
+        self.last_swap_error = None
+        self._swap_task = asyncio.create_task(self._activate(version), name=f"model-swap-{version}")
+        return True
+
+    async def _activate(self, version: str):
+        loop = asyncio.get_running_loop()
+        factory = self.factory_for(version)
+        start = time.monotonic()
+        logger.info(f">> Loading model {version} in background (active: {self.active_version})")
+        try:
+            model = await loop.run_in_executor(None, factory)
+        except Exception as e:
+            self.last_swap_error = str(e)
+            self.failed_version = version
+            logger.error(f"XX Model {version} failed to load, keeping {self.active_version}: {str(e)}")
+            return
+        finally:
+            self.pending_version = None
+
+        # the swap itself: plain attribute assignments on the event loop thread
+        old_version = self.active_version
+        self.model = model
+        self.inference.swap_model(model, factory)
+        self._record(version)
+        logger.info(f"OK Model swapped {old_version} -> {version} "
+                    f"(loaded in {time.monotonic() - start:.2f}s)")
+
+    # ============ Shadow model ============
+    async def load_shadow(self, version: str, sample_rate: float):
+        """Load `version` as shadow and mirror `sample_rate` of traffic to it"""
+        loop = asyncio.get_running_loop()
+        try:
+            shadow = await loop.run_in_executor(None, self.factory_for(version))
+        except Exception as e:
+            logger.error(f"XX Shadow model {version} failed to load: {str(e)}")
+            raise
+        self.shadow_model = shadow
+        self.inference.set_shadow(shadow, sample_rate)
+        logger.info(f"OK Shadow model {version} receiving {sample_rate:.0%} of traffic")
+
+    def clear_shadow(self):
+        self.shadow_model = None
+        if self.inference is not None:
+            self.inference.set_shadow(None, 0.0)
+        logger.info("OK Shadow model removed")
+
+    async def stop(self):
+        for task in (self._swap_task, self._watch_task):
+            if task is not None and not task.done():
+                task.cancel()
+        self.shadow_model = None
+        await super().stop()
+
+    def describe(self) -> dict:
+        body = super().describe()
+        body.update({
+            "active_version": self.active_version,
+            "pending_version": self.pending_version,
+            "last_swap_error": self.last_swap_error,
+            "shadow": self.inference.shadow_summary() if self.inference is not None else None,
+            "history": self.history,
+        })
+        return body
@@ -0,0 +1,154 @@
+# services/replica.py
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from typing import AsyncIterator
+
+from sqlalchemy import func, select
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine, create_async_engine
+
+from core.database import async_engine, to_async_url
+from dependencies.config import Settings
+from models.predictions import Prediction
+from utils.logger import logger
+
+
+def _utc(value: datetime | None) -> datetime | None:
+    """Naive values (SQLite) are UTC already"""
+    if value is None or value.tzinfo is not None:
+        return value
+    return value.replace(tzinfo=timezone.utc)
+
+
+class ReplicaRouter:
+    """
+    Run read-only queries on a read replica while it is reachable and fresh enough
+
+    WHY: History pages, exports and stats ran on the primary and competed
+         with prediction writes for its connections and I/O
+    HOW: Every `replica_check_seconds` the newest predictions.created_at of
+         the replica is compared with the primary's: the difference is the
+         replica lag (how far back a reader could be). Reads use the replica
+         while it answers within `replica_timeout_seconds` and lags at most
+         `replica_max_lag_seconds`, otherwise the primary, until a later
+         check passes again. A failed connect during a request takes the
+         replica out at once. Writes never come here, they use the primary
+    WHEN: Created in startup_event when DATABASE_REPLICA_URL is set
+    """
+
+    def __init__(self, settings: Settings, primary: AsyncEngine = async_engine,
+                 replica: AsyncEngine | None = None):
+        self.settings = settings
+        self.primary = primary
+        self.replica = replica or create_async_engine(
+            to_async_url(settings.database_replica_url), pool_pre_ping=True
+        )
+        self.usable = False              # until the first check passes
+        self.lag_seconds: float | None = None
+        self.last_error: str | None = None
+        self.checked_at: float | None = None
+        self.replica_reads = 0
+        self.primary_reads = 0
+        self._task: asyncio.Task | None = None
+
+    def start(self):
+        self._task = asyncio.create_task(self._run(), name="replica-check")
+        logger.info(f"OK Read replica configured (max lag {self.settings.replica_max_lag_seconds}s)")
+
+    # ============ Health / lag ============
+    async def _newest(self, engine: AsyncEngine) -> datetime | None:
+        async with engine.connect() as connection:  # ix_predictions_created_at_id: one index probe
+            return _utc(await connection.scalar(select(func.max(Prediction.created_at))))
+
+    async def check(self) -> bool:
+        """Measure reachability + lag once, return whether reads may use the replica"""
+        timeout = self.settings.replica_timeout_seconds
+        try:
+            replica_newest = await asyncio.wait_for(self._newest(self.replica), timeout)
+        except (OSError, DBAPIError, asyncio.TimeoutError) as e:
+            self._mark_down(e)
+            return False
+        try:
+            primary_newest = await self._newest(self.primary)
+        except (OSError, DBAPIError) as e:  # cannot compare: keep the last decision
+            logger.warning(f"!! Replica lag unknown, primary did not answer: {str(e)}")
+            return self.usable
+
+        if primary_newest is None:
+            lag = 0.0
+        elif replica_newest is None:  # nothing replicated yet
+            lag = None
+        else:
+            lag = max(0.0, (primary_newest - replica_newest).total_seconds())
+        self.lag_seconds = lag
+        self.checked_at = time.time()
+        self.last_error = None
+
+        usable = lag is not None and lag <= self.settings.replica_max_lag_seconds
+        if usable != self.usable:
+            if usable:
+                logger.info(f"OK Read replica in use (lag {lag:.1f}s)")
+            else:
+                logger.warning(f"!! Read replica behind (lag {lag}s), reading from the primary")
+        self.usable = usable
+        return usable
+
+    def _mark_down(self, error: BaseException):
+        if self.usable:
+            logger.warning(f"!! Read replica unreachable, reading from the primary: {error!r}")
+        self.usable = False
+        self.last_error = repr(error)
+        self.checked_at = time.time()
+
+    async def _run(self):
+        while True:
+            try:
+                await self.check()
+            except Exception as e:
+                logger.error(f"XX Replica check failed: {str(e)}")
+            await asyncio.sleep(self.settings.replica_check_seconds)
+
+    # ============ Reads ============
+    @asynccontextmanager
+    async def connect(self) -> AsyncIterator[AsyncConnection]:
+        """Connection for a read-only query: the replica when usable, else the primary"""
+        if self.usable:
+            try:
+                connection = await asyncio.wait_for(
+                    self.replica.connect().start(), self.settings.replica_timeout_seconds
+                )
+            except (OSError, DBAPIError, asyncio.TimeoutError) as e:
+                self._mark_down(e)
+            else:
+                self.replica_reads += 1
+                try:
+                    yield connection
+                finally:
+                    await connection.close()
+                return
+
+        self.primary_reads += 1
+        async with self.primary.connect() as connection:
+            yield connection
+
+    def stats(self) -> dict:
+        return {
+            "usable": self.usable,
+            "lag_seconds": self.lag_seconds,
+            "max_lag_seconds": self.settings.replica_max_lag_seconds,
+            "last_error": self.last_error,
+            "checked_at": self.checked_at,
+            "replica_reads": self.replica_reads,
+            "primary_reads": self.primary_reads,
+        }
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        await self.replica.dispose()
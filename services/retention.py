@@ -0,0 +1,203 @@
+# services/retention.py
+import asyncio
+import gzip
+import json
+import os
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import delete
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from core.database import engine as default_engine, run_write
+from core.schema import ensure_month_partitions, is_partitioned, month_partitions
+from dependencies.config import Settings
+from models.predictions import Prediction
+from services.case_texts import delete_unreferenced_chunk
+from services.events import prediction_events
+from services.history import export_record, export_select
+from utils.file_lock import file_lock
+from utils.logger import logger
+
+
+class RetentionManager:
+    """
+    Archive and delete predictions older than `retention_days`
+
+    WHY: The predictions table grew forever; every index, backup and
+         VACUUM got more expensive week after week
+    HOW: Expired rows are written to one gzip-compressed JSONL file per
+         day (archive_dir/predictions/YYYY/MM/predictions-YYYY-MM-DD.jsonl.gz)
+         and then removed:
+         - PostgreSQL, partitioned by month: a month that is entirely
+           expired is archived, then its partition is DROPPED (no row
+           deletes, nothing left for VACUUM)
+         - otherwise: `retention_chunk_size` rows at a time, read, then
+           archived and fsynced outside any transaction, then deleted in
+           one short write transaction: a crash can only archive a chunk
+           twice, never lose it
+         Rollups (/legal/stats) keep the history of archived predictions;
+         case texts no remaining prediction points at are removed last,
+         also chunk by chunk.
+    WHEN: Every `retention_interval_seconds` in the app when retention_days > 0,
+          or once from cron: python -m services.retention
+    """
+
+    def __init__(self, settings: Settings, engine: Engine = default_engine):
+        self.settings = settings
+        self.engine = engine
+        self.archive_dir = os.path.join(settings.archive_dir, Prediction.__tablename__)
+        self.last_run: dict | None = None
+        self._task: asyncio.Task | None = None
+
+    def cutoff(self, now: datetime | None = None) -> datetime:
+        """Predictions created before this (start of a UTC day) are expired"""
+        now = now or datetime.now(timezone.utc)
+        today = now.astimezone(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+        return today - timedelta(days=self.settings.retention_days)
+
+    def _lock(self):
+        """One retention run at a time across the gunicorn workers of a host (yields False if busy)"""
+        return file_lock(os.path.join(self.archive_dir, ".retention.lock"), blocking=False)
+
+    # ============ Archive files ============
+    def _archive_path(self, day: str) -> str:
+        year, month, _ = day.split("-")
+        return os.path.join(self.archive_dir, year, month, f"{Prediction.__tablename__}-{day}.jsonl.gz")
+
+    def _archive(self, rows) -> int:
+        """Append rows to their day's .jsonl.gz (appending adds a gzip member, still one valid file)"""
+        by_day = defaultdict(list)
+        for row in rows:
+            created_at = row.created_at
+            if created_at.tzinfo is not None:  # PostgreSQL returns the session time zone
+                created_at = created_at.astimezone(timezone.utc)
+            by_day[created_at.date().isoformat()].append(export_record(row))
+
+        for day, records in by_day.items():
+            path = self._archive_path(day)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "ab") as f:
+                with gzip.GzipFile(fileobj=f, mode="ab") as archive:
+                    archive.write("".join(json.dumps(record) + "\n" for record in records).encode("utf-8"))
+                f.flush()
+                os.fsync(f.fileno())
+        return sum(len(records) for records in by_day.values())
+
+    # ============ Expiring ============
+    def _drop_expired_partitions(self, cutoff: datetime) -> list[str]:
+        dropped = []
+        for name, (start, end) in sorted(month_partitions(self.engine).items()):
+            end_at = datetime(end.year, end.month, end.day, tzinfo=timezone.utc)
+            if end_at > cutoff:
+                continue
+            start_at = datetime(start.year, start.month, start.day, tzinfo=timezone.utc)
+            query = (
+                export_select()
+                .where(Prediction.created_at >= start_at, Prediction.created_at < end_at)
+                .order_by(Prediction.created_at, Prediction.id)
+            )
+            archived = []  # ids only (for the search index), the rows are streamed
+            with self.engine.connect() as connection:
+                # server-side cursor: a whole month never sits in memory
+                result = connection.execution_options(
+                    stream_results=True, yield_per=self.settings.retention_chunk_size
+                ).execute(query)
+                for rows in result.partitions():
+                    self._archive(rows)
+                    archived.extend(row.id for row in rows)
+            with self.engine.begin() as connection:
+                connection.exec_driver_sql(f"DROP TABLE {name}")
+            prediction_events.deleted(archived)
+            logger.info(f"OK Partition {name} archived ({len(archived)} rows) and dropped")
+            dropped.append(name)
+        return dropped
+
+    def _delete_expired_rows(self, cutoff: datetime) -> int:
+        deleted = 0
+        chunk = (
+            export_select()
+            .where(Prediction.created_at < cutoff)
+            .order_by(Prediction.created_at, Prediction.id)
+            .limit(self.settings.retention_chunk_size)
+        )
+        while True:
+            with self.engine.connect() as connection:
+                rows = connection.execute(chunk).all()
+            if not rows:
+                return deleted
+            self._archive(rows)  # gzip + fsync: on disk before the delete, outside the writer
+            ids = [row.id for row in rows]
+            run_write(self._delete_chunk, ids)  # one short transaction per chunk
+            prediction_events.deleted(ids)
+            deleted += len(ids)
+
+    @staticmethod
+    def _delete_chunk(db: Session, ids: list[int]):
+        db.execute(delete(Prediction).where(Prediction.id.in_(ids)))
+
+    def _delete_unreferenced_texts(self) -> int:
+        removed, after = 0, ""
+        while after is not None:
+            count, after = run_write(delete_unreferenced_chunk, after, self.settings.retention_chunk_size)
+            removed += count
+        return removed
+
+    def run_once(self, now: datetime | None = None) -> dict:
+        """One retention pass (blocking)"""
+        cutoff = self.cutoff(now)
+        with self._lock() as acquired:
+            if not acquired:
+                logger.info("   Retention already running in another worker, skipped")
+                return {"skipped": True}
+
+            logger.info(f">> Archiving predictions older than {cutoff.isoformat()}")
+            dropped = []
+            if is_partitioned(self.engine):
+                dropped = self._drop_expired_partitions(cutoff)
+                ensure_month_partitions(self.engine, self.settings.partition_months_ahead)
+            deleted = self._delete_expired_rows(cutoff)
+            texts_removed = self._delete_unreferenced_texts()  # texts only expired predictions used
+
+        self.last_run = {
+            "at": datetime.now(timezone.utc).isoformat(),
+            "cutoff": cutoff.isoformat(),
+            "dropped_partitions": dropped,
+            "deleted_rows": deleted,
+            "deleted_case_texts": texts_removed,
+        }
+        logger.info(f"OK Retention done: {deleted} rows archived + deleted, "
+                    f"{len(dropped)} partitions dropped")
+        return self.last_run
+
+    # ============ Background loop ============
+    def start(self):
+        self._task = asyncio.create_task(self._run(), name="prediction-retention")
+
+    async def _run(self):
+        while True:
+            try:
+                await run_in_threadpool(self.run_once)
+            except Exception as e:
+                logger.error(f"XX Retention run failed: {str(e)}")
+            await asyncio.sleep(self.settings.retention_interval_seconds)
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+
+if __name__ == "__main__":
+    # cron: RETENTION_DAYS=90 python -m services.retention
+    from dependencies.config import get_settings
+
+    settings = get_settings()
+    if settings.retention_days <= 0:
+        raise SystemExit("RETENTION_DAYS is not set, nothing to do")
+    print(RetentionManager(settings).run_once())
@@ -0,0 +1,178 @@
+# services/rollups.py
+from collections import defaultdict
+from functools import lru_cache
+from datetime import datetime, timezone
+from typing import Iterable
+
+from sqlalchemy import func, insert, literal_column, select, update
+from sqlalchemy.orm import Session
+
+from models.predictions import Prediction
+from models.rollups import PredictionRollup
+from utils.logger import logger
+
+ROLLUP_KEY = ("bucket", "category", "model_version")
+
+
+def as_utc(value: datetime) -> datetime:
+    """Aware UTC datetime (naive values from SQLite are UTC already)"""
+    if value.tzinfo is not None:
+        return value.astimezone(timezone.utc)
+    return value.replace(tzinfo=timezone.utc)
+
+
+def hour_bucket(created_at: datetime) -> datetime:
+    """Start of the UTC hour"""
+    return as_utc(created_at).replace(minute=0, second=0, microsecond=0)
+
+
+def rollup_deltas(rows: Iterable[dict], sign: int = 1) -> list[dict]:
+    """
+    Group prediction rows into rollup increments
+
+    rows: dicts with created_at / category / model_version / confidence
+    sign: 1 for inserted rows, -1 for deleted ones
+    """
+    groups = defaultdict(lambda: [0, 0.0])
+    for row in rows:
+        group = groups[(hour_bucket(row["created_at"]), row["category"], row["model_version"])]
+        group[0] += sign
+        group[1] += sign * row["confidence"]
+    return [
+        {"bucket": bucket, "category": category, "model_version": model_version,
+         "count": count, "confidence_sum": confidence_sum}
+        for (bucket, category, model_version), (count, confidence_sum) in groups.items()
+    ]
+
+
+@lru_cache
+def _upsert(dialect: str):
+    """
+    INSERT .. ON CONFLICT DO UPDATE adding the deltas (PostgreSQL / SQLite)
+
+    Built once per dialect on the Table (Core, not the ORM bulk path) and
+    executed with the deltas as parameters, so it is compiled once too
+    (it runs with every saved prediction)
+    """
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+
+    table = PredictionRollup.__table__
+    statement = dialect_insert(table)
+    return statement.on_conflict_do_update(
+        index_elements=list(ROLLUP_KEY),
+        set_={
+            "count": table.c.count + statement.excluded.count,
+            "confidence_sum": table.c.confidence_sum + statement.excluded.confidence_sum,
+        },
+    )
+
+
+def _update(delta: dict):
+    return (
+        update(PredictionRollup)
+        .where(*(getattr(PredictionRollup, key) == delta[key] for key in ROLLUP_KEY))
+        .values(count=PredictionRollup.count + delta["count"],
+                confidence_sum=PredictionRollup.confidence_sum + delta["confidence_sum"])
+    )
+
+
+def apply_rollups(db: Session, rows: Iterable[dict], sign: int = 1):
+    """
+    Add (or with sign=-1 remove) prediction rows to the rollups
+
+    Runs in the caller's transaction, so the rollups commit (or roll
+    back) together with the predictions themselves.
+    """
+    deltas = rollup_deltas(rows, sign)
+    if not deltas:
+        return
+    dialect = db.get_bind().dialect.name
+    if dialect in ("postgresql", "sqlite"):
+        db.execute(_upsert(dialect), deltas)
+        return
+    for delta in deltas:  # other databases: update, insert when missing
+        if db.execute(_update(delta)).rowcount == 0:
+            db.execute(insert(PredictionRollup).values(delta))
+
+
+def prediction_row(prediction: Prediction) -> dict:
+    return {
+        "created_at": prediction.created_at,
+        "category": prediction.category,
+        "model_version": prediction.model_version,
+        "confidence": prediction.confidence,
+    }
+
+
+def rebuild_rollups(db: Session):
+    """
+    Recompute every rollup from the predictions table (one GROUP BY)
+
+    Used once when the rollup table is created on an existing database,
+    or by hand if rollups were ever edited outside the app.
+    """
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        utc = literal_column("'UTC'")
+        bucket = func.timezone(utc, func.date_trunc("hour", func.timezone(utc, Prediction.created_at)))
+    else:  # SQLite: same text format SQLAlchemy binds
+        bucket = func.strftime("%Y-%m-%d %H:00:00.000000", Prediction.created_at)
+    bucket = bucket.label("bucket")
+
+    grouped = (
+        select(bucket, Prediction.category, Prediction.model_version,
+               func.count(), func.sum(Prediction.confidence))
+        .group_by(bucket, Prediction.category, Prediction.model_version)
+    )
+    db.query(PredictionRollup).delete()
+    db.execute(
+        insert(PredictionRollup).from_select(
+            ["bucket", "category", "model_version", "count", "confidence_sum"], grouped
+        )
+    )
+    db.commit()
+    logger.info("OK Prediction rollups rebuilt")
+
+
+def summarize(rollups: Iterable[PredictionRollup], interval: str) -> dict:
+    """
+    Merge hourly rollups into `interval` buckets ("hour", "day" or "total")
+
+    The rollups of a range are small (hours x categories x versions), so
+    the merge is done here instead of another GROUP BY.
+    """
+    groups = defaultdict(lambda: [0, 0.0])
+    total_count, total_sum = 0, 0.0
+    for rollup in rollups:
+        if rollup.count <= 0:
+            continue
+        bucket = hour_bucket(rollup.bucket)
+        if interval == "day":
+            period = bucket.date().isoformat()
+        elif interval == "hour":
+            period = bucket.isoformat()
+        else:
+            period = None
+        group = groups[(period, rollup.category, rollup.model_version)]
+        group[0] += rollup.count
+        group[1] += rollup.confidence_sum
+        total_count += rollup.count
+        total_sum += rollup.confidence_sum
+
+    return {
+        "interval": interval,
+        "total": {
+            "count": total_count,
+            "avg_confidence": round(total_sum / total_count, 4) if total_count else None,
+        },
+        "buckets": [
+            {"period": period, "category": category, "model_version": model_version,
+             "count": count, "avg_confidence": round(confidence_sum / count, 4)}
+            for (period, category, model_version), (count, confidence_sum) in sorted(
+                groups.items(), key=lambda item: (item[0][0] or "", item[0][1], item[0][2])
+            )
+        ],
+    }
@@ -0,0 +1,556 @@
+# services/search_index.py
+import functools
+import json
+import math
+import os
+import re
+import time
+from collections import Counter
+
+import numpy as np
+
+from dependencies.config import Settings
+from services.fuzzy import TrigramIndex
+from services.prediction_index import PredictionIndex
+from utils.logger import logger
+
+TOKEN = re.compile(r"[a-z0-9]+")
+STOP_WORDS = frozenset(
+    "a an and are as at be but by for from has have he her his in is it its of on or she "
+    "that the their them they this to was were which will with".split()
+)
+K1, B = 1.2, 0.75  # BM25 term saturation / length normalization
+SNAPSHOT_VERSION = 1
+EXHAUSTIVE_POSTINGS = 100_000  # up to this many postings a query scores them all
+CHAMPIONS = 1024               # min. champion list length per frequent term
+BITSET_DENSITY = 64            # terms in >= 1/64 of the documents get a bitset (count + lookups)
+FUZZY_EXPANSIONS = 3           # indexed terms a misspelled query word is replaced by, at most
+
+
+def tokenize(text: str) -> list[str]:
+    """Lowercase words and numbers (section numbers matter), stop words dropped"""
+    return [token for token in TOKEN.findall(text.lower())
+            if token not in STOP_WORDS and (len(token) > 1 or token.isdigit())]
+
+
+class _Segment:
+    """
+    Immutable postings in CSR form: term i -> docs[offsets[i]:offsets[i + 1]]
+
+    Holds documents 0 .. size - 1 (doc numbers are assigned in insert
+    order) and is scored with the average length of the merge that built
+    it, so cached per-term data stays exact until the next merge
+    """
+
+    def __init__(self, terms: list[str], offsets: np.ndarray, docs: np.ndarray, tfs: np.ndarray,
+                 size: int = 0, avgdl: float = 1.0):
+        self.terms = terms
+        self.vocab = {term: i for i, term in enumerate(terms)}
+        self.offsets = offsets
+        self.docs = docs
+        self.tfs = tfs
+        self.size = size
+        self.avgdl = avgdl
+        self.champions: dict[int, tuple[np.ndarray, np.ndarray]] = {}  # term -> best docs, impacts
+        self.bitsets: dict[int, tuple[np.ndarray, np.ndarray]] = {}    # frequent term -> bits, ranks
+
+    @classmethod
+    def empty(cls) -> "_Segment":
+        return cls([], np.zeros(1, np.int64), np.zeros(0, np.int32), np.zeros(0, np.uint16))
+
+    def get(self, term: str):
+        i = self.vocab.get(term)
+        if i is None:
+            return None
+        start, end = self.offsets[i], self.offsets[i + 1]
+        return i, self.docs[start:end], self.tfs[start:end]
+
+    def champions_of(self, term: int, docs: np.ndarray, tfs: np.ndarray, doc_len: np.ndarray,
+                     depth: int) -> tuple[np.ndarray, float]:
+        """
+        The `depth` postings of a term with the highest BM25 impact, and the
+        highest impact left outside them (best first, cached until the next merge)
+        """
+        cached = self.champions.get(term)
+        if cached is None or len(cached[0]) < min(depth + 1, len(docs)):
+            weights = _impacts(tfs, doc_len[docs], self.avgdl)
+            keep = min(depth + 1, len(docs))
+            best = np.argpartition(-weights, keep - 1)[:keep]
+            best = best[np.argsort(-weights[best], kind="stable")]
+            cached = self.champions[term] = (docs[best], weights[best])
+        champions, weights = cached
+        return champions[:depth], float(weights[depth]) if len(weights) > depth else 0.0
+
+    def bitset_of(self, term: int, docs: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Docs of a frequent term as bits (uint64 words) + number of set bits
+        before each word: posting index of a doc = rank (cached until the next merge)
+        """
+        cached = self.bitsets.get(term)
+        if cached is None:
+            mask = np.zeros(self.size, bool)
+            mask[docs] = True
+            words = _words(mask)
+            ranks = np.zeros(len(words), np.int64)
+            np.cumsum(np.bitwise_count(words)[:-1], out=ranks[1:])
+            cached = self.bitsets[term] = (words, ranks)
+        return cached
+
+    def lookup(self, term: int, docs: np.ndarray, candidates: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """(posting index, found) of each candidate doc in a term's postings"""
+        if len(docs) * BITSET_DENSITY < self.size:  # short list: binary search
+            at = np.minimum(np.searchsorted(docs, candidates), len(docs) - 1)
+            return at, docs[at] == candidates
+        words, ranks = self.bitset_of(term, docs)
+        word = words[candidates >> 6]
+        bit = (candidates & 63).astype(np.uint64)
+        found = (word >> bit) & np.uint64(1) == 1
+        at = ranks[candidates >> 6] + np.bitwise_count(word & ((np.uint64(1) << bit) - np.uint64(1)))
+        return np.minimum(at, len(docs) - 1), found
+
+
+def _words(mask: np.ndarray) -> np.ndarray:
+    """bool mask -> uint64 words, bit i of word w = mask[w * 64 + i]"""
+    padded = np.zeros(-(-len(mask) // 64) * 64, bool)
+    padded[:len(mask)] = mask
+    return np.packbits(padded, bitorder="little").view("<u8")
+
+
+def _distinct(docs: np.ndarray) -> np.ndarray:
+    """Sorted unique docs (sorting beats np.unique's hash table here)"""
+    docs = np.sort(docs)
+    return docs[np.concatenate(([True], docs[1:] != docs[:-1]))] if len(docs) else docs
+
+
+def _impacts(tfs: np.ndarray, doc_len: np.ndarray, avgdl: float) -> np.ndarray:
+    """BM25 term-frequency part of each posting (times idf = its score)"""
+    tf = tfs.astype(np.float32)
+    return (K1 + 1) * tf / (tf + K1 * (1 - B + B * doc_len / avgdl))
+
+
+class _Delta:
+    """Documents added since the last merge: term -> growing Python posting lists"""
+
+    def __init__(self):
+        self.postings: dict[str, tuple[list[int], list[int]]] = {}
+        self.docs = 0
+
+    def add(self, doc: int, counts: Counter):
+        for term, tf in counts.items():
+            entry = self.postings.get(term)
+            if entry is None:
+                entry = self.postings[term] = ([], [])
+            entry[0].append(doc)
+            entry[1].append(min(tf, 65535))
+        self.docs += 1
+
+    def get(self, term: str):
+        entry = self.postings.get(term)
+        if entry is None:
+            return None
+        return np.asarray(entry[0], np.int32), np.asarray(entry[1], np.uint16)
+
+    def renumber(self, shift: int):
+        """Move every doc down by `shift` (dead docs before them were dropped)"""
+        for docs, _ in self.postings.values():
+            docs[:] = [doc - shift for doc in docs]
+
+
+def _sum_scores(docs: list[np.ndarray], scores: list[np.ndarray], size: int) -> tuple[np.ndarray, np.ndarray]:
+    """Add up per-term scores of the same documents: (unique docs, total scores)"""
+    if not docs:
+        return np.zeros(0, np.int32), np.zeros(0, np.float64)
+    if len(docs) == 1:  # one term: every doc appears once
+        return docs[0], scores[0].astype(np.float64)
+    docs, scores = np.concatenate(docs), np.concatenate(scores)
+    if len(docs) * 8 > size:  # many postings: one dense pass
+        totals = np.bincount(docs, weights=scores, minlength=size)
+        docs = np.flatnonzero(totals)
+        return docs, totals[docs]
+    order = np.argsort(docs, kind="stable")
+    docs, scores = docs[order], scores[order]
+    starts = np.flatnonzero(np.concatenate(([True], docs[1:] != docs[:-1])))
+    return docs[starts], np.add.reduceat(scores.astype(np.float64), starts)
+
+
+def _merge(segment: _Segment, delta: _Delta, size: int, avgdl: float, alive: np.ndarray) -> _Segment:
+    """
+    New segment = segment + delta without deleted docs, renumbered
+    0 .. alive - 1 (one stable sort by term id, docs keep their order)
+    """
+    terms = list(segment.terms)
+    vocab = dict(segment.vocab)
+    for term in delta.postings:
+        if term not in vocab:
+            vocab[term] = len(terms)
+            terms.append(term)
+
+    lengths = [len(docs) for docs, _ in delta.postings.values()]
+    delta_terms = np.repeat(np.fromiter((vocab[term] for term in delta.postings), np.int32,
+                                        len(delta.postings)), lengths)
+    delta_docs = np.fromiter((d for docs, _ in delta.postings.values() for d in docs), np.int32, sum(lengths))
+    delta_tfs = np.fromiter((t for _, tfs in delta.postings.values() for t in tfs), np.uint16, sum(lengths))
+
+    term_ids = np.concatenate([
+        np.repeat(np.arange(len(segment.terms), dtype=np.int32), np.diff(segment.offsets)), delta_terms
+    ])
+    docs = np.concatenate([segment.docs, delta_docs])
+    keep = alive[docs]
+    term_ids, docs, tfs = term_ids[keep], docs[keep], np.concatenate([segment.tfs, delta_tfs])[keep]
+    renumber = np.cumsum(alive, dtype=np.int32) - 1  # alive doc -> its number without the dead ones
+    order = np.argsort(term_ids, kind="stable")
+    offsets = np.zeros(len(terms) + 1, np.int64)
+    np.cumsum(np.bincount(term_ids, minlength=len(terms)), out=offsets[1:])
+    return _Segment(terms, offsets, renumber[docs[order]], tfs[order], int(renumber[-1]) + 1 if size else 0, avgdl)
+
+
+class SearchIndex(PredictionIndex):
+    """
+    In-process inverted index over prediction case texts, ranked with BM25
+
+    WHY: /search returned canned results; LIKE '%...%' on the predictions
+         table scans every row and cannot rank
+    HOW: Postings live in numpy arrays (CSR: term -> doc numbers + term
+         frequencies), so a query scores every posting of its terms in a
+         few vectorized operations. New documents go to a small in-memory
+         delta that is merged into the arrays in the background every
+         `search_merge_docs` documents. Deletes only clear an `alive` bit;
+         the next merge (at the latest the next snapshot) drops their
+         postings and doc numbers.
+         Fuzzy queries: a TrigramIndex of the vocabulary (services/fuzzy.py)
+         replaces unknown query words by the closest indexed terms.
+         Updates, catch-up and the background loop: PredictionIndex; the
+         snapshot is `search_snapshot_path` (.npz)
+    WHEN: Started in startup_event when search_backend = "memory"
+    """
+
+    name = "Search index"
+
+    def __init__(self, settings: Settings):
+        super().__init__(settings.search_refresh_seconds, settings.search_snapshot_seconds)
+        self.settings = settings
+        self.path = settings.search_snapshot_path
+        self._segment = _Segment.empty()
+        self._merging: _Delta | None = None   # frozen delta being merged in the background
+        self._delta = _Delta()
+        self._trigrams = TrigramIndex()             # every term of segment + deltas
+        self._doc_ids = np.zeros(1024, np.int64)    # doc number -> prediction id
+        self._doc_len = np.zeros(1024, np.float32)  # tokens per document
+        self._alive = np.zeros(1024, bool)
+        self._n = 0
+        self._alive_count = 0
+        self._total_len = 0.0
+        self.queries = 0
+        self.last_query_ms = 0.0
+
+    # ============ Updates ============
+    def _append(self, prediction_id: int, length: int) -> int:
+        if self._n == len(self._doc_ids):
+            size = max(1024, len(self._doc_ids) * 2)
+            self._doc_ids = np.resize(self._doc_ids, size)
+            self._doc_len = np.resize(self._doc_len, size)
+            self._alive = np.resize(self._alive, size)
+        doc = self._n
+        self._doc_ids[doc] = prediction_id
+        self._doc_len[doc] = length
+        self._alive[doc] = True
+        self._n += 1
+        self._alive_count += 1
+        self._total_len += length
+        return doc
+
+    def _prepare(self, rows: list[tuple[int, str]]) -> list[tuple[int, Counter]]:
+        return [(prediction_id, Counter(tokenize(text))) for prediction_id, text in rows]
+
+    def _insert(self, rows: list[tuple[int, Counter]]):
+        vocab, merging = self._segment.vocab, self._merging.postings if self._merging else {}
+        for prediction_id, counts in rows:
+            doc = self._append(prediction_id, sum(counts.values()))
+            new = [term for term in counts
+                   if term not in vocab and term not in merging and term not in self._delta.postings]
+            self._delta.add(doc, counts)
+            if new:
+                self._trigrams.add(new)
+
+    def _delete(self, prediction_ids: np.ndarray) -> int:
+        n = self._n
+        docs = np.flatnonzero(np.isin(self._doc_ids[:n], prediction_ids) & self._alive[:n])
+        self._alive[docs] = False
+        self._alive_count -= len(docs)
+        self._total_len -= float(self._doc_len[docs].sum())
+        return len(docs)
+
+    def maintain(self):
+        if self._delta.docs >= self.settings.search_merge_docs:
+            self.merge()
+        if self._trigrams.due():
+            with self._lock:
+                terms = list(self._trigrams.terms)
+            trigrams = TrigramIndex(terms)
+            with self._lock:  # terms that arrived during the build
+                trigrams.add(self._trigrams.terms[len(terms):])
+                self._trigrams = trigrams
+
+    def merge(self):
+        """
+        Fold the delta into the arrays and drop deleted docs; queries keep
+        reading the old segment and the frozen delta meanwhile
+        """
+        with self._lock:
+            if self._merging is not None or (self._delta.docs == 0 and self._alive_count == self._n):
+                return
+            self._merging, self._delta = self._delta, _Delta()
+            segment, frozen = self._segment, self._merging
+            size, avgdl = self._n, self._avgdl()  # every doc < size is in segment + frozen
+            alive = self._alive[:size].copy()
+        merged = _merge(segment, frozen, size, avgdl, alive)
+        with self._lock:
+            self._drop_dead(size, alive)
+            self._segment, self._merging = merged, None
+
+    def _drop_dead(self, size: int, alive: np.ndarray):
+        """
+        Renumber the doc arrays like a segment merged from docs < size with
+        `alive`: those alive move down, newer docs (in the delta) shift after
+        them. Deletes that landed during the merge keep their cleared bit. Under _lock
+        """
+        kept = np.flatnonzero(alive)
+        shift = size - len(kept)
+        if not shift:
+            return
+        n = self._n
+        for array in (self._doc_ids, self._doc_len, self._alive):
+            array[:n - shift] = np.concatenate((array[kept], array[size:n]))
+        self._n = n - shift
+        self._delta.renumber(shift)
+
+    # ============ Queries ============
+    def _avgdl(self) -> float:
+        return self._total_len / self._alive_count if self._alive_count else 1.0
+
+    def _document_frequency(self, term: str) -> int:
+        in_segment = self._segment.get(term)
+        count = len(in_segment[1]) if in_segment else 0
+        for delta in (self._merging, self._delta):
+            if delta is not None and term in delta.postings:
+                count += len(delta.postings[term][0])
+        return count
+
+    def fuzzy_terms(self, query: str) -> list[str]:
+        """
+        Query words as indexed terms: known words as they are, unknown ones
+        replaced by the closest terms within 1-2 typos (most documents first)
+        """
+        terms = []
+        with self._lock:
+            for word in dict.fromkeys(tokenize(query)):
+                if self._document_frequency(word):
+                    terms.append(word)
+                    continue
+                closest, _ = self._trigrams.closest(word)
+                closest.sort(key=self._document_frequency, reverse=True)
+                terms += closest[:FUZZY_EXPANSIONS]
+        return list(dict.fromkeys(terms))
+
+    def search(self, query: str, offset: int, limit: int) -> tuple[int, list[tuple[int, float]]]:
+        """(number of matching documents, [(prediction id, score)] of one page), best first"""
+        start = time.perf_counter()
+        terms = list(dict.fromkeys(tokenize(query)))
+        wanted = offset + limit
+        with self._lock:
+            alive_count, segment, n = self._alive_count, self._segment, self._n
+            if not terms or alive_count == 0:
+                return 0, []
+            doc_len, alive = self._doc_len[:n], self._alive[:n]
+            unmerged = [delta for delta in (self._merging, self._delta) if delta is not None]
+
+            found = []  # (idf, segment postings or None, postings of unmerged docs)
+            for term in terms:
+                in_segment = segment.get(term)
+                recent = [part for part in (delta.get(term) for delta in unmerged) if part is not None]
+                df = (len(in_segment[1]) if in_segment else 0) + sum(len(docs) for docs, _ in recent)
+                if df == 0:
+                    continue
+                df = min(df, alive_count)  # deleted docs keep their postings until the next merge
+                idf = math.log(1 + (alive_count - df + 0.5) / (df + 0.5))
+                found.append((idf, in_segment, recent))
+            if not found:
+                return 0, []
+
+            # unmerged docs: few, always scored exhaustively (current average length)
+            avgdl = self._avgdl()
+            docs, scores = _sum_scores(
+                [docs for _, _, recent in found for docs, _ in recent],
+                [idf * _impacts(tfs, doc_len[docs], avgdl) for idf, _, recent in found for docs, tfs in recent],
+                n,
+            )
+            keep = alive[docs]
+            docs, scores = docs[keep], scores[keep]
+            total = len(docs)
+
+            in_segment = [(idf, *postings) for idf, postings, _ in found if postings is not None]
+            if in_segment:
+                count, segment_docs, segment_scores = self._search_segment(
+                    segment, in_segment, wanted, doc_len, alive
+                )
+                total += count
+                docs = np.concatenate([segment_docs, docs])
+                scores = np.concatenate([segment_scores, scores])
+            ids = self._doc_ids[docs]
+
+        # docs: every match, or (champion lists) a superset of the best `wanted`
+        candidates = len(docs)
+        wanted = min(wanted, candidates)
+        if wanted <= 0 or offset >= candidates:
+            return total, []
+        if wanted < candidates:  # everything scoring at least the wanted-th best (ties included)
+            top = np.flatnonzero(scores >= -np.partition(-scores, wanted - 1)[wanted - 1])
+        else:
+            top = np.arange(candidates)
+        top = top[np.lexsort((-ids[top], -scores[top]))]  # best first, ties: newest first
+        page = top[offset:offset + limit]
+
+        self.queries += 1
+        self.last_query_ms = round((time.perf_counter() - start) * 1000, 3)
+        return total, [(int(ids[i]), float(scores[i])) for i in page]
+
+    def _search_segment(self, segment: _Segment, terms: list, wanted: int, doc_len: np.ndarray,
+                        alive: np.ndarray) -> tuple[int, np.ndarray, np.ndarray]:
+        """(alive matches, candidate docs, their scores); terms: (idf, term, docs, tfs)"""
+        if sum(len(docs) for _, _, docs, _ in terms) > EXHAUSTIVE_POSTINGS:
+            found = self._champion_candidates(segment, terms, wanted, doc_len, alive)
+            if found is not None:
+                return self._count(segment, terms, alive), *found
+
+        docs, scores = _sum_scores(
+            [docs for _, _, docs, _ in terms],
+            [idf * _impacts(tfs, doc_len[docs], segment.avgdl) for idf, _, docs, tfs in terms],
+            segment.size,
+        )
+        keep = alive[docs]
+        return int(np.count_nonzero(keep)), docs[keep], scores[keep]
+
+    @staticmethod
+    def _champion_candidates(segment: _Segment, terms: list, wanted: int, doc_len: np.ndarray,
+                             alive: np.ndarray) -> tuple[np.ndarray, np.ndarray] | None:
+        """
+        Best `wanted` documents without scoring every posting
+
+        WHY: Frequent terms match most documents; scoring all their
+             postings grows with the index (tens of ms at millions)
+        HOW: Candidates = the top impacts of each frequent term (champion
+             lists) + every posting of rare terms, scored exactly (postings
+             are sorted by doc: binary search). A document outside every
+             champion list scores at most `bound` (sum of the best impacts
+             left out), so when `wanted` candidates score above it they are
+             the exact top. Otherwise the lists get 4x longer, until that
+             costs about as much as scoring everything (None)
+        """
+        postings = sum(len(docs) for _, _, docs, _ in terms)
+        depth = max(CHAMPIONS, 2 * wanted)
+        while depth * len(terms) * 8 <= postings:
+            candidates, bound = [], 0.0
+            for idf, term, docs, tfs in terms:
+                champions, floor = segment.champions_of(term, docs, tfs, doc_len, depth)
+                candidates.append(champions)
+                bound += idf * floor
+            candidates = _distinct(np.concatenate(candidates))
+            candidates = candidates[alive[candidates]]
+
+            scores = np.zeros(len(candidates), np.float64)
+            lengths = doc_len[candidates]
+            for idf, term, docs, tfs in terms:
+                at, found = segment.lookup(term, docs, candidates)
+                scores += np.where(found, idf * _impacts(tfs[at], lengths, segment.avgdl), 0.0)
+            # margin: scores are float32 sums, a tie with the bound must not count as above it
+            if np.count_nonzero(scores > bound * (1 + 1e-5)) >= wanted:
+                return candidates, scores
+            depth *= 4
+        return None
+
+    @staticmethod
+    def _count(segment: _Segment, terms: list, alive: np.ndarray) -> int:
+        """Alive documents matching any term: OR of cached bitsets for frequent terms"""
+        frequent = [segment.bitset_of(term, docs)[0] for _, term, docs, _ in terms
+                    if len(docs) * BITSET_DENSITY >= segment.size]
+        rare = [docs for _, _, docs, _ in terms if len(docs) * BITSET_DENSITY < segment.size]
+        count = 0
+        union = None
+        if frequent:
+            union = functools.reduce(np.bitwise_or, frequent)
+            count = int(np.bitwise_count(union & _words(alive[:segment.size])).sum(dtype=np.int64))
+        if rare:
+            docs = _distinct(np.concatenate(rare)) if len(rare) > 1 else rare[0]
+            docs = docs[alive[docs]]
+            if union is not None:  # not counted with the frequent terms already
+                docs = docs[(union[docs >> 6] >> (docs & 63).astype(np.uint64)) & np.uint64(1) == 0]
+            count += len(docs)
+        return count
+
+    # ============ Snapshot ============
+    def save(self):
+        """Merge, then write the index atomically (tmp file + rename); under _maintenance"""
+        self.merge()
+        with self._lock:
+            if self._delta.docs:  # added while merging: small, fold it in right here
+                size, alive = self._n, self._alive[:self._n].copy()
+                self._segment = _merge(self._segment, self._delta, size, self._avgdl(), alive)
+                self._delta = _Delta()
+                self._drop_dead(size, alive)
+            segment, n = self._segment, self._n
+            meta = {"version": SNAPSHOT_VERSION, "watermark": self.watermark, "docs": n,
+                    "segment_size": segment.size, "segment_avgdl": segment.avgdl,
+                    "alive": self._alive_count, "total_len": self._total_len,
+                    "local_ids": sorted(self._local_ids)}
+            doc_ids, doc_len, alive = self._doc_ids[:n].copy(), self._doc_len[:n].copy(), self._alive[:n].copy()
+            self.changes = 0
+
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp = f"{self.path}.{os.getpid()}.tmp.npz"  # workers save the same snapshot
+        np.savez(
+            tmp,
+            meta=np.frombuffer(json.dumps(meta).encode("utf-8"), np.uint8),
+            terms=np.frombuffer("\n".join(segment.terms).encode("utf-8"), np.uint8),
+            offsets=segment.offsets, docs=segment.docs, tfs=segment.tfs,
+            doc_ids=doc_ids, doc_len=doc_len, alive=alive,
+        )
+        os.replace(tmp, f"{self.path}.npz")
+        self.last_snapshot = time.time()
+        logger.info(f"OK Search index saved ({meta['alive']} documents, {len(segment.terms)} terms)")
+
+    def load(self) -> bool:
+        path = f"{self.path}.npz"
+        if not os.path.exists(path):
+            return False
+        with np.load(path) as data:
+            meta = json.loads(data["meta"].tobytes().decode("utf-8"))
+            if meta.get("version") != SNAPSHOT_VERSION:
+                logger.warning("!! Search index snapshot has an old format, rebuilding")
+                return False
+            terms = data["terms"].tobytes().decode("utf-8")
+            segment = _Segment(terms.split("\n") if terms else [],
+                               data["offsets"], data["docs"], data["tfs"],
+                               meta["segment_size"], meta["segment_avgdl"])
+            doc_ids, doc_len, alive = data["doc_ids"], data["doc_len"], data["alive"]
+        trigrams = TrigramIndex(segment.terms)
+        with self._lock:
+            self._segment, self._delta, self._merging = segment, _Delta(), None
+            self._trigrams = trigrams
+            self._doc_ids, self._doc_len, self._alive = doc_ids, doc_len, alive
+            self._n, self._alive_count = meta["docs"], meta["alive"]
+            self._total_len = meta["total_len"]
+            self.watermark = meta["watermark"]
+            self._local_ids = set(meta["local_ids"])
+        logger.info(f"OK Search index loaded ({meta['alive']} documents, up to id {meta['watermark']})")
+        return True
+
+    # ============ Background loop ============
+    def stats(self) -> dict:
+        return {
+            **super().stats(),
+            "documents": self._alive_count,
+            "terms": len(self._segment.terms),
+            "unmerged_documents": self._delta.docs,
+            "queries": self.queries,
+            "last_query_ms": self.last_query_ms,
+        }
@@ -0,0 +1,480 @@
+# services/similarity.py
+import functools
+import hashlib
+import json
+import math
+import os
+import time
+import uuid
+from collections import Counter
+from contextlib import ExitStack
+
+import numpy as np
+from sqlalchemy import select
+
+from core.database import sessionlocal
+from dependencies.config import Settings
+from models.predictions import Prediction
+from services.case_texts import case_text_column, with_case_texts
+from services.prediction_index import PredictionIndex
+from services.search_index import tokenize
+from utils.file_lock import file_lock
+from utils.logger import logger
+
+SNAPSHOT_VERSION = 2
+DF_BITS = 18              # document frequencies are counted per hashed token: 2**18 buckets
+DF_MASK = np.uint64((1 << DF_BITS) - 1)
+KMEANS_SAMPLE = 32        # training rows per IVF list
+KMEANS_ROUNDS = 8
+ASSIGN_BLOCK = 16_384     # rows per matrix product when assigning rows to lists
+SEGMENT_MERGE = 2         # a new segment absorbs the trailing ones up to 2x its size
+
+
+@functools.lru_cache(maxsize=1 << 18)
+def _hash(token: str) -> int:
+    # stable across processes and restarts (unlike hash()): vectors are persisted
+    return int.from_bytes(hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def features(text: str) -> tuple[np.ndarray, np.ndarray]:
+    """(token hashes, term frequencies) of a text"""
+    counts = Counter(tokenize(text))
+    return (np.fromiter((_hash(token) for token in counts), np.uint64, len(counts)),
+            np.fromiter(counts.values(), np.float32, len(counts)))
+
+
+def embed(rows: list[tuple[np.ndarray, np.ndarray]], df: np.ndarray, documents: int,
+          dims: int) -> np.ndarray:
+    """
+    Hashed TF-IDF vectors (L2-normalized, float32) of featurized texts
+
+    WHY: Deterministic, no model to download, fixed size whatever the
+         vocabulary
+    HOW: Bits 0-17 of a token's hash pick its document-frequency bucket,
+         the next bits its dimension, bit 63 its sign (colliding tokens
+         cancel out instead of piling up). Weight: (1 + ln tf) * idf.
+         A text without tokens stays all zeros
+    """
+    lengths = np.fromiter((len(hashes) for hashes, _ in rows), np.int64, len(rows))
+    if lengths.sum() == 0:
+        return np.zeros((len(rows), dims), np.float32)
+    hashes = np.concatenate([hashes for hashes, _ in rows])
+    tfs = np.concatenate([tfs for _, tfs in rows])
+    idf = np.log((documents + 1) / (df[hashes & DF_MASK] + 1.0)) + 1
+    signs = 1 - 2 * (hashes >> np.uint64(63)).astype(np.float64)
+    cells = (np.repeat(np.arange(len(rows)), lengths) * dims
+             + ((hashes >> np.uint64(DF_BITS)) % np.uint64(dims)).astype(np.int64))
+    vectors = np.bincount(cells, weights=(1 + np.log(tfs)) * idf * signs,
+                          minlength=len(rows) * dims).reshape(len(rows), dims)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return (vectors / np.maximum(norms, 1e-12)).astype(np.float32)
+
+
+def assign(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    """Nearest centroid (cosine) of each vector"""
+    lists = np.empty(len(vectors), np.int32)
+    for start in range(0, len(vectors), ASSIGN_BLOCK):
+        block = np.asarray(vectors[start:start + ASSIGN_BLOCK])
+        lists[start:start + len(block)] = np.argmax(block @ centroids.T, axis=1)
+    return lists
+
+
+def train_centroids(points: np.ndarray, nlist: int, rng: np.random.Generator) -> np.ndarray:
+    """Spherical k-means: unit-length centroids, cosine assignment"""
+    centroids = points[rng.choice(len(points), nlist, replace=False)].copy()
+    for _ in range(KMEANS_ROUNDS):
+        lists = assign(points, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, lists, points)
+        empty = np.flatnonzero(np.bincount(lists, minlength=nlist) == 0)
+        sums[empty] = points[rng.choice(len(points), len(empty), replace=False)]
+        centroids = sums / np.maximum(np.linalg.norm(sums, axis=1, keepdims=True), 1e-12)
+    return centroids.astype(np.float32)
+
+
+def group(lists: np.ndarray, nlist: int) -> tuple[np.ndarray, np.ndarray]:
+    """Rows sorted by list + where each list starts (CSR)"""
+    order = np.argsort(lists, kind="stable")
+    offsets = np.zeros(nlist + 1, np.int64)
+    np.cumsum(np.bincount(lists, minlength=nlist), out=offsets[1:])
+    return order, offsets
+
+
+class SimilarityIndex(PredictionIndex):
+    """
+    Nearest-neighbour index over prediction case texts, /legal/similar
+
+    WHY: Finding earlier cases like a new one meant reading the history
+    HOW: Every case text becomes a hashed TF-IDF vector (embed).
+         Snapshot: immutable segment files of vectors
+         (`similar_path`.<token>.seg, raw float32 rows) and one .npz with
+         the prediction id, alive flag and IVF list of every row, the
+         document frequencies, the centroids, the watermark and the list
+         of segments. The .npz is replaced atomically under a file lock,
+         so a published snapshot never changes: deletes after it only
+         live in the memory of the processes that saw them.
+         Every process maps the snapshot's segments read-only (one copy in
+         the page cache whatever the number of gunicorn workers, nothing
+         copied at startup) and keeps only the rows added since in memory.
+         One process per host, the one holding `similar_path`.writer.lock,
+         writes the snapshots: its new rows become one more segment,
+         merged with the trailing segments not much bigger (a handful of
+         segments whatever the size), and files no snapshot uses any more
+         are removed. The others reload each new snapshot, which empties
+         their own rows again. Rows past the snapshot are re-appended by
+         the catch-up.
+         Search: an exact scan of every vector below
+         `similar_ivf_min_rows`; above, k-means (IVF) lists and only the
+         `similar_nprobe` lists closest to the query are scanned. Lists
+         are retrained on a sample when the index grew 4x since training.
+         Deletes only clear the alive flag.
+         Updates, catch-up and the background loop: PredictionIndex
+    WHEN: Started in startup_event when similar_enabled
+    """
+
+    name = "Similar-case index"
+
+    def __init__(self, settings: Settings):
+        super().__init__(settings.search_refresh_seconds, settings.search_snapshot_seconds)
+        self.settings = settings
+        self.path = settings.similar_path
+        self.dims = settings.similar_dims
+        self._segments: list[tuple[str, np.memmap]] = []  # the snapshot's vectors, read-only
+        self._base = 0                                     # rows in the segments
+        self._delta: np.ndarray | None = None              # vectors of rows >= _base (heap)
+        self._ids = np.zeros(0, np.int64)                  # prediction id of every row
+        self._alive = np.zeros(0, np.bool_)
+        self._n = 0
+        self._alive_count = 0
+        self._df = np.zeros(1 << DF_BITS, np.int32)
+        self._documents = 0     # texts counted in _df (deleted ones stay counted)
+        self._df_through = 0    # ids up to this were counted by the first-build pre-pass
+        self._centroids: np.ndarray | None = None
+        self._lists = np.zeros(0, np.int32)  # IVF list of every row
+        self._order = np.zeros(0, np.int64)  # rows < _grouped sorted by list
+        self._offsets = np.zeros(1, np.int64)
+        self._grouped = 0
+        self._trained_rows = 0
+        self._writer: ExitStack | None = None  # holds the writer lock for the process' lifetime
+        self._loaded_stamp: int | None = None  # mtime of the .npz this state comes from
+        self.queries = 0
+        self.last_query_ms = 0.0
+
+    # ============ Rows ============
+    def _parts(self, n: int) -> list[tuple[int, np.ndarray]]:
+        """(first row, vectors) of the segments then this process' rows, up to row n"""
+        parts, first = [], 0
+        for _, vectors in self._segments:
+            parts.append((first, vectors))
+            first += len(vectors)
+        if n > self._base:
+            parts.append((self._base, self._delta[:n - self._base]))
+        return parts
+
+    def _take(self, parts: list[tuple[int, np.ndarray]], rows: np.ndarray) -> np.ndarray:
+        """Vectors of sorted row numbers (sequential reads of the maps)"""
+        taken = np.empty((len(rows), self.dims), np.float32)
+        for first, vectors in parts:
+            lo, hi = np.searchsorted(rows, [first, first + len(vectors)])
+            taken[lo:hi] = vectors[rows[lo:hi] - first]
+        return taken
+
+    def _grow(self, needed: int):
+        """Double the per-row arrays (and this process' vectors) to hold `needed` rows"""
+        n = self._n
+        if needed > len(self._ids):
+            capacity = max(2 * len(self._ids), needed, 1024)
+            ids, alive, lists = np.zeros(capacity, np.int64), np.zeros(capacity, np.bool_), np.full(capacity, -1, np.int32)
+            ids[:n], alive[:n], lists[:n] = self._ids[:n], self._alive[:n], self._lists[:n]
+            self._ids, self._alive, self._lists = ids, alive, lists
+        if needed - self._base > len(self._delta):
+            delta = np.zeros((max(2 * len(self._delta), needed - self._base, 1024), self.dims), np.float32)
+            delta[:n - self._base] = self._delta[:n - self._base]
+            self._delta = delta
+
+    def _reset(self):
+        self._segments, self._base, self._delta = [], 0, np.zeros((0, self.dims), np.float32)
+        self._ids, self._alive, self._lists = np.zeros(0, np.int64), np.zeros(0, np.bool_), np.zeros(0, np.int32)
+        self._n = self._alive_count = 0
+        self._df = np.zeros(1 << DF_BITS, np.int32)
+        self._documents = self._df_through = 0
+        self._centroids, self._grouped, self._trained_rows = None, 0, 0
+        self._grow(1024)
+
+    # ============ Updates ============
+    def _prepare(self, rows: list[tuple[int, str]]) -> list[tuple[int, tuple]]:
+        return [(prediction_id, features(text)) for prediction_id, text in rows]
+
+    def _insert(self, rows: list[tuple[int, tuple]]):
+        if not rows:
+            return
+        if self._delta is None:
+            self._reset()
+        ids = np.fromiter((prediction_id for prediction_id, _ in rows), np.int64, len(rows))
+        featurized = [item for _, item in rows]
+        counted = [featurized[i][0] for i in np.flatnonzero(ids > self._df_through)]
+        if counted:
+            buckets = (np.concatenate(counted) & DF_MASK).astype(np.int64)
+            self._df += np.bincount(buckets, minlength=len(self._df)).astype(np.int32)
+            self._documents += len(counted)
+        vectors = embed(featurized, self._df, self._documents, self.dims)
+
+        start, end = self._n, self._n + len(rows)
+        self._grow(end)
+        self._delta[start - self._base:end - self._base] = vectors
+        self._ids[start:end] = ids
+        self._alive[start:end] = True
+        if self._centroids is not None:
+            self._lists[start:end] = assign(vectors, self._centroids)
+        self._n = end
+        self._alive_count += len(rows)
+
+    def _delete(self, prediction_ids: np.ndarray) -> int:
+        n = self._n
+        if n == 0:
+            return 0
+        rows = np.flatnonzero(np.isin(self._ids[:n], prediction_ids) & self._alive[:n])
+        self._alive[rows] = False
+        self._alive_count -= len(rows)
+        return len(rows)
+
+    def build_started(self):
+        """Count document frequencies over the whole table first: the bulk is embedded with final idfs"""
+        with self._lock:
+            self._reset()
+        last = 0
+        while True:
+            query = (
+                with_case_texts(select(Prediction.id, case_text_column()))
+                .where(Prediction.id > last)
+                .order_by(Prediction.id)
+                .limit(5000)
+            )
+            with sessionlocal() as db:
+                rows = db.execute(query).all()
+            if not rows:
+                break
+            hashes = [features(row.case_text)[0] for row in rows if row.case_text]
+            with self._lock:
+                if hashes:
+                    buckets = (np.concatenate(hashes) & DF_MASK).astype(np.int64)
+                    self._df += np.bincount(buckets, minlength=len(self._df)).astype(np.int32)
+                    self._documents += len(hashes)
+                last = self._df_through = rows[-1].id
+
+    # ============ IVF lists ============
+    def maintain(self):
+        if self._snapshot_published():
+            self.load()  # drops the rows this process kept since its snapshot
+        with self._lock:
+            n, grouped, trained = self._n, self._grouped, self._centroids is not None
+        if not trained:
+            if self._alive_count >= self.settings.similar_ivf_min_rows:
+                self._train()
+        elif n >= 4 * self._trained_rows:
+            self._train()
+        elif n - grouped > max(grouped // 8, 1024):
+            self._group()
+
+    def _train(self):
+        """k-means on a sample (nlist ~ sqrt(rows)), then every row to its list; queries go on meanwhile"""
+        started = time.perf_counter()
+        with self._lock:
+            n, parts, alive = self._n, self._parts(self._n), self._alive[:self._n].copy()
+        rows = np.flatnonzero(alive)
+        nlist = int(min(max(16, math.sqrt(len(rows))), 4096))
+        rng = np.random.default_rng(0)
+        sample = np.sort(rng.choice(rows, min(len(rows), nlist * KMEANS_SAMPLE), replace=False))
+        centroids = train_centroids(self._take(parts, sample), nlist, rng)
+        lists = np.concatenate([assign(vectors, centroids) for _, vectors in parts])
+        order, offsets = group(lists, nlist)
+        with self._lock:
+            added = self._take(self._parts(self._n), np.arange(n, self._n))  # added meanwhile
+            self._lists[:n] = lists
+            self._lists[n:self._n] = assign(added, centroids)
+            self._centroids, self._order, self._offsets = centroids, order, offsets
+            self._grouped, self._trained_rows = n, self._n
+            self.changes += 1
+        logger.info(f"OK Similar-case index trained {nlist} IVF lists on {len(sample)} of "
+                    f"{n} rows in {time.perf_counter() - started:.1f}s")
+
+    def _group(self):
+        """Sort the rows appended since the last grouping into their lists (no retraining)"""
+        with self._lock:
+            n, lists, nlist = self._n, self._lists[:self._n].copy(), len(self._centroids)
+        order, offsets = group(lists, nlist)
+        with self._lock:
+            self._order, self._offsets, self._grouped = order, offsets, n
+
+    # ============ Queries ============
+    def search(self, text: str, limit: int) -> tuple[str, list[tuple[int, float]]]:
+        """("exact" | "ivf", [(prediction id, cosine similarity)]) most similar first"""
+        started = time.perf_counter()
+        featurized = features(text)
+        with self._lock:
+            query = embed([featurized], self._df, self._documents, self.dims)[0]
+            n, parts, ids, alive = self._n, self._parts(self._n), self._ids, self._alive
+            centroids, lists = self._centroids, self._lists
+            order, offsets, grouped = self._order, self._offsets, self._grouped
+        mode = "exact" if centroids is None else "ivf"
+        if n == 0 or not query.any():
+            return mode, []
+
+        if centroids is None:
+            candidates = np.flatnonzero(alive[:n])
+            scores = np.concatenate([np.asarray(vectors @ query) for _, vectors in parts])[candidates]
+        else:
+            nprobe = min(self.settings.similar_nprobe, len(centroids))
+            probes = np.argpartition(-(centroids @ query), nprobe - 1)[:nprobe]
+            probed = [order[offsets[probe]:offsets[probe + 1]] for probe in probes]
+            tail = np.arange(grouped, n)
+            probed.append(tail[np.isin(lists[grouped:n], probes)])
+            candidates = np.sort(np.concatenate(probed))
+            candidates = candidates[alive[candidates]]
+            scores = self._take(parts, candidates) @ query
+
+        keep = scores > 0
+        candidates, scores = candidates[keep], scores[keep]
+        if len(scores) > limit:
+            top = np.argpartition(-scores, limit - 1)[:limit]
+            candidates, scores = candidates[top], scores[top]
+        found = np.asarray(ids[candidates])
+        ranked = np.lexsort((-found, -scores))  # best first, ties newest first
+        self.queries += 1
+        self.last_query_ms = round((time.perf_counter() - started) * 1000, 2)
+        return mode, [(int(found[i]), float(scores[i])) for i in ranked]
+
+    # ============ Snapshot ============
+    def _is_writer(self) -> bool:
+        """Whether this process writes the snapshots (the first one to get the writer lock keeps it)"""
+        if self._writer is None:
+            stack = ExitStack()
+            if stack.enter_context(file_lock(f"{self.path}.writer.lock", blocking=False)):
+                self._writer = stack
+            else:
+                stack.close()
+        return self._writer is not None
+
+    def _snapshot_published(self) -> bool:
+        """The writer published a snapshot this process has not loaded yet"""
+        if self._is_writer():
+            return False
+        try:
+            return os.stat(f"{self.path}.npz").st_mtime_ns != self._loaded_stamp
+        except FileNotFoundError:
+            return False
+
+    def _write_segment(self, parts: list[np.ndarray]) -> tuple[str, np.memmap]:
+        """Rows of `parts` in one new segment file, mapped read-only"""
+        name = f"{uuid.uuid4().hex}.seg"
+        path = f"{self.path}.{name}"
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "wb") as f:
+            for vectors in parts:
+                for start in range(0, len(vectors), ASSIGN_BLOCK):
+                    f.write(np.ascontiguousarray(vectors[start:start + ASSIGN_BLOCK], np.float32).tobytes())
+        rows = sum(len(vectors) for vectors in parts)
+        return name, np.memmap(path, np.float32, "r", shape=(rows, self.dims))
+
+    def _remove_unused(self, segments: set[str]):
+        """Segment files (and older snapshot formats) the published snapshot does not use"""
+        folder, prefix = os.path.dirname(self.path) or ".", os.path.basename(self.path) + "."
+        for name in os.listdir(folder):
+            suffix = name[len(prefix):]
+            if not name.startswith(prefix) or suffix in segments or suffix in ("npz", "lock", "writer.lock"):
+                continue
+            try:
+                os.remove(os.path.join(folder, name))
+            except OSError:
+                pass  # Windows: still mapped by a reader, removed by a later save
+
+    def save(self):
+        """
+        Writer only: the rows since the last snapshot become a new segment,
+        then the .npz is written atomically (tmp file + rename)
+        """
+        if not self._is_writer():
+            self.changes = 0  # the writer snapshots the same table
+            return
+        with self._lock:
+            if self._delta is None:
+                return
+            n, base, segments = self._n, self._base, list(self._segments)
+            vectors = self._delta[:n - base]  # rows < n never change in place (appends only)
+            meta = {"version": SNAPSHOT_VERSION, "dims": self.dims, "watermark": self.watermark,
+                    "rows": n, "documents": self._documents, "df_through": self._df_through,
+                    "trained_rows": self._trained_rows, "local_ids": sorted(self._local_ids)}
+            df, lists = self._df.copy(), self._lists[:n].copy()
+            ids, alive = self._ids[:n].copy(), self._alive[:n].copy()  # deletes after this: not published
+            centroids = self._centroids if self._centroids is not None else np.zeros((0, self.dims), np.float32)
+            alive_count = self._alive_count
+            self.changes = 0
+
+        # log-structured: the new rows absorb the trailing segments not much bigger than them
+        merged = [vectors] if len(vectors) else []
+        while merged and segments and len(segments[-1][1]) <= SEGMENT_MERGE * sum(map(len, merged)):
+            merged.insert(0, segments.pop()[1])
+        if merged:
+            segments.append(self._write_segment(merged))
+        meta["segments"] = [[name, len(rows)] for name, rows in segments]
+        tmp = f"{self.path}.{os.getpid()}.tmp.npz"
+        np.savez(tmp, meta=np.frombuffer(json.dumps(meta).encode("utf-8"), np.uint8),
+                 df=df, centroids=centroids, lists=lists, ids=ids, alive=alive)
+        with self._snapshot_lock():
+            os.replace(tmp, f"{self.path}.npz")
+            self._remove_unused({name for name, _ in segments})
+
+        with self._lock:  # rows < n are read from the segments from now on
+            kept = self._delta[n - base:self._n - base]  # added meanwhile
+            self._segments, self._base = segments, n
+            self._delta = np.zeros((max(2 * len(kept), 1024), self.dims), np.float32)
+            self._delta[:len(kept)] = kept
+        self.last_snapshot = time.time()
+        logger.info(f"OK Similar-case index saved ({alive_count} cases, {len(segments)} segments, "
+                    f"{len(centroids)} IVF lists)")
+
+    def load(self) -> bool:
+        """The snapshot: its segments mapped read-only, the rest read into this process"""
+        path = f"{self.path}.npz"
+        with self._snapshot_lock(shared=True):
+            if not os.path.exists(path):
+                return False
+            self._loaded_stamp = os.stat(path).st_mtime_ns
+            with np.load(path) as data:
+                meta = json.loads(data["meta"].tobytes().decode("utf-8"))
+                if meta.get("version") != SNAPSHOT_VERSION or meta.get("dims") != self.dims:
+                    logger.warning("!! Similar-case index snapshot has an old format or size, rebuilding")
+                    return False
+                df, centroids, lists = data["df"], data["centroids"], data["lists"]
+                ids, alive = data["ids"], data["alive"]
+            segments = [(name, np.memmap(f"{self.path}.{name}", np.float32, "r", shape=(rows, self.dims)))
+                        for name, rows in meta["segments"]]
+        n = meta["rows"]
+        order, offsets = group(lists, len(centroids)) if len(centroids) else (np.zeros(0, np.int64), np.zeros(1, np.int64))
+        with self._lock:
+            self._segments, self._base, self._n = segments, n, n
+            self._delta = np.zeros((0, self.dims), np.float32)
+            self._ids, self._alive, self._lists = ids, alive, lists
+            self._alive_count = int(np.count_nonzero(alive))
+            self._df, self._documents, self._df_through = df, meta["documents"], meta["df_through"]
+            self._centroids = centroids if len(centroids) else None
+            self._order, self._offsets, self._grouped = order, offsets, n
+            self._trained_rows = meta["trained_rows"]
+            self.watermark = meta["watermark"]
+            self._local_ids = set(meta["local_ids"])
+        logger.info(f"OK Similar-case index loaded ({self._alive_count} cases, up to id {meta['watermark']})")
+        return True
+
+    # ============ Background loop ============
+    def stats(self) -> dict:
+        return {
+            **super().stats(),
+            "cases": self._alive_count,
+            "mode": "exact" if self._centroids is None else "ivf",
+            "ivf_lists": 0 if self._centroids is None else len(self._centroids),
+            "dims": self.dims,
+            "segments": len(self._segments),
+            "writer": self._writer is not None,
+            "queries": self.queries,
+            "last_query_ms": self.last_query_ms,
+        }
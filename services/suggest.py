@@ -0,0 +1,293 @@
+# services/suggest.py
+import bisect
+import json
+import os
+import time
+from collections import Counter, deque
+
+import numpy as np
+from sqlalchemy import func, select
+
+from core.database import sessionlocal
+from dependencies.config import Settings
+from models.rollups import PredictionRollup
+from services.prediction_index import PredictionIndex
+from services.search_index import tokenize
+from utils.logger import logger
+
+SNAPSHOT_VERSION = 2
+MAX_SUGGESTIONS = 20
+CACHED_PREFIX = 2  # completions of prefixes up to this length are ranked at build time
+
+
+def normalize(text: str) -> str:
+    return " ".join(text.lower().split())
+
+
+def _pack(counts: Counter) -> tuple[np.ndarray, np.ndarray]:
+    """Word counts as snapshot arrays: newline-joined UTF-8 words, counts"""
+    return (np.frombuffer("\n".join(counts).encode("utf-8"), np.uint8),
+            np.fromiter(counts.values(), np.int64, len(counts)))
+
+
+def _unpack(words: np.ndarray, counts: np.ndarray) -> Counter:
+    words = words.tobytes().decode("utf-8")
+    return Counter(dict(zip(words.split("\n"), counts.tolist()))) if words else Counter()
+
+
+class _Completions:
+    """
+    Immutable sorted array of completion keys, each pointing at an entry
+    (text, kind, count); a prefix is a contiguous range of keys (bisect)
+
+    Labels ("IPC 379 - Theft") get one key per word they contain, so
+    "thef" and "379" complete them too
+    """
+
+    def __init__(self, entries: list[tuple[str, str, int]]):
+        keys, owners = [], []
+        for number, (text, kind, _) in enumerate(entries):
+            words = normalize(text).split(" ")
+            for start in range(len(words) if kind != "term" else 1):
+                if words[start][:1].isalnum():
+                    keys.append(" ".join(words[start:]))
+                    owners.append(number)
+        order = sorted(range(len(keys)), key=keys.__getitem__)
+        self.entries = entries
+        self.keys = [keys[i] for i in order]
+        self.owners = np.asarray(owners, np.int64)[order]
+        counts = np.fromiter((count for _, _, count in entries), np.int64, len(entries))
+        self.counts = counts[self.owners]
+        self.cache = {prefix: self._rank(prefix, MAX_SUGGESTIONS)
+                      for prefix in {key[:length] for key in self.keys for length in range(1, CACHED_PREFIX + 1)}}
+
+    def _rank(self, prefix: str, limit: int) -> list[int]:
+        """Entries with a key starting with `prefix`: most frequent first, ties alphabetical"""
+        lo = bisect.bisect_left(self.keys, prefix)
+        hi = bisect.bisect_left(self.keys, prefix + "\U0010ffff", lo)
+        counts, owners = self.counts[lo:hi], self.owners[lo:hi]
+        take = min(len(counts), limit * 2)  # an entry can match by more than one key
+        best = np.argpartition(-counts, take - 1)[:take] if len(counts) > take else np.arange(len(counts))
+        best = best[np.lexsort((owners[best], -counts[best]))]
+        return list(dict.fromkeys(owners[best].tolist()))[:limit]
+
+    def top(self, prefix: str, limit: int) -> list[tuple[str, str, int]]:
+        ranked = self.cache.get(prefix, []) if len(prefix) <= CACHED_PREFIX else self._rank(prefix, limit)
+        return [self.entries[number] for number in ranked[:limit]]
+
+
+class SuggestIndex(PredictionIndex):
+    """
+    Prefix autocomplete over frequent words, IPC sections and categories
+
+    WHY: The UI queried /search on every keystroke, a full ranked search
+         to show a few completions
+    HOW: Counts, updated from the prediction stream (PredictionIndex:
+         events + catch-up + snapshot): predictions containing each word
+         plus searches using it (/search, submitted or with hits), IPC
+         section labels as /legal/fir-classify returns them, predictions
+         per category (the rollups). Searches and sections are counted by
+         the worker that served them; each save adds them to the counts
+         of the snapshot file, so it carries every worker's.
+         Only the `suggest_max_terms` most frequent words are
+         kept; words and labels counted fewer than `suggest_min_count`
+         times are not suggested. The counts are compiled into a sorted array (_Completions)
+         in the background whenever they changed, never on the request
+         path: a suggestion is one bisect and a partial sort of the
+         matching range, or a dict hit for 1-2 character prefixes.
+         Deleted predictions keep their counts
+    WHEN: Started in startup_event when suggest_enabled
+    """
+
+    name = "Suggest index"
+
+    def __init__(self, settings: Settings):
+        super().__init__(settings.search_refresh_seconds, settings.search_snapshot_seconds)
+        self.settings = settings
+        self.path = settings.suggest_snapshot_path
+        self._terms: Counter = Counter()     # word -> predictions containing it
+        self._searches: Counter = Counter()  # word -> searches using it (every worker's as of the last save)
+        self._labels: Counter = Counter()    # (kind, label) -> count
+        self._recorded: deque = deque()      # (kind, text) from request handlers, counted by maintain
+        self._unsaved: Counter = Counter()   # ("search", word) / ("section", label) counted here since the last save
+        self._completions = _Completions([])
+        self._dirty = False
+        self._build_seconds = 0.0
+        self._built_at = 0.0
+        self._categories_at = 0.0
+        self.queries = 0
+        self.last_query_ms = 0.0
+
+    # ============ Updates ============
+    def _prepare(self, rows: list[tuple[int, str]]) -> list[tuple[int, set]]:
+        return [(prediction_id, set(tokenize(text))) for prediction_id, text in rows]
+
+    def _insert(self, rows: list[tuple[int, set]]):
+        for _, words in rows:
+            self._terms.update(words)
+        self._forget_rare()
+        if rows:
+            self._dirty = True
+
+    def _delete(self, prediction_ids: np.ndarray) -> int:
+        return 0  # the texts are gone: their words stay counted
+
+    def _forget_rare(self):
+        keep = self.settings.suggest_max_terms
+        if len(self._terms) > 2 * keep:
+            self._terms = Counter(dict(self._terms.most_common(keep)))
+        if len(self._searches) > 2 * keep:
+            self._searches = Counter(dict(self._searches.most_common(keep)))
+
+    def record(self, kind: str, text: str):
+        """A search ("search", query) or a label handed out ("section", label); cheap, lock-free"""
+        self._recorded.append((kind, text))
+
+    def maintain(self):
+        with self._lock:
+            while self._recorded:
+                kind, text = self._recorded.popleft()
+                if kind == "search":
+                    words = set(tokenize(text))
+                    self._searches.update(words)
+                    self._unsaved.update(("search", word) for word in words)
+                else:
+                    self._labels[(kind, text)] += 1
+                    self._unsaved[(kind, text)] += 1
+                self._dirty = True
+                self.changes += 1
+            self._forget_rare()
+        if time.time() - self._categories_at >= self.refresh_seconds:
+            self._count_categories()
+        # amortized: at most ~10% of the time goes into rebuilding
+        if self._dirty and time.time() - self._built_at >= 10 * self._build_seconds:
+            self._build()
+
+    def _count_categories(self):
+        query = select(PredictionRollup.category, func.sum(PredictionRollup.count)).group_by(PredictionRollup.category)
+        with sessionlocal() as db:
+            rows = db.execute(query).all()
+        with self._lock:
+            for category, count in rows:
+                if self._labels[("category", category)] != count:
+                    self._labels[("category", category)] = int(count)
+                    self._dirty = True
+        self._categories_at = time.time()
+
+    def _build(self):
+        started = time.perf_counter()
+        with self._lock:
+            self._dirty = False
+            minimum = self.settings.suggest_min_count
+            entries = [(term, "term", count) for term, count in (self._terms + self._searches).items()
+                       if count >= minimum]
+            entries += [(label, kind, count) for (kind, label), count in self._labels.items()
+                        if count >= minimum]
+        entries.sort()
+        self._completions = _Completions(entries)  # swapped in one assignment: readers take no lock
+        self._built_at = time.time()
+        self._build_seconds = time.perf_counter() - started
+
+    def _open_locked(self):
+        super()._open_locked()
+        self._count_categories()
+        self._build()
+
+    # ============ Queries ============
+    def suggest(self, prefix: str, limit: int) -> list[dict]:
+        """Top `limit` completions of `prefix`, most frequent first"""
+        start = time.perf_counter()
+        prefix = normalize(prefix)
+        completions = self._completions
+        found = completions.top(prefix, limit) if prefix else []
+        head, _, last = prefix.rpartition(" ")
+        if head and last and len(found) < limit:  # "land bou" -> "land boundary"
+            found += [(f"{head} {text}", kind, count)
+                      for text, kind, count in completions.top(last, limit) if kind == "term"]
+        suggestions = {}
+        for text, kind, count in found:
+            suggestions.setdefault(text, {"text": text, "type": kind, "count": count})
+        self.queries += 1
+        self.last_query_ms = round((time.perf_counter() - start) * 1000, 3)
+        return list(suggestions.values())[:limit]
+
+    # ============ Snapshot ============
+    def save(self):
+        """
+        Write the counts atomically (tmp file + rename); under _maintenance
+
+        Prediction counts are the same in every worker: these are written.
+        Searches and sections: the file's counts (every worker's) + the
+        ones counted here since the last save, one worker at a time
+        """
+        with self._snapshot_lock():
+            saved = self._read()
+            with self._lock:
+                if saved is not None:
+                    searches, labels = saved[2], saved[3]
+                    for (kind, text), count in self._unsaved.items():
+                        if kind == "search":
+                            searches[text] += count
+                        else:
+                            labels[(kind, text)] += count
+                    self._searches = searches
+                    for key, count in labels.items():
+                        if key[0] != "category":  # categories: the rollups, counted here
+                            self._labels[key] = count
+                    self._forget_rare()
+                    self._dirty = True
+                self._unsaved = Counter()
+                terms, searches = self._terms.copy(), self._searches.copy()
+                labels = [[kind, label, count] for (kind, label), count in self._labels.items()]
+                meta = {"version": SNAPSHOT_VERSION, "watermark": self.watermark, "labels": labels,
+                        "local_ids": sorted(self._local_ids)}
+                self.changes = 0
+
+            tmp = f"{self.path}.{os.getpid()}.tmp.npz"  # workers save the same snapshot
+            (terms_words, terms_counts), (searched_words, searched_counts) = _pack(terms), _pack(searches)
+            np.savez(tmp, meta=np.frombuffer(json.dumps(meta).encode("utf-8"), np.uint8),
+                     terms=terms_words, counts=terms_counts, searched=searched_words, searches=searched_counts)
+            os.replace(tmp, f"{self.path}.npz")
+        self.last_snapshot = time.time()
+        logger.info(f"OK Suggest index saved ({len(terms)} words, {len(searches)} searched, {len(labels)} labels)")
+
+    def _read(self) -> tuple[dict, Counter, Counter, Counter] | None:
+        """(meta, prediction counts, search counts, label counts) of the snapshot file, None if missing / old"""
+        path = f"{self.path}.npz"
+        if not os.path.exists(path):
+            return None
+        with np.load(path) as data:
+            meta = json.loads(data["meta"].tobytes().decode("utf-8"))
+            if meta.get("version") != SNAPSHOT_VERSION:
+                logger.warning("!! Suggest index snapshot has an old format, rebuilding")
+                return None
+            terms = _unpack(data["terms"], data["counts"])
+            searches = _unpack(data["searched"], data["searches"])
+        return meta, terms, searches, Counter({(kind, label): count for kind, label, count in meta["labels"]})
+
+    def load(self) -> bool:
+        with self._snapshot_lock(shared=True):
+            saved = self._read()
+        if saved is None:
+            return False
+        meta, terms, searches, labels = saved
+        with self._lock:
+            self._terms, self._searches = terms, searches
+            for key, count in labels.items():
+                self._labels[key] = count
+            self.watermark = meta["watermark"]
+            self._local_ids = set(meta["local_ids"])
+        logger.info(f"OK Suggest index loaded ({len(terms)} words, {len(searches)} searched, "
+                    f"up to id {meta['watermark']})")
+        return True
+
+    # ============ Background loop ============
+    def stats(self) -> dict:
+        return {
+            **super().stats(),
+            "words": len(self._terms),
+            "completions": len(self._completions.keys),
+            "build_ms": round(self._build_seconds * 1000, 1),
+            "queries": self.queries,
+            "last_query_ms": self.last_query_ms,
+        }
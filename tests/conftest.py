@@ -0,0 +1,84 @@
+# tests/conftest.py
+"""
+Shared fixtures: a throw-away SQLite database and data directory
+
+The app reads DATABASE_URL (core/database.py) and its settings at import
+time, so they are pointed at a temporary directory here, before any test
+module imports the app.
+"""
+import os
+import sys
+import tempfile
+from datetime import datetime, timezone
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+DATA_DIR = tempfile.mkdtemp(prefix="baro-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(DATA_DIR, 'baro_test.db')}"
+os.environ.setdefault("API_KEY", "test-key")
+os.environ["MODEL_ARTIFACT_PATH"] = ""
+os.environ["MODEL_REGISTRY_FILE"] = ""
+for name, path in {"ARCHIVE_DIR": "archive", "JOBS_DIR": "jobs", "SEARCH_SNAPSHOT_PATH": "search/predictions",
+                   "SIMILAR_PATH": "similar/predictions", "SUGGEST_SNAPSHOT_PATH": "suggest/terms"}.items():
+    os.environ[name] = os.path.join(DATA_DIR, path)
+
+
+@pytest.fixture(scope="session")
+def settings():
+    from dependencies.config import get_settings
+    return get_settings()
+
+
+@pytest.fixture(scope="session")
+def database(settings):
+    """The schema, created once like at app startup"""
+    from core import schema
+    from core.database import engine
+
+    schema.SCHEMA_LOCK_PATH = os.path.join(DATA_DIR, ".schema.lock")
+    schema.prepare_database(engine, settings)
+    return engine
+
+
+@pytest.fixture
+def db(database):
+    """A session on empty tables"""
+    from core.database import Base, sessionlocal
+
+    with database.begin() as connection:
+        for table in reversed(Base.metadata.sorted_tables):
+            connection.execute(table.delete())
+    with sessionlocal() as session:
+        yield session
+
+
+@pytest.fixture
+def tmp_settings(settings, tmp_path):
+    """Settings whose snapshot / archive paths live in this test's own directory"""
+    return settings.model_copy(update={
+        "archive_dir": str(tmp_path / "archive"),
+        "search_snapshot_path": str(tmp_path / "search" / "predictions"),
+        "similar_path": str(tmp_path / "similar" / "predictions"),
+        "suggest_snapshot_path": str(tmp_path / "suggest" / "terms"),
+    })
+
+
+def insert_prediction(db, case_text: str, category: str = "Property Law", confidence: float = 0.85,
+                      model_version: str = "v1", created_at: datetime | None = None) -> int:
+    """One prediction the way services/persistence.py saves it (text, row, rollups), committed"""
+    from sqlalchemy import insert
+
+    from models.predictions import Prediction
+    from services.case_texts import store_case_texts
+    from services.rollups import apply_rollups
+
+    case_hash, = store_case_texts(db, [case_text])
+    row = {"case_hash": case_hash, "category": category, "confidence": confidence,
+           "model_version": model_version, "created_at": created_at or datetime.now(timezone.utc)}
+    prediction_id = db.execute(insert(Prediction.__table__), row).inserted_primary_key[0]
+    apply_rollups(db, [row])
+    db.commit()
+    return prediction_id
@@ -0,0 +1,70 @@
+# tests/test_artifacts.py
+from array import array
+
+import pytest
+
+from dependencies import models
+from dependencies.models import FakeLegalModel
+from services.artifacts import ModelArtifact, write_artifact
+
+
+@pytest.fixture(autouse=True)
+def no_load_delay(monkeypatch):
+    monkeypatch.setattr(models.time, "sleep", lambda seconds: None)  # the simulated slow load
+
+
+def test_round_trip(tmp_path):
+    path = str(tmp_path / "a.baro")
+    write_artifact(path, {
+        "meta": ("json", {"labels": ["a", "b"]}),
+        "table": ("bytes", bytes(range(256))),
+        "numbers": ("int32", array("i", [1, -2, 3_000_000])),
+    }, metadata={"model_version": "v1"})
+    artifact = ModelArtifact(path)
+    assert artifact.metadata == {"model_version": "v1"}
+    assert artifact.json("meta") == {"labels": ["a", "b"]}
+    assert bytes(artifact.section("table")) == bytes(range(256))
+    assert list(artifact.int32("numbers")) == [1, -2, 3_000_000]
+    assert all(info["offset"] % 64 == 0 for info in artifact.sections.values())
+    artifact.close()
+
+
+def test_unknown_section_kind(tmp_path):
+    with pytest.raises(ValueError):
+        write_artifact(str(tmp_path / "a.baro"), {"x": ("float", [1.0])})
+
+
+def test_model_maps_the_artifact_it_wrote(tmp_path):
+    path = str(tmp_path / "model.baro")
+    built = FakeLegalModel(model_version="v1", artifact_path=path)
+    mapped = FakeLegalModel(model_version="v1", artifact_path=path)
+    assert built.artifact is None and mapped.artifact is not None
+    for text in ("theft of land", "contract fraud", "nothing"):
+        assert mapped.predict_category(text) == built.predict_category(text)
+        assert mapped.predict_crime(text) == built.predict_crime(text)
+
+
+@pytest.mark.parametrize("damage", [
+    lambda good: b"",                              # empty
+    lambda good: good[:12],                        # shorter than the header length
+    lambda good: b"NOTBARO!" + good[8:],           # wrong magic
+    lambda good: good[:16] + b"\xff" + good[17:],  # corrupt header
+    lambda good: good[:len(good) // 2],            # truncated sections
+])
+def test_corrupt_artifact_is_rebuilt(tmp_path, damage):
+    path = tmp_path / "model.baro"
+    FakeLegalModel(model_version="v1", artifact_path=str(path))
+    good = path.read_bytes()
+    path.write_bytes(damage(good))
+
+    model = FakeLegalModel(model_version="v1", artifact_path=str(path))
+    assert model.artifact is None
+    assert model.predict_crime("theft") == ("IPC 379 - Theft", 0.92)
+    assert path.read_bytes() == good
+
+
+def test_other_model_version_is_rebuilt(tmp_path):
+    path = str(tmp_path / "model.baro")
+    FakeLegalModel(model_version="v1", artifact_path=path)
+    assert FakeLegalModel(model_version="v2", artifact_path=path).artifact is None
+    assert ModelArtifact(path).metadata["model_version"] == "v2"
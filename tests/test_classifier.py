@@ -0,0 +1,114 @@
+# tests/test_classifier.py
+import numpy as np
+import pytest
+
+from services.classifier import SCAN_MIN_TEXTS, KeywordClassifier, compile_automaton, load_taxonomy
+
+
+def baseline_category(text: str) -> str:
+    """FakeLegalModel.predict_category before the taxonomy (labels only)"""
+    text_lower = text.lower()
+    if "property" in text_lower:
+        return "Property Law"
+    elif "contract" in text_lower:
+        return "Contract Law"
+    elif "family" in text_lower or "divorce" in text_lower:
+        return "Family Law"
+    return "General Law"
+
+
+def baseline_crime(text: str) -> str:
+    text_lower = text.lower()
+    if "theft" in text_lower:
+        return "IPC 379 - Theft"
+    elif "assault" in text_lower:
+        return "IPC 323 - Assault"
+    elif "fraud" in text_lower:
+        return "IPC 420 - Cheating"
+    return "IPC General Section"
+
+
+BASELINE_TEXTS = [
+    "Dispute over PROPERTY inheritance between siblings",
+    "Breach of contract by the supplier",
+    "Divorce petition filed by the wife",
+    "family court hearing",
+    "Theft of a motorcycle at night",
+    "Assault near the bus stand",
+    "Online fraud using a fake website",
+    "Nothing that matches any rule",
+    "",
+    "Ünïcode text about theft — with dashes",
+]
+
+
+@pytest.fixture(scope="module")
+def taxonomy():
+    return load_taxonomy()
+
+
+@pytest.fixture(scope="module")
+def category(taxonomy):
+    return KeywordClassifier(taxonomy["category"])
+
+
+@pytest.fixture(scope="module")
+def crime(taxonomy):
+    return KeywordClassifier(taxonomy["crime"])
+
+
+@pytest.mark.parametrize("text", BASELINE_TEXTS)
+def test_same_labels_as_baseline_rules(category, crime, text):
+    assert category.predict(text)[0] == baseline_category(text)
+    assert crime.predict(text)[0] == baseline_crime(text)
+
+
+def test_confidence_comes_from_taxonomy(taxonomy, crime):
+    theft = next(entry for entry in taxonomy["crime"]["labels"] if entry["label"] == "IPC 379 - Theft")
+    assert crime.predict("theft") == ("IPC 379 - Theft", theft["confidence"])
+    assert crime.predict("no keyword") == (taxonomy["crime"]["default"]["label"],
+                                           taxonomy["crime"]["default"]["confidence"])
+
+
+def test_most_hits_wins_and_taxonomy_order_breaks_ties(crime):
+    assert crime.predict("fraud, fraud and cheating after a theft")[0] == "IPC 420 - Cheating"
+    assert crime.predict("assault and theft")[0] == "IPC 379 - Theft"  # one hit each: taxonomy order
+
+
+SPEC = {
+    "default": {"label": "None", "confidence": 0.1},
+    "labels": [
+        {"label": "Vehicle", "confidence": 0.9, "keywords": ["car theft", "car"]},
+        {"label": "Theft", "confidence": 0.8, "keywords": ["theft", "he"]},
+    ],
+}
+
+
+def test_every_overlapping_keyword_is_counted():
+    classifier = KeywordClassifier(SPEC)
+    # "car theft": car + car theft (Vehicle), theft + "he" inside it (Theft)
+    assert classifier.count_hits("a car theft") == [2, 2]
+    assert classifier.count_hits("CAR THEFT") == [2, 2]
+
+
+def test_compiled_tables_list_suffix_keywords():
+    tables = compile_automaton(SPEC)
+    offsets, outputs = list(tables["output_offsets"]), list(tables["outputs"])
+    assert offsets[0] == 0 and offsets[-1] == len(outputs)
+    assert tables["accepting_rows"] == (len(offsets) - 1) * tables["width"]
+    # car, car the(he), car theft(+theft), the(he), theft, he
+    assert sorted(outputs) == [0, 0, 1, 1, 1, 1, 1]
+
+
+@pytest.mark.parametrize("count", [0, 3, SCAN_MIN_TEXTS + 5])
+def test_predict_many_matches_predict(crime, count):
+    texts = [BASELINE_TEXTS[i % len(BASELINE_TEXTS)] * (1 + i % 4) for i in range(count)]
+    labels, confidences = crime.predict_many(texts)
+    assert isinstance(labels, np.ndarray) and isinstance(confidences, np.ndarray)
+    assert list(zip(labels.tolist(), confidences.tolist())) == [crime.predict(text) for text in texts]
+
+
+def test_predict_many_takes_numpy_arrays(category):
+    texts = np.array(BASELINE_TEXTS * 20)
+    labels, _ = category.predict_many(texts)
+    assert labels.tolist() == [baseline_category(text) for text in texts.tolist()]
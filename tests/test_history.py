@@ -0,0 +1,69 @@
+# tests/test_history.py
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from conftest import insert_prediction
+from services.history import decode_cursor, encode_cursor, history_filters, history_page_query
+from utils.exceptions import BaroException
+
+START = datetime(2026, 1, 1, 12, 0, 0, 123456, tzinfo=timezone.utc)
+
+
+def walk(db, limit: int, filters=None) -> list[list[int]]:
+    """Every page like GET /legal/legal/history does (one extra row = there is a next page)"""
+    pages, cursor = [], None
+    while True:
+        rows = db.execute(history_page_query(limit, cursor, filters)).mappings().all()
+        more = len(rows) > limit
+        rows = rows[:limit]
+        pages.append([row["id"] for row in rows])
+        if not more:
+            return pages
+        cursor = encode_cursor(rows[-1]["created_at"], rows[-1]["id"])
+
+
+@pytest.fixture
+def rows(db):
+    """7 predictions, ids 3-5 created at the very same instant"""
+    created = [START, START + timedelta(seconds=1), START + timedelta(seconds=2), START + timedelta(seconds=2),
+               START + timedelta(seconds=2), START + timedelta(microseconds=2_000_001), START + timedelta(hours=1)]
+    return [insert_prediction(db, f"case number {i}", category="Family Law" if i % 2 else "Property Law",
+                              created_at=created_at)
+            for i, created_at in enumerate(created)]
+
+
+def test_pages_cover_every_row_once_newest_first(db, rows):
+    pages = walk(db, 2)
+    newest_first = [rows[6], rows[5], rows[4], rows[3], rows[2], rows[1], rows[0]]  # ties: higher id first
+    assert [i for page in pages for i in page] == newest_first
+    assert [len(page) for page in pages] == [2, 2, 2, 1]
+
+
+def test_exact_page_size_has_no_next_page(db, rows):
+    pages = walk(db, 7)
+    assert len(pages) == 1 and len(pages[0]) == 7
+
+
+def test_page_size_one_walks_ties(db, rows):
+    assert [page[0] for page in walk(db, 1)] == [i for page in walk(db, 3) for i in page]
+
+
+def test_cursor_with_filters(db, rows):
+    family = walk(db, 2, history_filters(category="Family Law"))
+    assert sorted(i for page in family for i in page) == [rows[1], rows[3], rows[5]]
+
+
+def test_empty_table(db):
+    assert walk(db, 5) == [[]]
+
+
+def test_cursor_round_trip():
+    created_at = datetime(2026, 3, 1, 10, 30, 0, 5, tzinfo=timezone(timedelta(hours=5, minutes=30)))
+    assert decode_cursor(encode_cursor(created_at, 42)) == (created_at, 42)
+
+
+@pytest.mark.parametrize("cursor", ["", "not base64 !", "eyJ0IjoxfQ", encode_cursor(START, 1)[:-3]])
+def test_invalid_cursor(cursor):
+    with pytest.raises(BaroException):
+        decode_cursor(cursor)
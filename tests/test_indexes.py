@@ -0,0 +1,143 @@
+# tests/test_indexes.py
+import pytest
+
+from conftest import insert_prediction
+from core.database import run_write
+from services.events import prediction_events
+from services.persistence import remove_prediction, save_predictions
+from services.search_index import SearchIndex
+from services.similarity import SimilarityIndex
+from services.suggest import SuggestIndex
+
+CASES = [
+    "boundary dispute over agricultural land between neighbours",
+    "dispute over the boundary wall of a residential land plot",
+    "theft of a motorcycle from the market parking",
+    "dowry harassment complaint filed by the wife",
+    "cheque bounce complaint for unpaid business loan",
+]
+
+
+@pytest.fixture
+def indexes(db, tmp_settings):
+    """The three indexes, following this process' inserts and deletes like in the app"""
+    built = [SearchIndex(tmp_settings), SuggestIndex(tmp_settings), SimilarityIndex(tmp_settings)]
+    for index in built:
+        index.build_started()
+        prediction_events.subscribe(on_inserted=index.add, on_deleted=index.remove)
+    yield built
+    for index in built:
+        prediction_events.unsubscribe(on_inserted=index.add, on_deleted=index.remove)
+
+
+def save(texts: list[str], category: str = "Property Law") -> list[int]:
+    return save_predictions([{"case_text": text, "category": category, "confidence": 0.85} for text in texts],
+                            "v1", chunk_size=100)
+
+
+def delete(prediction_ids: list[int]):
+    for prediction_id in prediction_ids:
+        run_write(remove_prediction, prediction_id)
+    prediction_events.deleted(prediction_ids)  # like DELETE /legal/history/{id}
+
+
+def found(index: SearchIndex, query: str) -> list[int]:
+    return [prediction_id for prediction_id, _ in index.search(query, 0, 10)[1]]
+
+
+def similar(index: SimilarityIndex, text: str) -> list[int]:
+    return [prediction_id for prediction_id, _ in index.search(text, 10)[1]]
+
+
+def completions(index: SuggestIndex, prefix: str) -> list[str]:
+    index._build()
+    return [suggestion["text"] for suggestion in index.suggest(prefix, 10)]
+
+
+# ============ Search ============
+def test_search_after_insert_and_delete(indexes):
+    search = indexes[0]
+    ids = save(CASES)
+    assert sorted(found(search, "boundary")) == ids[:2]
+    assert found(search, "motorcycle theft") == [ids[2]]
+    assert search.search("boundary", 0, 1)[0] == 2
+
+    delete([ids[0]])
+    assert found(search, "boundary") == [ids[1]]
+    assert search.search("boundary", 0, 10)[0] == 1
+    search.merge()  # deleted postings dropped for good
+    assert found(search, "boundary") == [ids[1]]
+    assert found(search, "agricultural") == []
+
+
+def test_search_catches_up_with_other_processes(db, tmp_settings):
+    search = SearchIndex(tmp_settings)
+    ids = [insert_prediction(db, text) for text in CASES]  # no event: written elsewhere
+    assert search.catch_up() == 5
+    assert found(search, "cheque") == [ids[4]]
+    assert search.catch_up() == 0
+
+
+def test_search_snapshot_round_trip(indexes, tmp_settings):
+    search = indexes[0]
+    ids = save(CASES)
+    delete([ids[3]])
+    search.save()
+    loaded = SearchIndex(tmp_settings)
+    assert loaded.load()
+    assert loaded.watermark == search.watermark
+    assert found(loaded, "complaint") == [ids[4]]
+
+
+# ============ Suggest ============
+def test_suggest_after_insert(indexes):
+    suggest = indexes[1]
+    save(CASES)
+    suggest._count_categories()
+    assert "boundary" in completions(suggest, "bou")
+    assert "dispute" in completions(suggest, "disp")
+    assert "motorcycle" not in completions(suggest, "mot")  # in one prediction only: below suggest_min_count
+    assert completions(suggest, "prop") == ["Property Law"]
+
+
+def test_suggest_keeps_counts_of_deleted_predictions(indexes):
+    suggest = indexes[1]
+    ids = save(CASES)
+    delete(ids[:2])
+    assert "boundary" in completions(suggest, "bou")
+
+
+def test_suggest_min_count_applies_to_labels(indexes):
+    suggest = indexes[1]
+    suggest.record("section", "IPC 379 - Theft")
+    suggest.record("section", "IPC 420 - Cheating")
+    suggest.record("section", "IPC 420 - Cheating")
+    suggest.maintain()
+    assert completions(suggest, "ipc") == ["IPC 420 - Cheating"]
+    assert completions(suggest, "thef") == []
+
+
+# ============ Similar ============
+def test_similar_after_insert_and_delete(indexes):
+    similarity = indexes[2]
+    ids = save(CASES)
+    assert sorted(similar(similarity, "boundary dispute over land")[:2]) == ids[:2]
+    assert similar(similarity, "motorcycle stolen from parking")[0] == ids[2]
+
+    delete([ids[0]])
+    assert similar(similarity, "boundary dispute over land")[0] == ids[1]
+    assert ids[0] not in similar(similarity, "agricultural land neighbours")
+
+
+def test_similar_snapshot_round_trip(indexes, tmp_settings):
+    similarity = indexes[2]
+    ids = save(CASES)
+    similarity.save()
+    delete([ids[2]])  # after the save: not in the snapshot
+    loaded = SimilarityIndex(tmp_settings)
+    assert loaded.load()
+    assert loaded.watermark == similarity.watermark
+    before = similarity.search("cheque bounce loan", 10)[1]
+    after = loaded.search("cheque bounce loan", 10)[1]
+    assert [i for i, _ in after if i != ids[2]] == [i for i, _ in before]
+    assert after[0][1] == pytest.approx(before[0][1])
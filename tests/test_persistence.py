@@ -0,0 +1,78 @@
+# tests/test_persistence.py
+from datetime import datetime, timezone
+
+from sqlalchemy import func, select
+
+from conftest import insert_prediction
+from core.database import run_write
+from models.case_texts import CaseText
+from models.predictions import Prediction
+from models.rollups import PredictionRollup
+from services.case_texts import delete_unreferenced, store_case_texts, text_hash
+from services.persistence import bulk_insert_predictions, remove_prediction, save_prediction
+
+
+def rollups(db) -> dict:
+    db.expire_all()
+    return {(row.category, row.model_version): (row.count, round(row.confidence_sum, 6))
+            for row in db.scalars(select(PredictionRollup))}
+
+
+def text_count(db) -> int:
+    db.expire_all()
+    return db.scalar(select(func.count()).select_from(CaseText))
+
+
+# ============ Rollups ============
+def test_rollups_add_saved_predictions(db):
+    run_write(save_prediction, "land dispute", "Property Law", 0.85, "v1")
+    run_write(save_prediction, "land grab", "Property Law", 0.75, "v1")
+    run_write(save_prediction, "divorce", "Family Law", 0.5, "v2")
+    assert rollups(db) == {("Property Law", "v1"): (2, 1.6), ("Family Law", "v2"): (1, 0.5)}
+
+
+def test_rollups_subtract_deleted_predictions(db):
+    first = run_write(save_prediction, "land dispute", "Property Law", 0.85, "v1")
+    second = run_write(save_prediction, "land grab", "Property Law", 0.75, "v1")
+    assert run_write(remove_prediction, first)
+    assert rollups(db) == {("Property Law", "v1"): (1, 0.75)}
+    assert run_write(remove_prediction, second)
+    assert rollups(db) == {("Property Law", "v1"): (0, 0.0)}
+    assert not run_write(remove_prediction, second)  # already gone: nothing subtracted twice
+    assert rollups(db) == {("Property Law", "v1"): (0, 0.0)}
+
+
+def test_rollups_of_bulk_inserts_use_the_hour_bucket(db):
+    records = [{"case_text": f"contract {i}", "category": "Contract Law", "confidence": 0.5} for i in range(5)]
+    run_write(bulk_insert_predictions, records, "v1", 2)
+    rollup, = db.scalars(select(PredictionRollup)).all()
+    bucket = rollup.bucket.replace(tzinfo=timezone.utc) if rollup.bucket.tzinfo is None else rollup.bucket
+    now = datetime.now(timezone.utc)
+    assert (rollup.count, bucket) == (5, now.replace(minute=0, second=0, microsecond=0))
+
+
+# ============ Case texts ============
+def test_same_text_is_stored_once(db):
+    ids = [run_write(save_prediction, "the same case text", "Property Law", 0.85, version)
+           for version in ("v1", "v2", "v1")]
+    assert len(set(ids)) == 3 and text_count(db) == 1
+    hashes = set(db.scalars(select(Prediction.case_hash)))
+    assert hashes == {text_hash("the same case text")}
+
+
+def test_text_removed_with_its_last_prediction(db):
+    first = run_write(save_prediction, "shared text", "Property Law", 0.85, "v1")
+    second = run_write(save_prediction, "shared text", "Property Law", 0.85, "v2")
+    run_write(remove_prediction, first)
+    assert text_count(db) == 1
+    run_write(remove_prediction, second)
+    assert text_count(db) == 0
+
+
+def test_unreferenced_cleanup_keeps_used_texts(db):
+    insert_prediction(db, "still used")
+    store_case_texts(db, [f"orphan {i}" for i in range(7)])
+    db.commit()
+    assert text_count(db) == 8
+    assert delete_unreferenced(db, chunk_size=3) == 7
+    assert db.scalars(select(CaseText.case_text)).all() == ["still used"]
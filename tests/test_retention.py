@@ -0,0 +1,86 @@
+# tests/test_retention.py
+import gzip
+import json
+import os
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import select
+
+from conftest import insert_prediction
+from models.case_texts import CaseText
+from models.predictions import Prediction
+from services.retention import RetentionManager
+
+NOW = datetime(2026, 3, 15, 12, 0, tzinfo=timezone.utc)  # cutoff with 30 days: 2026-02-13 00:00 UTC
+OLD_DAY = datetime(2026, 2, 1, 9, 30, tzinfo=timezone.utc)
+
+
+@pytest.fixture
+def retention(tmp_settings):
+    return RetentionManager(tmp_settings.model_copy(update={"retention_days": 30, "retention_chunk_size": 2}))
+
+
+@pytest.fixture
+def rows(db):
+    """5 expired predictions (one sharing its text with a kept one) and 2 kept ones"""
+    old = [insert_prediction(db, f"expired case {i}", created_at=OLD_DAY + timedelta(minutes=i)) for i in range(4)]
+    old.append(insert_prediction(db, "shared case", created_at=OLD_DAY))
+    kept = [insert_prediction(db, "shared case", created_at=NOW - timedelta(days=1)),
+            insert_prediction(db, "recent case", created_at=NOW - timedelta(days=29))]
+    return old, kept
+
+
+def read_archive(retention, day: str) -> list[dict]:
+    with gzip.open(retention._archive_path(day), "rt", encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+def ids_left(db) -> list[int]:
+    db.expire_all()
+    return db.scalars(select(Prediction.id).order_by(Prediction.id)).all()
+
+
+def test_cutoff_is_start_of_utc_day(retention):
+    assert retention.cutoff(NOW) == datetime(2026, 2, 13, tzinfo=timezone.utc)
+
+
+def test_expired_rows_archived_then_deleted(db, retention, rows):
+    old, kept = rows
+    result = retention.run_once(NOW)
+    assert result["deleted_rows"] == 5
+    assert ids_left(db) == kept
+    archived = read_archive(retention, "2026-02-01")
+    assert sorted(record["id"] for record in archived) == sorted(old)
+    assert {record["case_text"] for record in archived} == {f"expired case {i}" for i in range(4)} | {"shared case"}
+
+
+def test_texts_of_expired_rows_removed(db, retention, rows):
+    assert retention.run_once(NOW)["deleted_case_texts"] == 4
+    db.expire_all()
+    assert sorted(db.scalars(select(CaseText.case_text))) == ["recent case", "shared case"]
+
+
+def test_nothing_expired(db, retention, rows):
+    retention.run_once(NOW - timedelta(days=60))
+    assert len(ids_left(db)) == 7
+    assert not os.path.exists(retention.archive_dir + "/2026")
+
+
+def test_failed_delete_keeps_rows_and_archive(db, retention, rows, monkeypatch):
+    old, kept = rows
+
+    def fail(db, ids):
+        raise RuntimeError("disk full")
+
+    monkeypatch.setattr(RetentionManager, "_delete_chunk", staticmethod(fail))
+    with pytest.raises(RuntimeError):
+        retention.run_once(NOW)
+    assert ids_left(db) == sorted(old + kept)  # archived first, nothing deleted
+    assert len(read_archive(retention, "2026-02-01")) == 2  # the first chunk
+
+    monkeypatch.undo()
+    assert retention.run_once(NOW)["deleted_rows"] == 5
+    assert ids_left(db) == kept
+    archived = [record["id"] for record in read_archive(retention, "2026-02-01")]
+    assert sorted(set(archived)) == sorted(old)  # the first chunk is in the archive twice, never missing
@@ -22,7 +22,8 @@ async def baro_exception_handler(request: Request, exc: BaroException):
             "error": True,
             "message": exc.detail,
             "path": str(request.url.path)
-        }
+        },
+        headers=getattr(exc, "headers", None)  # e.g. Retry-After on 503
     )
 
 
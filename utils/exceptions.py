@@ -25,13 +25,15 @@ class InvalidAPIKeyException(BaroException):
 
 
 class ModelNotLoadedException(BaroException):
-    """ML model failed to load"""
+    """ML model failed to load (or is still loading)"""
     
-    def __init__(self, detail: str = "ML model not available"):
+    def __init__(self, detail: str = "ML model not available", retry_after: int | None = None):
         super().__init__(
             detail=detail,
             status_code=status.HTTP_503_SERVICE_UNAVAILABLE
         )
+        if retry_after is not None:
+            self.headers = {"Retry-After": str(retry_after)}
 
 
 class PredictionException(BaroException):
@@ -52,3 +54,13 @@ class RateLimitException(BaroException):
             detail=detail,
             status_code=status.HTTP_429_TOO_MANY_REQUESTS
         )
+
+
+class ServiceOverloadedException(BaroException):
+    """Inference queue is full"""
+    
+    def __init__(self, detail: str = "Server is busy. Try again later."):
+        super().__init__(
+            detail=detail,
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE
+        )
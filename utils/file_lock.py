@@ -0,0 +1,61 @@
+# utils/file_lock.py
+import os
+import time
+from contextlib import contextmanager
+from typing import Iterator
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+@contextmanager
+def file_lock(path: str, shared: bool = False, blocking: bool = True) -> Iterator[bool]:
+    """
+    Advisory lock between the processes of a host (gunicorn workers, tools)
+
+    WHY: Schema setup, retention runs and index snapshots must not overlap
+         across workers; fcntl alone made the app POSIX-only
+    HOW: flock on POSIX (shared or exclusive). Windows: msvcrt.locking of
+         the first byte, always exclusive, retried until free
+    Yields whether the lock is held (False only when blocking=False and
+    another process has it).
+    """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "a+") as lock_file:  # never truncated: Windows refuses that on a locked file
+        if not _acquire(lock_file, shared, blocking):
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            _release(lock_file)
+
+
+def _acquire(lock_file, shared: bool, blocking: bool) -> bool:
+    if fcntl is not None:
+        operation = (fcntl.LOCK_SH if shared else fcntl.LOCK_EX) | (0 if blocking else fcntl.LOCK_NB)
+        try:
+            fcntl.flock(lock_file, operation)
+        except BlockingIOError:
+            return False
+        return True
+    while True:
+        try:
+            lock_file.seek(0)
+            msvcrt.locking(lock_file.fileno(), msvcrt.LK_NBLCK, 1)
+            return True
+        except OSError:
+            if not blocking:
+                return False
+            time.sleep(0.05)
+
+
+def _release(lock_file):
+    if fcntl is not None:
+        fcntl.flock(lock_file, fcntl.LOCK_UN)
+    else:
+        lock_file.seek(0)
+        msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)